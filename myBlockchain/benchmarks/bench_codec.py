@@ -0,0 +1,50 @@
+import argparse
+import os
+import tempfile
+import timeit
+from os import path
+
+from blockchain_poc import codec
+
+DEFAULT_STATE = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))), "data", "blockchain.json.gz"
+)
+FORMATS = [".json", ".json.gz", ".bin", ".bin.gz"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary codec benchmark")
+    parser.add_argument("--blockchain-state", default=DEFAULT_STATE)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    blocks = list(codec.read_blocks(args.blockchain_state))
+    count = sum(len(b.transactions) for b in blocks)
+    print(f"{len(blocks)} blocks, {count:,} transactions")
+    print(f"{'format':10s}{'size (KiB)':>12s}{'encode (ms)':>13s}{'decode (ms)':>13s}")
+    with tempfile.TemporaryDirectory() as directory:
+        for suffix in FORMATS:
+            state_path = path.join(directory, "blockchain" + suffix)
+            encode_time = min(
+                timeit.repeat(
+                    lambda: codec.write_blocks(state_path, blocks),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            decode_time = min(
+                timeit.repeat(
+                    lambda: list(codec.read_blocks(state_path)),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            assert list(codec.read_blocks(state_path)) == blocks
+            print(
+                f"{suffix:10s}{os.path.getsize(state_path) / 1024:12,.0f}"
+                f"{encode_time * 1e3:13.1f}{decode_time * 1e3:13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import random
+import timeit
+
+from blockchain_poc import execution
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.ledger import Ledger
+
+from . import synthetic
+
+# balance of the accounts spending more than they hold at the start of a block
+TIGHT_BALANCE = 2_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched block execution benchmark")
+    parser.add_argument(
+        "-n", "--transactions", type=int, nargs="+", default=[1_000, 10_000]
+    )
+    parser.add_argument(
+        "-a", "--accounts", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "-t",
+        "--tight",
+        type=float,
+        nargs="+",
+        default=[0.0, 0.01],
+        help="Fraction of the accounts starting with a small balance",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(
+        f"{'txs':>7s}{'accounts':>10s}{'tight':>7s}{'per tx':>8s}{'at risk':>9s}"
+        f"{'sequential (ms)':>17s}{'batched (ms)':>14s}{'speedup':>9s}"
+    )
+    for accounts in args.accounts:
+        addresses = synthetic.make_addresses(accounts, rng)
+        for tight in args.tight:
+            balances = {address: synthetic.INITIAL_BALANCE for address in addresses}
+            for address in rng.sample(addresses, int(tight * accounts)):
+                balances[address] = TIGHT_BALANCE
+            for count in args.transactions:
+                transactions = synthetic.make_transfers(
+                    dict(balances), addresses, count, rng
+                )
+                blockchain = Blockchain()
+                ledger = Ledger(balances)
+
+                def process_sequentially():
+                    blockchain.balances = ledger.copy()
+                    for tx in transactions:
+                        blockchain.process_transaction(synthetic.MINER, 1, tx)
+
+                def process_batched():
+                    blockchain.balances = ledger.copy()
+                    execution.execute_transactions(
+                        blockchain, synthetic.MINER, 1, transactions
+                    )
+
+                process_sequentially()
+                expected = list(blockchain.balances.items())
+                process_batched()
+                assert list(blockchain.balances.items()) == expected
+
+                # distinct senders and receivers per transaction
+                per_tx = (
+                    len({tx.sender for tx in transactions})
+                    + len({tx.receiver for tx in transactions})
+                ) / count
+                batch = execution.Batch.of(transactions, synthetic.MINER)
+                unsafe = set(batch.unsafe_accounts(ledger))
+                at_risk = sum(
+                    tx.sender in unsafe or tx.receiver in unsafe for tx in transactions
+                )
+
+                sequential = min(
+                    timeit.repeat(process_sequentially, number=1, repeat=args.repeat)
+                )
+                batched = min(
+                    timeit.repeat(process_batched, number=1, repeat=args.repeat)
+                )
+                print(
+                    f"{count:7,d}{accounts:10,d}{tight:7.0%}{per_tx:8.2f}"
+                    f"{at_risk:9,d}{sequential * 1e3:17.2f}{batched * 1e3:14.2f}"
+                    f"{sequential / batched:8.2f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import json
+import time
+from os import path
+
+from blockchain_poc.block_header import BlockHeader
+from blockchain_poc.header_hasher import HeaderHasher
+
+SAMPLE_HEADER = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))),
+    "tests",
+    "data",
+    "header-119.json",
+)
+
+
+def load_header() -> BlockHeader:
+    with open(SAMPLE_HEADER) as f:
+        header = BlockHeader(**json.load(f))
+    # unreachable difficulty so that every nonce in the range is tried
+    header.difficulty = 64
+    return header
+
+
+def bench_serialize(header: BlockHeader, attempts: int) -> float:
+    start = time.perf_counter()
+    for nonce in range(attempts):
+        header.nonce = nonce
+        header.is_below_target()
+    return attempts / (time.perf_counter() - start)
+
+
+def bench_hasher(header: BlockHeader, attempts: int) -> float:
+    start = time.perf_counter()
+    HeaderHasher(header).find_nonce(0, 1, attempts)
+    return attempts / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Header hashing throughput")
+    parser.add_argument("-n", "--attempts", type=int, default=200_000)
+    args = parser.parse_args()
+
+    header = load_header()
+    serialize_rate = bench_serialize(header, args.attempts)
+    hasher_rate = bench_hasher(header, args.attempts)
+    print(f"BlockHeader.is_below_target: {serialize_rate:12,.0f} H/s")
+    print(f"HeaderHasher.find_nonce:     {hasher_rate:12,.0f} H/s")
+    print(f"speedup: {hasher_rate / serialize_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
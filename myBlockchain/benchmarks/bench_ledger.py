@@ -0,0 +1,77 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.ledger import Ledger
+from blockchain_poc.transaction import Transaction
+
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+
+
+def measure(build):
+    # the address strings are allocated before tracing: they are shared with
+    # the blocks and cost the same for both structures
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def run(name, balances_type, addresses, transactions):
+    rng = random.Random(0)
+    balances, size, build_time = measure(
+        lambda: balances_type((a, rng.randrange(10**6, 10**12)) for a in addresses)
+    )
+    copy, copy_size, _ = measure(balances.copy)
+    start = time.perf_counter()
+    copy = balances.copy()
+    copy_time = time.perf_counter() - start
+    del copy
+
+    start = time.perf_counter()
+    for tx in transactions:
+        Blockchain.update_balances(balances, tx, MINER)
+    transfer_time = time.perf_counter() - start
+
+    print(
+        f"{name:7s}{size / 2**20:10.0f} MiB{build_time:10.2f} s"
+        f"{copy_size / 2**20:10.0f} MiB{copy_time * 1e3:10.1f} ms"
+        f"{len(transactions) / transfer_time:12,.0f} tx/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance ledger benchmark")
+    parser.add_argument("-n", "--accounts", type=int, default=1_000_000)
+    parser.add_argument("-t", "--transactions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    addresses = [f"0x{i:040x}" for i in range(args.accounts)]
+    transactions = [
+        Transaction(
+            sender=rng.choice(addresses),
+            receiver=rng.choice(addresses),
+            amount=rng.randint(0, 1_000),
+            transaction_fee=rng.randint(1, 10),
+            lock_time=0,
+        )
+        for _ in range(args.transactions)
+    ]
+
+    print(f"{args.accounts:,} accounts, {args.transactions:,} transactions")
+    print(f"{'':7s}{'size':>14s}{'build':>12s}{'copy size':>14s}{'copy':>13s}")
+    run("dict", dict, addresses, transactions)
+    gc.collect()
+    run("Ledger", Ledger, addresses, transactions)
+
+
+if __name__ == "__main__":
+    main()
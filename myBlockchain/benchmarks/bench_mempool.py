@@ -0,0 +1,84 @@
+import argparse
+import random
+import time
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.miner import Miner
+from blockchain_poc.transaction import Transaction
+
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+
+
+def make_transactions(count: int, accounts: int, rng: random.Random):
+    return [
+        Transaction(
+            sender=f"0x{rng.randrange(accounts):040x}",
+            receiver=f"0x{rng.randrange(accounts):040x}",
+            amount=rng.randint(0, 1_000),
+            transaction_fee=rng.randint(1, 1_000),
+            lock_time=rng.randint(0, 3_600),
+        )
+        for _ in range(count)
+    ]
+
+
+# the set-based selection Miner used to do, kept for comparison
+def legacy_block(transactions: set, blockchain: Blockchain, timestamp: int):
+    live = [tx for tx in transactions if tx.lock_time <= timestamp]
+    txs_by_fee = sorted(live, key=lambda tx: tx.transaction_fee, reverse=True)
+    balances = blockchain.balances.copy()
+    txs_to_mine = []
+    for tx in txs_by_fee:
+        if balances.get(tx.sender, 0) >= tx.amount + tx.transaction_fee:
+            Blockchain.update_balances(balances, tx, MINER)
+            txs_to_mine.append(tx)
+            if len(txs_to_mine) == blockchain.max_txs_per_block:
+                break
+    transactions -= set(txs_to_mine)
+    return txs_to_mine
+
+
+def indexed_block(miner: Miner, timestamp: int):
+    txs_to_mine = miner.get_most_profitable_transactions(timestamp)
+    miner.mempool.remove_transactions(txs_to_mine)
+    return txs_to_mine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block assembly benchmark")
+    parser.add_argument("-n", "--count", type=int, default=200_000)
+    parser.add_argument("-b", "--blocks", type=int, default=20)
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--max-txs-per-block", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    transactions = make_transactions(args.count, args.accounts, rng)
+    blockchain = Blockchain(max_txs_per_block=args.max_txs_per_block)
+    blockchain.balances = {f"0x{i:040x}": 10**9 for i in range(args.accounts)}
+
+    pending = set(transactions)
+    start = time.perf_counter()
+    legacy = [legacy_block(pending, blockchain, 60 * i) for i in range(args.blocks)]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mempool = Mempool(transactions)
+    build_time = time.perf_counter() - start
+    miner = Miner(MINER, blockchain, mempool)
+    start = time.perf_counter()
+    indexed = [indexed_block(miner, 60 * i) for i in range(args.blocks)]
+    indexed_time = time.perf_counter() - start
+
+    # ties in fees are broken arbitrarily by the set, so only compare fees
+    fees = lambda blocks: [[tx.transaction_fee for tx in b] for b in blocks]
+    assert fees(legacy) == fees(indexed)
+    print(f"{args.count:,} transactions, {args.blocks} blocks")
+    print(f"set + sort:    {legacy_time / args.blocks * 1e3:10.2f} ms/block")
+    print(f"indexed:       {indexed_time / args.blocks * 1e3:10.2f} ms/block")
+    print(f"index build:   {build_time:10.2f} s")
+
+
+if __name__ == "__main__":
+    main()
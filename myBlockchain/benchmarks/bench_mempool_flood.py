@@ -0,0 +1,57 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.transaction import Transaction
+
+
+def iter_flood(count: int, accounts: int, rng: random.Random):
+    # generated one at a time, so that only the mempool holds transactions
+    for i in range(count):
+        yield Transaction(
+            sender=f"0x{rng.randrange(accounts):040x}",
+            receiver=f"0x{rng.randrange(accounts):040x}",
+            amount=rng.randint(0, 1_000),
+            transaction_fee=rng.randint(1, 10_000),
+            lock_time=i,
+            signature=rng.randbytes(100).hex(),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounded mempool flood benchmark")
+    parser.add_argument("-c", "--max-count", type=int, default=20_000)
+    parser.add_argument("--max-bytes", type=int, default=None)
+    parser.add_argument(
+        "-x", "--factor", type=int, default=10, help="Flood size, times the capacity"
+    )
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    count = args.max_count * args.factor
+    mempool = Mempool(max_count=args.max_count, max_bytes=args.max_bytes)
+    rng = random.Random(args.seed)
+    print(
+        f"{'added':>10s}{'size':>8s}{'accounted (MiB)':>17s}{'traced (MiB)':>14s}"
+        f"{'min fee':>9s}{'evicted':>10s}{'tx/s':>10s}"
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i, tx in enumerate(iter_flood(count, args.accounts, rng), 1):
+        mempool.add(tx)
+        if i % (count // 10) == 0:
+            elapsed = time.perf_counter() - start
+            traced, _ = tracemalloc.get_traced_memory()
+            print(
+                f"{i:10,d}{len(mempool):8,d}{mempool.size / 2**20:17.2f}"
+                f"{traced / 2**20:14.2f}{mempool.min_fee:9,d}{mempool.evicted:10,d}"
+                f"{i / elapsed:10,.0f}"
+            )
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
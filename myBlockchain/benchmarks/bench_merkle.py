@@ -0,0 +1,47 @@
+import argparse
+import os
+import timeit
+
+from blockchain_poc import merkle
+from blockchain_poc.constants import ZERO_HASH
+from blockchain_poc.utils import hash_pair, to_hex
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+# the string-based implementation generate_root used to have, kept for comparison
+def string_root(hashes):
+    hashes = list(hashes)
+    while len(hashes) > 2:
+        if len(hashes) % 2 == 1:
+            hashes.append(ZERO_HASH)
+        hashes = [hash_pair(a, b) for a, b in zip(hashes[::2], hashes[1::2])]
+    if len(hashes) % 2 == 1:
+        hashes.append(ZERO_HASH)
+    return hash_pair(*hashes)
+
+
+def timed(func, hashes, repeat: int):
+    return min(timeit.repeat(lambda: func(hashes), number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merkle root benchmark")
+    parser.add_argument("sizes", type=int, nargs="*", default=DEFAULT_SIZES)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'leaves':>10}{'strings (s)':>14}{'bytes (s)':>14}{'speedup':>10}")
+    for size in args.sizes:
+        hashes = [to_hex(os.urandom(32)) for _ in range(size)]
+        assert merkle.generate_root(hashes) == string_root(hashes)
+        string_time = timed(string_root, hashes, args.repeat)
+        bytes_time = timed(merkle.generate_root, hashes, args.repeat)
+        print(
+            f"{size:>10,}{string_time:>14.4f}{bytes_time:>14.4f}"
+            f"{string_time / bytes_time:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
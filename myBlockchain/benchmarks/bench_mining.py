@@ -0,0 +1,60 @@
+import argparse
+import time
+
+from benchmarks import synthetic
+from blockchain_poc import stats
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.miner import ContinuousMiner, Miner
+
+
+def make_miner(cls, args, **kwargs):
+    blockchain, addresses = synthetic.make_chain(
+        3, args.txs_per_block, args.accounts, seed=args.seed
+    )
+    # a fixed difficulty, rather than the one of these low heights
+    blockchain.get_next_difficulty = lambda: args.difficulty
+    transactions = synthetic.make_mempool_transactions(
+        blockchain, addresses, args.number, seed=args.seed
+    )
+    return cls(synthetic.MINER, blockchain, Mempool(transactions), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuous mining benchmark")
+    parser.add_argument("-n", "--number", type=int, default=50_000)
+    parser.add_argument("-b", "--blocks", type=int, default=10)
+    parser.add_argument("-t", "--txs-per-block", type=int, default=2_000)
+    parser.add_argument("-a", "--accounts", type=int, default=2_000)
+    parser.add_argument("-d", "--difficulty", type=int, default=4)
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    miner = make_miner(Miner, args, workers=args.workers)
+    stats.enable()
+    start = time.perf_counter()
+    for _ in range(args.blocks):
+        miner.mine_next()
+    elapsed = time.perf_counter() - start
+    stats.disable()
+    templates = stats.STATS.timers["miner.build_template"]
+    hashing = stats.STATS.timers["block.mine"].total
+    print(f"mine_next: {args.blocks / elapsed:.2f} blocks/s")
+    print(
+        f"template latency: mean {templates.total / templates.count * 1e3:.2f} ms, "
+        f"max {templates.max * 1e3:.2f} ms"
+    )
+    print(f"hashing: {hashing / elapsed:.1%} of the time")
+    print()
+
+    continuous = make_miner(ContinuousMiner, args, workers=args.workers)
+    start = time.perf_counter()
+    for _ in continuous.iter_blocks(args.blocks):
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"continuous: {args.blocks / elapsed:.2f} blocks/s")
+    print(continuous.report.summary())
+
+
+if __name__ == "__main__":
+    main()
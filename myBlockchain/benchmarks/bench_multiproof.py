@@ -0,0 +1,56 @@
+import argparse
+import json
+import random
+import timeit
+
+from blockchain_poc import merkle
+from blockchain_poc.utils import to_hex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merkle multiproof benchmark")
+    parser.add_argument("leaves", type=int, nargs="*", default=[1_000, 100_000])
+    parser.add_argument(
+        "-k", "--targets", type=int, nargs="+", default=[1, 10, 100, 500]
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(
+        f"{'leaves':>8s}{'targets':>8s}{'proofs (KiB)':>14s}{'multi (KiB)':>13s}"
+        f"{'verify (ms)':>13s}{'multi (ms)':>12s}"
+    )
+    for size in args.leaves:
+        hashes = [to_hex(rng.randbytes(32)) for _ in range(size)]
+        tree = merkle.MerkleTree(hashes)
+        for count in args.targets:
+            if count > size:
+                continue
+            targets = rng.sample(hashes, count)
+            proofs = [tree.generate_proof(target) for target in targets]
+            multiproof = tree.generate_multiproof(targets)
+            assert merkle.verify_multiproof(targets, tree.root, multiproof)
+
+            def verify_each():
+                for target, proof in zip(targets, proofs):
+                    merkle.verify_proof(target, tree.root, proof)
+
+            verify_time = min(timeit.repeat(verify_each, number=1, repeat=args.repeat))
+            multi_time = min(
+                timeit.repeat(
+                    lambda: merkle.verify_multiproof(targets, tree.root, multiproof),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            print(
+                f"{size:8,d}{count:8,d}{len(json.dumps(proofs)) / 1024:14,.1f}"
+                f"{len(json.dumps(multiproof)) / 1024:13,.1f}"
+                f"{verify_time * 1e3:13.2f}{multi_time * 1e3:12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
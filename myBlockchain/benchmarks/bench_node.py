@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import random
+import time
+from os import path
+
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.node import Node
+from blockchain_poc.transaction import Transaction
+
+STATE_FILE = path.join(
+    path.dirname(__file__), "..", "tests", "data", "sample", "blockchain.json.gz"
+)
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+
+
+def make_transactions(count: int, rng: random.Random):
+    return [
+        Transaction(
+            sender=f"0x{rng.randrange(2**160):040x}",
+            receiver=f"0x{rng.randrange(2**160):040x}",
+            amount=rng.randint(0, 1_000),
+            transaction_fee=rng.randint(1, 1_000),
+            lock_time=0,
+        )
+        for _ in range(count)
+    ]
+
+
+def make_blocks(count: int):
+    # each block moves 1 unit between two funded accounts and back
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    a, b = sorted(blockchain.balances, key=blockchain.balances.get)[-2:]
+    blocks = []
+    for i in range(count):
+        transactions = [
+            Transaction(sender=a, receiver=b, amount=1, transaction_fee=1, lock_time=i),
+            Transaction(sender=b, receiver=a, amount=1, transaction_fee=1, lock_time=i),
+        ]
+        block = Block.mine(
+            difficulty=blockchain.get_next_difficulty(),
+            height=blockchain.height + 1,
+            miner=MINER,
+            previous_block_header_hash=blockchain.head.header.hash,
+            timestamp=blockchain.timestamp + 10,
+            transactions=transactions,
+        )
+        blockchain.process_block(block)
+        blocks.append(block)
+    return blocks
+
+
+async def wait_for(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+
+async def run(args):
+    nodes = [
+        Node(
+            Blockchain.from_file(STATE_FILE, max_txs_per_block=5),
+            Mempool(),
+            max_pending=args.max_pending,
+        )
+        for _ in range(args.nodes)
+    ]
+    for node in nodes:
+        await node.start()
+    for i, node in enumerate(nodes[1:], 1):
+        # a line, or every node connected to all the previous ones
+        for other in nodes[:i] if args.mesh else [nodes[i - 1]]:
+            await node.connect(other.host, other.port)
+    await asyncio.sleep(0.1)
+
+    transactions = make_transactions(args.transactions, random.Random(0))
+    blocks = make_blocks(args.blocks)
+    last = nodes[-1]
+    try:
+        start = time.perf_counter()
+        for tx in transactions:
+            await nodes[0].submit(tx)
+        await wait_for(lambda: len(last.mempool) == len(transactions))
+        tx_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for block in blocks:
+            await nodes[0].submit(block)
+        await wait_for(lambda: last.blockchain.height == blocks[-1].header.height)
+        block_time = time.perf_counter() - start
+    finally:
+        for node in nodes:
+            await node.close()
+
+    topology = "mesh" if args.mesh else "line"
+    print(f"{args.nodes} nodes ({topology}), max pending {args.max_pending}")
+    print(f"transactions: {len(transactions) / tx_time:10,.0f} tx/s to the last node")
+    print(f"blocks:       {len(blocks) / block_time:10,.0f} blocks/s to the last node")
+    for i, node in enumerate(nodes):
+        print(f"  node {i}: {dict(node.stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Localhost gossip benchmark")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--mesh", action="store_true")
+    parser.add_argument("-n", "--transactions", type=int, default=20_000)
+    parser.add_argument("-b", "--blocks", type=int, default=40)
+    parser.add_argument("--max-pending", type=int, default=1024)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from os import path
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.server import QueryService, serve
+
+STATE_FILE = path.join(path.dirname(__file__), "..", "data", "blockchain.json.gz")
+
+
+def run_server(state_path: str, port: int):
+    service = QueryService(state_path, lambda: Blockchain.from_file(state_path))
+    serve(service, address=("127.0.0.1", port), poll_interval=0)
+
+
+def make_requests(blockchain: Blockchain, count: int, rng: random.Random):
+    requests = []
+    for _ in range(count):
+        height = rng.randrange(1, len(blockchain.blocks))
+        transactions = blockchain.blocks[height].transactions
+        index = rng.randrange(len(transactions))
+        tx_hash = transactions[index].sha256_hash()
+        kind = rng.choice(["tx-hash", "proof", "verify"])
+        if kind == "tx-hash":
+            requests.append(("GET", f"/tx-hash?block={height}&index={index}", None))
+        elif kind == "proof":
+            requests.append(("GET", f"/proof?block={height}&hash={tx_hash}", None))
+        else:
+            proof = blockchain.generate_inclusion_proof(height, tx_hash)
+            body = {"block": height, "hash": tx_hash, "proof": proof}
+            requests.append(("POST", "/verify", json.dumps(body)))
+    return requests
+
+
+def client(port: int, requests, latencies):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    for method, url, body in requests:
+        start = time.perf_counter()
+        connection.request(method, url, body=body)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        assert response.status == 200, url
+    connection.close()
+
+
+def wait_for_server(port: int):
+    for _ in range(600):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("GET", "/status")
+            connection.getresponse().read()
+            return
+        except ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def one_shot_latency(state_path: str) -> float:
+    command = [
+        sys.executable,
+        "-c",
+        "from blockchain_poc.cli import main; main()",
+        "--blockchain-state",
+        state_path,
+        "get-tx-hash",
+        "1",
+        "0",
+    ]
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query daemon load test")
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("-c", "--clients", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=2_000)
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+
+    blockchain = Blockchain.from_file(args.state)
+    rng = random.Random(0)
+    requests = [
+        make_requests(blockchain, args.requests, rng) for _ in range(args.clients)
+    ]
+
+    process = multiprocessing.Process(
+        target=run_server, args=(args.state, args.port), daemon=True
+    )
+    process.start()
+    try:
+        wait_for_server(args.port)
+        latencies = [[] for _ in range(args.clients)]
+        threads = [
+            threading.Thread(target=client, args=(args.port, r, l))
+            for r, l in zip(requests, latencies)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.join()
+
+    all_latencies = sorted(
+        l for client_latencies in latencies for l in client_latencies
+    )
+    quantiles = statistics.quantiles(all_latencies, n=100)
+    print(f"{args.clients} clients, {len(all_latencies):,} requests")
+    print(f"requests/s: {len(all_latencies) / elapsed:10,.0f}")
+    print(f"p50:        {quantiles[49] * 1e3:10.2f} ms")
+    print(f"p99:        {quantiles[98] * 1e3:10.2f} ms")
+    print(f"one-shot get-tx-hash: {one_shot_latency(args.state) * 1e3:10.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+from collections import Counter
+import json
+import time
+from os import path
+
+from ecdsa import VerifyingKey
+from ecdsa.util import sigdecode_der
+
+from blockchain_poc.transaction import (
+    Transaction,
+    verify_signatures,
+    verifying_key_cache,
+)
+from blockchain_poc.utils import from_hex, open_file
+
+DEFAULT_STATE = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))), "data", "blockchain.json.gz"
+)
+
+
+def load_signed_transactions(state_path: str, count: int, top_senders: int):
+    with open_file(state_path) as f:
+        blocks = json.load(f)
+    transactions = [
+        Transaction.from_dict(tx)
+        for block in blocks[1:]
+        for tx in block["transactions"]
+    ]
+    if top_senders:
+        senders = Counter(tx.sender for tx in transactions).most_common(top_senders)
+        active = {sender for sender, _ in senders}
+        transactions = [tx for tx in transactions if tx.sender in active]
+    return transactions[:count]
+
+
+def verify_uncached(transactions):
+    for tx in transactions:
+        encoded_public_key, signature = tx.signature.split(",")
+        public_key = VerifyingKey.from_der(from_hex(encoded_public_key))
+        public_key.verify_digest(
+            from_hex(signature), tx.compute_hash_to_sign(), sigdecode=sigdecode_der
+        )
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signature verification benchmark")
+    parser.add_argument("--blockchain-state", default=DEFAULT_STATE)
+    parser.add_argument("-n", "--count", type=int, default=2000)
+    parser.add_argument(
+        "--top-senders",
+        type=int,
+        default=0,
+        help="Only use transactions from the most active senders",
+    )
+    args = parser.parse_args()
+
+    transactions = load_signed_transactions(
+        args.blockchain_state, args.count, args.top_senders
+    )
+    for tx in transactions:
+        tx.compute_hash_to_sign()
+    count = len(transactions)
+
+    uncached = timed(verify_uncached, transactions)
+    verifying_key_cache.clear()
+    single = timed(lambda: [tx.verify_signature() for tx in transactions])
+    single_hit_rate = verifying_key_cache.hit_rate
+    verifying_key_cache.clear()
+    batch = timed(verify_signatures, transactions)
+
+    print(f"{count:,} transactions, {len(verifying_key_cache):,} distinct keys")
+    print(f"uncached:                    {count / uncached:10,.0f} verifications/s")
+    print(
+        f"cached verify_signature:     {count / single:10,.0f} verifications/s"
+        f"  (hit rate {single_hit_rate:.1%})"
+    )
+    print(
+        f"batch verify_signatures:     {count / batch:10,.0f} verifications/s"
+        f"  (hit rate {verifying_key_cache.hit_rate:.1%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
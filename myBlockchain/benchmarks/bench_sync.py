@@ -0,0 +1,43 @@
+import argparse
+import os
+import time
+from os import path
+
+from blockchain_poc.blockchain import Blockchain
+
+DEFAULT_STATE = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))), "data", "blockchain.json.gz"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process chain sync benchmark")
+    parser.add_argument("--blockchain-state", default=DEFAULT_STATE)
+    parser.add_argument(
+        "-j", "--jobs", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1]
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'jobs':>4s}{'load (s)':>10s}{'blocks/s':>10s}{'speedup':>9s}")
+    baseline = None
+    for jobs in sorted(set(args.jobs)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            blockchain = Blockchain.from_file(
+                args.blockchain_state, check_signatures=True, jobs=jobs
+            )
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        if baseline is None:
+            baseline = elapsed
+        print(
+            f"{jobs:4d}{elapsed:10.2f}{len(blockchain.blocks) / elapsed:10,.1f}"
+            f"{baseline / elapsed:8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import hashlib
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from blockchain_poc.transaction import Transaction
+from blockchain_poc.utils import Serializable, sha256_hexdigest
+
+SIGNATURE = "0x3059301306072a8648ce3d020106082a8648ce3d030107034200049fd1c74a821d6fd87d64470471f0c1219cee937720f4db01033e3fe71f03fca58f47ec1dfabd5001371cafd6d9a572b1a3f1d21032bab8457c6e783aae972879,0x3046022100892da86e6d1274563da2232389a21fec12fb761853fc4e011cf153d91792d1c5022100a67f0eee42717bddb817e5816725489edae1cb104f6426d1f09ce6f698f06f04"
+
+
+# the mutable dataclass Transaction used to be, kept for comparison
+@dataclass
+class LegacyTransaction(Serializable):
+    sender: str
+    receiver: str
+    amount: int
+    transaction_fee: int
+    lock_time: int
+    signature: str = ""
+
+    def sha256_hash(self):
+        return sha256_hexdigest(self.serialize())
+
+    def __hash__(self):
+        digest = hashlib.sha256(self.serialize().encode()).digest()
+        return int.from_bytes(digest, "big")
+
+
+def make_transactions(cls, count: int) -> list:
+    return [
+        cls(
+            sender=f"0x{i:040x}",
+            receiver=f"0x{i + 1:040x}",
+            amount=i * 1_000_000,
+            transaction_fee=i % 100,
+            lock_time=i % 3600,
+            signature=SIGNATURE,
+        )
+        for i in range(count)
+    ]
+
+
+def bench(cls, count: int) -> dict:
+    tracemalloc.start()
+    transactions = make_transactions(cls, count)
+    start = time.perf_counter()
+    mempool = set(transactions)
+    build_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    to_remove = transactions[::10]
+    start = time.perf_counter()
+    found = sum(1 for tx in to_remove if tx in mempool)
+    mempool -= set(to_remove)
+    remove_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tx in transactions:
+        tx.sha256_hash()
+    hash_time = time.perf_counter() - start
+
+    assert found == len(to_remove)
+    return {
+        "peak_memory_mb": peak / 1e6,
+        "build_set_s": build_time,
+        "remove_10pct_s": remove_time,
+        "sha256_hash_all_s": hash_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction mempool benchmark")
+    parser.add_argument("-n", "--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    results = {
+        "legacy": bench(LegacyTransaction, args.count),
+        "frozen": bench(Transaction, args.count),
+    }
+    print(f"{args.count:,} transactions")
+    print(f"{'':20}{'legacy':>12}{'frozen':>12}")
+    for key in results["legacy"]:
+        legacy, frozen = results["legacy"][key], results["frozen"][key]
+        print(f"{key:20}{legacy:12.2f}{frozen:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import os
+import time
+from os import path
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.transaction_generator import iter_transactions, load_accounts
+
+DATA_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))), "data")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction generation benchmark")
+    parser.add_argument("-n", "--number", type=int, default=5_000)
+    parser.add_argument(
+        "-w", "--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1]
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--blockchain-state", default=path.join(DATA_DIR, "blockchain.json.gz")
+    )
+    parser.add_argument("--accounts", default=path.join(DATA_DIR, "keys.json.gz"))
+    args = parser.parse_args()
+
+    blockchain = Blockchain.from_file(args.blockchain_state)
+    accounts = load_accounts(args.accounts)
+    print(f"{args.number:,} transactions, {os.cpu_count()} CPUs")
+    for workers in args.workers:
+        start = time.perf_counter()
+        for _ in iter_transactions(
+            blockchain,
+            accounts,
+            args.number,
+            workers=workers,
+            seed=0,
+            chunk_size=args.chunk_size,
+        ):
+            pass
+        elapsed = time.perf_counter() - start
+        print(
+            f"{workers:3d} workers{elapsed:10.2f} s{args.number / elapsed:10,.0f} tx/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
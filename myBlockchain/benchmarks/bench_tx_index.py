@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+from blockchain_poc.tx_index import TransactionIndex
+from blockchain_poc.utils import to_hex
+
+
+def make_block(height: int, digests):
+    # only what TransactionIndex.add_block reads from a block
+    return SimpleNamespace(
+        header=SimpleNamespace(height=height, hash=f"0x{height:064x}"),
+        transactions=[SimpleNamespace(digest=d.__bytes__) for d in digests],
+    )
+
+
+def measure_lookups(index: TransactionIndex, hashes):
+    latencies = []
+    for tx_hash in hashes:
+        start = time.perf_counter()
+        index.lookup(tx_hash)
+        latencies.append(time.perf_counter() - start)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction index benchmark")
+    parser.add_argument("-n", "--transactions", type=int, default=20_000_000)
+    parser.add_argument("--block-size", type=int, default=1_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--max-pending", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp(prefix="tx-index-")
+    sample = []
+    try:
+        index = TransactionIndex(directory, max_pending=args.max_pending)
+        # only the time spent in the index counts, not generating the blocks
+        build_time = 0.0
+        for height in range(args.transactions // args.block_size):
+            digests = [rng.randbytes(32) for _ in range(args.block_size)]
+            if len(sample) < args.lookups and height % 7 == 0:
+                sample.extend(digests[:10])
+            block = make_block(height, digests)
+            start = time.perf_counter()
+            index.add_block(block)
+            build_time += time.perf_counter() - start
+        start = time.perf_counter()
+        index.flush()
+        build_time += time.perf_counter() - start
+        size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+        index.close()
+
+        index = TransactionIndex(directory)
+        present = [to_hex(d) for d in sample[: args.lookups]]
+        missing = [to_hex(rng.randbytes(32)) for _ in range(len(present))]
+        hit_p50, hit_p99 = measure_lookups(index, present)
+        miss_p50, miss_p99 = measure_lookups(index, missing)
+        runs = len(index._runs)
+        index.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{args.transactions:,} transactions, {runs} runs")
+    print(f"build:   {build_time:10.1f} s ({args.transactions / build_time:,.0f} tx/s)")
+    print(
+        f"size:    {size / 2**20:10.0f} MiB ({size / args.transactions:.1f} bytes/tx)"
+    )
+    print(f"lookup:  p50 {hit_p50 * 1e6:6.1f} us, p99 {hit_p99 * 1e6:6.1f} us")
+    print(f"missing: p50 {miss_p50 * 1e6:6.1f} us, p99 {miss_p99 * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Benchmarks of the core hot paths on synthetic data, run with
+python -m benchmarks.
+
+Each case times a function over several repeats and reports the best time
+per operation. Results can be saved as JSON and compared with a saved
+baseline, in which case regressions beyond a threshold are reported and
+the run fails.
+"""
+
+import argparse
+import atexit
+from dataclasses import dataclass
+import dataclasses
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from blockchain_poc import merkle
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.constants import ZERO_HASH
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.miner import Miner
+from blockchain_poc.transaction import Transaction
+from blockchain_poc.utils import open_file, to_hex
+
+from . import synthetic
+
+
+@dataclass
+class Scale:
+    accounts: int
+    blocks: int
+    txs_per_block: int
+    mempool_size: int
+    merkle_leaves: List[int]
+    signatures: int
+    difficulties: List[int]
+    mined_blocks: int
+
+
+SCALES = {
+    "small": Scale(
+        accounts=100,
+        blocks=20,
+        txs_per_block=50,
+        mempool_size=2_000,
+        merkle_leaves=[100, 1_000],
+        signatures=50,
+        difficulties=[1, 2, 3],
+        mined_blocks=8,
+    ),
+    "medium": Scale(
+        accounts=1_000,
+        blocks=100,
+        txs_per_block=100,
+        mempool_size=20_000,
+        merkle_leaves=[1_000, 10_000, 100_000],
+        signatures=200,
+        difficulties=[1, 2, 3, 4],
+        mined_blocks=8,
+    ),
+    "large": Scale(
+        accounts=10_000,
+        blocks=500,
+        txs_per_block=200,
+        mempool_size=200_000,
+        merkle_leaves=[10_000, 100_000, 1_000_000],
+        signatures=1_000,
+        difficulties=[1, 2, 3, 4, 5],
+        mined_blocks=4,
+    ),
+}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    run: Callable[[], Any]
+    # number of operations done by one call to run
+    operations: int
+    # called before each timed call, for benchmarks consuming their input
+    prepare: Optional[Callable[[], None]] = None
+
+
+class Context:
+    """Synthetic data shared by the benchmarks, built on first use."""
+
+    def __init__(self, scale: Scale, seed: int):
+        self.scale = scale
+        self.seed = seed
+        self._chain: Optional[tuple] = None
+        self._mempool_transactions: Optional[List[Transaction]] = None
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            self._chain = synthetic.make_chain(
+                self.scale.blocks,
+                self.scale.txs_per_block,
+                self.scale.accounts,
+                seed=self.seed,
+            )
+        return self._chain
+
+    @property
+    def mempool_transactions(self) -> List[Transaction]:
+        if self._mempool_transactions is None:
+            blockchain, addresses = self.chain
+            self._mempool_transactions = synthetic.make_mempool_transactions(
+                blockchain, addresses, self.scale.mempool_size, seed=self.seed
+            )
+        return self._mempool_transactions
+
+
+CASES: List[Callable[[Context], Iterator[Benchmark]]] = []
+
+
+def case(func: Callable[[Context], Iterator[Benchmark]]):
+    CASES.append(func)
+    return func
+
+
+@case
+def block_mine(context: Context) -> Iterator[Benchmark]:
+    # the same headers are mined at every repeat, so the nonce search is
+    # deterministic and its length does not vary between runs
+    transactions = context.mempool_transactions[: context.scale.txs_per_block]
+    count = context.scale.mined_blocks
+    for difficulty in context.scale.difficulties:
+
+        def run(difficulty=difficulty):
+            for i in range(count):
+                Block.mine(
+                    difficulty=difficulty,
+                    height=1,
+                    miner=synthetic.MINER,
+                    previous_block_header_hash=ZERO_HASH,
+                    timestamp=synthetic.GENESIS_TIMESTAMP + i,
+                    transactions=transactions,
+                )
+
+        yield Benchmark(f"block.mine[difficulty={difficulty}]", run, count)
+
+
+@case
+def merkle_tree(context: Context) -> Iterator[Benchmark]:
+    rng = random.Random(context.seed)
+    for size in context.scale.merkle_leaves:
+        hashes = [to_hex(rng.randbytes(32)) for _ in range(size)]
+        targets = rng.sample(hashes, 10)
+        yield Benchmark(
+            f"merkle.generate_root[{size}]",
+            lambda hashes=hashes: merkle.generate_root(hashes),
+            1,
+        )
+
+        def generate_proofs(hashes=hashes, targets=targets):
+            for target in targets:
+                merkle.generate_proof(target, hashes)
+
+        yield Benchmark(f"merkle.generate_proof[{size}]", generate_proofs, 10)
+
+
+@case
+def blockchain_state(context: Context) -> Iterator[Benchmark]:
+    blockchain, _ = context.chain
+    directory = tempfile.mkdtemp(prefix="blockchain-poc-bench-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    state_path = os.path.join(directory, "blockchain.json.gz")
+    blockchain.write_state(state_path)
+    operations = len(blockchain.blocks)
+
+    def load_state():
+        Blockchain(max_txs_per_block=blockchain.max_txs_per_block).load_state(
+            state_path
+        )
+
+    yield Benchmark("blockchain.load_state", load_state, operations)
+    yield Benchmark(
+        "blockchain.write_state",
+        lambda: blockchain.write_state(os.path.join(directory, "written.json.gz")),
+        operations,
+    )
+
+
+@case
+def transaction_signatures(context: Context) -> Iterator[Benchmark]:
+    rng = random.Random(context.seed)
+    keys = synthetic.make_signing_keys(10, rng)
+    transactions = context.mempool_transactions[: context.scale.signatures]
+    signed = []
+    for i, tx in enumerate(transactions):
+        tx = dataclasses.replace(tx)
+        tx.sign(keys[i % len(keys)], deterministic=True)
+        signed.append(tx)
+
+    def sign():
+        for i, tx in enumerate(transactions):
+            dataclasses.replace(tx).sign(keys[i % len(keys)])
+
+    def verify():
+        for tx in signed:
+            tx.verify_signature()
+
+    yield Benchmark("transaction.sign", sign, len(transactions))
+    yield Benchmark("transaction.verify_signature", verify, len(signed))
+
+
+@case
+def mempool(context: Context) -> Iterator[Benchmark]:
+    transactions = context.mempool_transactions
+    timestamp = context.chain[0].timestamp + synthetic.BLOCK_INTERVAL
+    pool = Mempool()
+
+    def fill():
+        nonlocal pool
+        pool = Mempool(transactions)
+        pool.get_live_transactions(timestamp)
+
+    def remove():
+        # blocks worth of transactions, in fee order as the miner removes them
+        live = pool.get_live_transactions(timestamp)
+        step = context.scale.txs_per_block
+        for i in range(0, len(live), step):
+            pool.remove_transactions(live[i : i + step])
+
+    yield Benchmark("mempool.add", lambda: Mempool(transactions), len(transactions))
+    yield Benchmark(
+        "mempool.get_live_transactions",
+        lambda: pool.get_live_transactions(timestamp),
+        1,
+        prepare=fill,
+    )
+    yield Benchmark("mempool.remove_transactions", remove, 1, prepare=fill)
+
+
+@case
+def miner(context: Context) -> Iterator[Benchmark]:
+    blockchain, _ = context.chain
+    timestamp = blockchain.timestamp + synthetic.BLOCK_INTERVAL
+    miner = Miner(synthetic.MINER, blockchain, Mempool(context.mempool_transactions))
+    yield Benchmark(
+        "miner.get_most_profitable_transactions",
+        lambda: miner.get_most_profitable_transactions(timestamp),
+        1,
+    )
+
+
+def iter_benchmarks(context: Context, pattern: str) -> Iterator[Benchmark]:
+    for func in CASES:
+        for benchmark in func(context):
+            if pattern in benchmark.name:
+                yield benchmark
+
+
+def measure(benchmark: Benchmark, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if benchmark.prepare is not None:
+            benchmark.prepare()
+        start = time.perf_counter()
+        benchmark.run()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "operations": benchmark.operations,
+        "best": best,
+        "median": statistics.median(timings),
+        "per_operation": best / benchmark.operations,
+        "operations_per_second": benchmark.operations / best,
+    }
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], threshold: float
+) -> List[str]:
+    """Returns the names of the benchmarks slower than in the baseline by more
+    than threshold, as a fraction of the baseline time."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["per_operation"]
+        if result["per_operation"] > before * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Core hot path benchmarks"
+    )
+    parser.add_argument("-s", "--scale", choices=SCALES, default="small")
+    parser.add_argument(
+        "-k", "--filter", default="", help="Only run benchmarks whose name contains it"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Save the results as JSON")
+    parser.add_argument("--compare", help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Slowdown reported as a regression, as a fraction of the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    baseline: Dict[str, dict] = {}
+    if args.compare:
+        with open_file(args.compare, "rt") as f:
+            baseline_report = json.load(f)
+        if baseline_report["scale"] != args.scale:
+            parser.error(
+                f"baseline was run at scale {baseline_report['scale']}, not {args.scale}"
+            )
+        baseline = baseline_report["results"]
+
+    context = Context(SCALES[args.scale], args.seed)
+    results: Dict[str, dict] = {}
+    print(f"{'benchmark':44s}{'ops/s':>14s}{'median (s)':>12s}{'change':>10s}")
+    for benchmark in iter_benchmarks(context, args.filter):
+        result = results[benchmark.name] = measure(benchmark, args.repeat)
+        change = ""
+        if benchmark.name in baseline:
+            before = baseline[benchmark.name]["per_operation"]
+            change = f"{result['per_operation'] / before - 1:+.1%}"
+        print(
+            f"{benchmark.name:44s}{result['operations_per_second']:14,.1f}"
+            f"{result['median']:12.4f}{change:>10s}"
+        )
+
+    if args.output:
+        report = {
+            "scale": args.scale,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "results": results,
+        }
+        with open_file(args.output, "wt") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = compare(results, baseline, args.threshold)
+    for name in regressions:
+        print(f"regression: {name}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,122 @@
+"""Synthetic chains and mempools for the benchmarks, reproducible from a seed."""
+
+import random
+from typing import Dict, List, Tuple
+
+from ecdsa import NIST256p, SigningKey
+
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.constants import DECIMAL_MULTIPLIER, ZERO_ADDRESS, ZERO_HASH
+from blockchain_poc.transaction import Transaction
+from blockchain_poc.utils import to_hex
+
+MINER = "0x" + "ee" * 20
+GENESIS_TIMESTAMP = 1_674_520_200
+BLOCK_INTERVAL = 10
+INITIAL_BALANCE = 1_000_000 * DECIMAL_MULTIPLIER
+
+
+def make_addresses(count: int, rng: random.Random) -> List[str]:
+    return [to_hex(rng.randbytes(20)) for _ in range(count)]
+
+
+def make_signing_keys(count: int, rng: random.Random) -> List[SigningKey]:
+    return [
+        SigningKey.generate(curve=NIST256p, entropy=rng.randbytes) for _ in range(count)
+    ]
+
+
+def make_genesis(addresses: List[str]) -> Block:
+    transactions = [
+        Transaction(
+            sender=ZERO_ADDRESS,
+            receiver=address,
+            amount=INITIAL_BALANCE,
+            transaction_fee=0,
+            lock_time=0,
+        )
+        for address in addresses
+    ]
+    return Block.mine(
+        difficulty=0,
+        height=0,
+        miner=ZERO_ADDRESS,
+        previous_block_header_hash=ZERO_HASH,
+        timestamp=GENESIS_TIMESTAMP,
+        transactions=transactions,
+    )
+
+
+def make_transfers(
+    balances: Dict[str, int],
+    addresses: List[str],
+    count: int,
+    rng: random.Random,
+    lock_time_range: Tuple[int, int] = (0, 0),
+) -> List[Transaction]:
+    """Returns transactions which can be applied in order to balances, which
+    are updated as if MINER collected the fees."""
+    transactions = []
+    while len(transactions) < count:
+        sender = rng.choice(addresses)
+        transaction_fee = rng.randint(1, 10)
+        if balances[sender] <= transaction_fee:
+            continue
+        tx = Transaction(
+            sender=sender,
+            receiver=rng.choice(addresses),
+            amount=rng.randint(0, min(balances[sender] - transaction_fee, 1_000)),
+            transaction_fee=transaction_fee,
+            lock_time=rng.randint(*lock_time_range),
+        )
+        Blockchain.update_balances(balances, tx, MINER)
+        transactions.append(tx)
+    return transactions
+
+
+def make_chain(
+    blocks: int,
+    txs_per_block: int,
+    accounts: int,
+    seed: int = 0,
+    difficulty: int = 1,
+) -> Tuple[Blockchain, List[str]]:
+    """Returns a valid chain of blocks blocks, genesis included, and the
+    addresses it funds."""
+    rng = random.Random(seed)
+    addresses = make_addresses(accounts, rng)
+    blockchain = Blockchain(max_txs_per_block=max(txs_per_block, accounts))
+    blockchain.process_block(make_genesis(addresses))
+    balances = blockchain.balances.to_dict()
+    for _ in range(blocks - 1):
+        blockchain.process_block(
+            Block.mine(
+                difficulty=difficulty,
+                height=blockchain.height + 1,
+                miner=MINER,
+                previous_block_header_hash=blockchain.head.header.hash,
+                timestamp=blockchain.timestamp + BLOCK_INTERVAL,
+                transactions=make_transfers(balances, addresses, txs_per_block, rng),
+            )
+        )
+    return blockchain, addresses
+
+
+def make_mempool_transactions(
+    blockchain: Blockchain,
+    addresses: List[str],
+    count: int,
+    seed: int = 0,
+) -> List[Transaction]:
+    """Returns transactions spending from the head of the chain, some of them
+    locked until after the next block."""
+    rng = random.Random(seed)
+    timestamp = blockchain.timestamp
+    return make_transfers(
+        blockchain.balances.to_dict(),
+        addresses,
+        count,
+        rng,
+        lock_time_range=(timestamp - BLOCK_INTERVAL, timestamp + 3 * BLOCK_INTERVAL),
+    )
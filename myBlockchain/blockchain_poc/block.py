@@ -1,13 +1,63 @@
 from __future__ import annotations
 
 from dataclasses import asdict, dataclass
-from typing import List, Optional
+import multiprocessing
+import queue
+from typing import List, Optional, cast
 
 from . import merkle
 from .block_header import BlockHeader
 from .constants import ZERO_HASH
+from .header_hasher import HeaderHasher
 from .transaction import Transaction
 
+# number of nonces a mining worker tries before checking whether it should stop
+NONCES_PER_CHECK = 1024
+
+
+def _search_nonces(header: BlockHeader, start: int, step: int, found, results):
+    hasher = HeaderHasher(header)
+    nonce = start
+    while not found.is_set():
+        stop = nonce + step * NONCES_PER_CHECK
+        result = hasher.find_nonce(nonce, step, stop)
+        if result is not None:
+            results.put(result)
+            found.set()
+            return
+        nonce = stop
+
+
+def _find_nonce_parallel(header: BlockHeader, workers: int) -> int:
+    context = multiprocessing.get_context()
+    found = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_search_nonces,
+            args=(header, start, workers, found, results),
+            daemon=True,
+        )
+        for start in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("all mining workers exited without a nonce")
+    finally:
+        found.set()
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        results.close()
+
 
 @dataclass
 class Block:
@@ -44,7 +94,14 @@ class Block:
         previous_block_header_hash: str,
         timestamp: int,
         transactions: List[Transaction],
+        workers: int = 1,
+        transactions_merkle_root: Optional[str] = None,
     ) -> Block:
+        # the Merkle root may have been computed ahead, with a block template
+        if transactions_merkle_root is None:
+            transactions_merkle_root = cls._compute_transactions_merkle_root(
+                transactions
+            )
         header = BlockHeader(
             difficulty=difficulty,
             height=height,
@@ -53,21 +110,30 @@ class Block:
             timestamp=timestamp,
             nonce=0,
             transactions_count=len(transactions),
-            transactions_merkle_root=cls._compute_transactions_merkle_root(
-                transactions
-            ),
+            transactions_merkle_root=transactions_merkle_root,
         )
-        while not header.is_below_target():
-            header.nonce += 1
+        if workers > 1:
+            header.nonce = _find_nonce_parallel(header, workers)
+            if not header.is_below_target():
+                raise RuntimeError(
+                    f"mining worker returned invalid nonce {header.nonce}"
+                )
+        else:
+            header.nonce = cast(int, HeaderHasher(header).find_nonce())
         header.hash = header.sha256_hash()
 
         return cls(header=header, transactions=transactions)
 
-    def validate(self, max_txs_per_block: int, head: Optional[Block] = None):
-        if (
-            self.header.transactions_merkle_root
-            != self.compute_transactions_merkle_root()
-        ):
+    def validate(
+        self,
+        max_txs_per_block: int,
+        head: Optional[Block] = None,
+        merkle_root: Optional[str] = None,
+    ):
+        # the Merkle root may have been computed ahead, by a sync worker
+        if merkle_root is None:
+            merkle_root = self.compute_transactions_merkle_root()
+        if self.header.transactions_merkle_root != merkle_root:
             raise ValueError("invalid transactions_merkle_root")
 
         if len(self.transactions) > max_txs_per_block:
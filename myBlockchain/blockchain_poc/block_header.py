@@ -2,6 +2,15 @@ from dataclasses import dataclass
 
 from .utils import SHA256Hashable
 
+MAX_DIFFICULTY = 6
+
+
+def difficulty_for_height(height: int) -> int:
+    difficulty = 1 + height // 50
+    if difficulty > MAX_DIFFICULTY:
+        return MAX_DIFFICULTY
+    return difficulty
+
 
 @dataclass
 class BlockHeader(SHA256Hashable):
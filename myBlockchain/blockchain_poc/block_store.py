@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from .block import Block
+
+STORE_SUFFIX = ".store"
+INDEX_FILE = "index.dat"
+SEGMENT_FILE = "blocks-{:05d}.dat"
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+FSYNC_ALWAYS = "always"
+FSYNC_ON_CLOSE = "close"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = [FSYNC_ALWAYS, FSYNC_ON_CLOSE, FSYNC_NEVER]
+
+# every record is prefixed with the payload length and its CRC32
+RECORD_HEADER = struct.Struct("<II")
+# the index holds one (segment, offset, record length) entry per height
+INDEX_ENTRY = struct.Struct("<IQI")
+
+
+class IndexEntry(NamedTuple):
+    segment: int
+    offset: int
+    length: int
+
+
+class BlockStore:
+    """Append-only store of blocks, split across segment files.
+
+    Blocks are written to the active segment before their index entry, so a
+    crash can only leave a record without an index entry or a torn index
+    entry, both of which are discarded when the store is opened again.
+
+    A read-only store ignores such incomplete writes without truncating
+    anything, so it can be opened while another process appends.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync: str = FSYNC_ON_CLOSE,
+        max_segment_size: int = DEFAULT_SEGMENT_SIZE,
+        create: bool = True,
+        read_only: bool = False,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy {fsync}")
+        if (read_only or not create) and not os.path.isdir(directory):
+            raise FileNotFoundError(f"no block store at {directory}")
+        self.directory = directory
+        self.fsync = fsync
+        self.max_segment_size = max_segment_size
+        self.read_only = read_only
+        self.index: List[IndexEntry] = []
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._segment: Optional[BinaryIO] = None
+        self._segment_id = 0
+        self._index_file: Optional[BinaryIO] = None
+        self._load_index()
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+            self._recover()
+            self._index_file = open(self._index_path, "ab")
+
+    @staticmethod
+    def is_block_store(path: str) -> bool:
+        return os.path.isdir(path) or path.rstrip("/").endswith(STORE_SUFFIX)
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_FILE.format(segment))
+
+    def _load_index(self):
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            self.index = [
+                IndexEntry(*entry) for entry in INDEX_ENTRY.iter_unpack(data[:usable])
+            ]
+        while self.index and not self._is_valid_record(self.index[-1]):
+            self.index.pop()
+
+    def _recover(self):
+        with open(self._index_path, "ab") as f:
+            f.truncate(len(self.index) * INDEX_ENTRY.size)
+        if self.index:
+            last = self.index[-1]
+            self._segment_id = last.segment
+            end = last.offset + last.length
+        else:
+            end = 0
+        # drop records which were written without their index entry
+        segment = self._segment_id
+        while os.path.exists(self._segment_path(segment)):
+            if segment == self._segment_id:
+                with open(self._segment_path(segment), "ab") as f:
+                    f.truncate(end)
+            else:
+                os.remove(self._segment_path(segment))
+            segment += 1
+
+    def _is_valid_record(self, entry: IndexEntry) -> bool:
+        path = self._segment_path(entry.segment)
+        if entry.length < RECORD_HEADER.size or not os.path.exists(path):
+            return False
+        if os.path.getsize(path) < entry.offset + entry.length:
+            return False
+        with open(path, "rb") as f:
+            f.seek(entry.offset)
+            record = f.read(entry.length)
+        length, checksum = RECORD_HEADER.unpack_from(record)
+        payload = record[RECORD_HEADER.size :]
+        return length == len(payload) and zlib.crc32(payload) == checksum
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def height(self) -> int:
+        return len(self.index) - 1
+
+    def append(self, block: Block):
+        if self._index_file is None:
+            raise ValueError("block store is read-only")
+        if block.header.height != len(self.index):
+            raise ValueError(
+                f"expected block at height {len(self.index)}, got {block.header.height}"
+            )
+        payload = json.dumps(block.to_dict()).encode()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        segment = self._open_segment(len(record))
+        offset = segment.tell()
+        segment.write(record)
+        segment.flush()
+        if self.fsync == FSYNC_ALWAYS:
+            os.fsync(segment.fileno())
+
+        entry = IndexEntry(self._segment_id, offset, len(record))
+        self._index_file.write(INDEX_ENTRY.pack(*entry))
+        self._index_file.flush()
+        if self.fsync == FSYNC_ALWAYS:
+            os.fsync(self._index_file.fileno())
+        self.index.append(entry)
+        # the memory map of the active segment does not cover the new record
+        stale_map = self._maps.pop(self._segment_id, None)
+        if stale_map is not None:
+            stale_map.close()
+
+    def append_blocks(self, blocks: Iterable[Block]):
+        for block in blocks:
+            self.append(block)
+
+    def _open_segment(self, record_length: int) -> BinaryIO:
+        if self._segment is None:
+            self._segment = open(self._segment_path(self._segment_id), "ab")
+        position = self._segment.tell()
+        if position > 0 and position + record_length > self.max_segment_size:
+            self._sync_segment()
+            self._segment.close()
+            self._segment_id += 1
+            self._segment = open(self._segment_path(self._segment_id), "ab")
+            if self.fsync == FSYNC_ALWAYS:
+                self._sync_directory()
+        return self._segment
+
+    def _map_segment(self, segment: int) -> mmap.mmap:
+        segment_map = self._maps.get(segment)
+        if segment_map is None:
+            with open(self._segment_path(segment), "rb") as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = segment_map
+        return segment_map
+
+    def read_block(self, height: int) -> Block:
+        if height < 0:
+            height += len(self.index)
+        if not 0 <= height < len(self.index):
+            raise IndexError(f"no block at height {height}")
+        entry = self.index[height]
+        segment_map = self._map_segment(entry.segment)
+        start = entry.offset + RECORD_HEADER.size
+        length, checksum = RECORD_HEADER.unpack_from(segment_map, entry.offset)
+        payload = segment_map[start : start + length]
+        if zlib.crc32(payload) != checksum:
+            raise ValueError(f"corrupted record for block {height}")
+        return Block.from_dict(json.loads(payload))
+
+    def iter_blocks(self, start: int = 0) -> Iterator[Block]:
+        for height in range(start, len(self.index)):
+            yield self.read_block(height)
+
+    def _sync_segment(self):
+        if self._segment is not None and self.fsync != FSYNC_NEVER:
+            os.fsync(self._segment.fileno())
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def flush(self):
+        if self.fsync == FSYNC_NEVER or self._index_file is None:
+            return
+        self._sync_segment()
+        os.fsync(self._index_file.fileno())
+        self._sync_directory()
+
+    def close(self):
+        self.flush()
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps.clear()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def __enter__(self) -> BlockStore:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
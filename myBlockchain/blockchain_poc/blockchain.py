@@ -1,43 +1,295 @@
 from __future__ import annotations
-import json
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from contextlib import closing
+import itertools
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional, Sequence
 
-from . import merkle
+from . import codec, execution, merkle, sync
 from .block import Block
-from .constants import ZERO_ADDRESS
-from .transaction import Transaction
-from .utils import open_file
+from .block_header import difficulty_for_height
+from .block_store import FSYNC_ON_CLOSE, BlockStore
+from .constants import ZERO_ADDRESS, ZERO_HASH
+from .journal import BlockUndo, UndoJournal
+from .ledger import Ledger
+from .snapshot import (
+    BalanceSnapshot,
+    balances_checksum,
+    find_latest_snapshot,
+    latest_snapshot_height,
+    list_snapshots,
+)
+from .transaction import Transaction, verify_signatures
+from .tx_index import Location, TransactionIndex
+
+
+def iter_state_blocks(state_path: str) -> Iterator[Block]:
+    if BlockStore.is_block_store(state_path):
+        with BlockStore(state_path, read_only=True) as store:
+            yield from store.iter_blocks()
+    else:
+        yield from codec.read_blocks(state_path)
 
 
 class Blockchain:
-    def __init__(self, max_txs_per_block: int = 100):
+    def __init__(
+        self,
+        max_txs_per_block: int = 100,
+        check_signatures: bool = False,
+        max_merkle_tree_nodes: int = 1_000_000,
+        max_reorg_depth: int = 100,
+    ):
         self.blocks: List[Block] = []
         self.max_txs_per_block = max_txs_per_block
-        self.balances = {}
+        self.check_signatures = check_signatures
+        self.balances = Ledger()
+        # per-block undo entries of the last max_reorg_depth blocks, processed
+        # or restored from a journal, so that they can be rolled back
+        self.max_reorg_depth = max_reorg_depth
+        self.undo_journal: Dict[int, BlockUndo] = {}
+        self.journal: Optional[UndoJournal] = None
+        self.tx_index: Optional[TransactionIndex] = None
+        # least recently used Merkle trees are evicted once the trees hold
+        # more than max_merkle_tree_nodes hashes in total
+        self.max_merkle_tree_nodes = max_merkle_tree_nodes
+        self.merkle_trees: OrderedDict[int, merkle.MerkleTree] = OrderedDict()
+        self._merkle_tree_nodes = 0
 
     @classmethod
-    def from_file(cls, filename: str, max_txs_per_block: int = 100) -> Blockchain:
-        blockchain = cls(max_txs_per_block)
-        blockchain.load_state(filename)
+    def from_file(
+        cls,
+        filename: str,
+        max_txs_per_block: int = 100,
+        check_signatures: bool = False,
+        snapshot_dir: Optional[str] = None,
+        journal_path: Optional[str] = None,
+        tx_index_path: Optional[str] = None,
+        jobs: int = 1,
+        max_reorg_depth: int = 100,
+    ) -> Blockchain:
+        blockchain = cls(
+            max_txs_per_block,
+            check_signatures=check_signatures,
+            max_reorg_depth=max_reorg_depth,
+        )
+        blockchain.load_state(
+            filename, snapshot_dir=snapshot_dir, journal_path=journal_path, jobs=jobs
+        )
+        if tx_index_path is not None:
+            blockchain.attach_tx_index(TransactionIndex(tx_index_path))
         return blockchain
 
-    def load_state(self, state_path: str):
-        with open_file(state_path, "r") as f:
-            state = json.load(f)
-        for block in state:
-            self.process_block(Block.from_dict(block))
+    def load_state(
+        self,
+        state_path: str,
+        snapshot_dir: Optional[str] = None,
+        journal_path: Optional[str] = None,
+        jobs: int = 1,
+    ):
+        blocks: Iterable[Block] = iter_state_blocks(state_path)
+        if snapshot_dir is not None:
+            blocks = self.skip_to_snapshot(blocks, snapshot_dir)
+        self.process_blocks(blocks, jobs=jobs)
+        if journal_path is not None:
+            self.attach_journal(UndoJournal(journal_path, self.max_reorg_depth))
+
+    def skip_to_snapshot(
+        self, blocks: Iterable[Block], snapshot_dir: str
+    ) -> Iterator[Block]:
+        """Reads blocks up to the height of the newest snapshot and restores
+        the newest snapshot matching them. Returns the blocks left to process,
+        including those read past the restored snapshot."""
+        if self.blocks:
+            raise ValueError("cannot restore a snapshot on a non-empty chain")
+        blocks = iter(blocks)
+        height = latest_snapshot_height(snapshot_dir)
+        self._append_linked(itertools.islice(blocks, height + 1))
+        # skips snapshots whose balances do not match their checksum
+        snapshot = find_latest_snapshot(snapshot_dir, self.blocks)
+        restored = snapshot.height + 1 if snapshot is not None else 0
+        # blocks read past the restored snapshot, when newer ones do not match
+        read_past = self.blocks[restored:]
+        del self.blocks[restored:]
+        if snapshot is not None:
+            self.balances = Ledger(snapshot.balances)
+        return itertools.chain(read_past, blocks)
+
+    def restore_snapshot(self, snapshot: BalanceSnapshot, blocks: List[Block]):
+        if self.blocks:
+            raise ValueError("cannot restore a snapshot on a non-empty chain")
+        snapshot.verify(blocks)
+        try:
+            self._append_linked(blocks)
+        except ValueError:
+            self.blocks.clear()
+            raise
+        self.balances = Ledger(snapshot.balances)
+
+    def _append_linked(self, blocks: Iterable[Block]):
+        # blocks covered by a snapshot are only checked to form a chain: their
+        # transactions are neither validated nor replayed
+        previous_hash = self.head.header.hash if self.blocks else ZERO_HASH
+        for block in blocks:
+            if block.header.height != len(self.blocks):
+                raise ValueError("invalid height")
+            if block.header.previous_block_header_hash != previous_hash:
+                raise ValueError("invalid previous_block_header_hash")
+            previous_hash = block.header.hash
+            self.blocks.append(block)
 
-    def write_state(self, state_path: str):
-        blocks = [b.to_dict() for b in self.blocks]
-        with open_file(state_path, "wt") as f:
-            json.dump(blocks, f)
+    def create_snapshot(self) -> BalanceSnapshot:
+        balances = self.balances.to_dict()
+        return BalanceSnapshot(
+            height=self.height,
+            head_hash=self.head.header.hash,
+            balances=balances,
+            checksum=balances_checksum(balances),
+        )
+
+    def attach_tx_index(self, tx_index: TransactionIndex):
+        """Indexes the blocks the index does not cover yet, then keeps it up
+        to date. An index that does not match the chain is rebuilt."""
+        height = tx_index.height
+        if height >= len(self.blocks) or (
+            height >= 0 and self.blocks[height].header.hash != tx_index.head_hash
+        ):
+            tx_index.clear()
+        if tx_index.height + 1 < len(self.blocks):
+            for block in self.blocks[tx_index.height + 1 :]:
+                tx_index.add_block(block)
+            tx_index.flush()
+        self.tx_index = tx_index
+
+    def attach_journal(self, journal: UndoJournal):
+        """Restores the entries of the journal matching the chain, and the
+        blocks processed since then, then keeps the journal up to date."""
+        entries = journal.read(self.blocks)
+        lowest = len(self.blocks) - self.max_reorg_depth
+        for height, undo in entries.items():
+            if height >= lowest:
+                self.undo_journal.setdefault(height, undo)
+        for height, undo in sorted(self.undo_journal.items()):
+            if height not in entries:
+                journal.append(height, self.blocks[height].header.hash, undo)
+        self.journal = journal
+
+    def write_state(self, state_path: str, fsync: str = FSYNC_ON_CLOSE):
+        if BlockStore.is_block_store(state_path):
+            with BlockStore(state_path, fsync=fsync) as store:
+                self.append_to_store(store)
+            return
+        codec.write_blocks(state_path, self.blocks)
+
+    def append_to_store(self, store: BlockStore):
+        stored = len(store)
+        if stored > len(self.blocks):
+            raise ValueError("block store is ahead of the chain")
+        if stored > 0:
+            stored_head = store.read_block(stored - 1)
+            if stored_head.header.hash != self.blocks[stored - 1].header.hash:
+                raise ValueError("block store does not match the chain")
+        store.append_blocks(self.blocks[stored:])
 
-    def process_block(self, block: Block):
+    def process_blocks(self, blocks: Iterable[Block], jobs: int = 1):
+        """Processes blocks in order. With several jobs, their stateless checks
+        run ahead in worker processes (see sync)."""
+        if jobs <= 1:
+            for block in blocks:
+                self.process_block(block)
+            return
+        # closed as soon as a block fails, to stop the workers without
+        # waiting for the generator to be collected
+        checked = sync.iter_checked_blocks(blocks, self.check_signatures, jobs)
+        with closing(checked):
+            for block, checks in checked:
+                self.process_block(block, checks)
+
+    def process_block(self, block: Block, checks: Optional[sync.BlockChecks] = None):
         head = self.head if len(self.blocks) > 0 else None
-        block.validate(self.max_txs_per_block, head=head)
-        for tx in block.transactions:
-            self.process_transaction(block.header.miner, block.header.height, tx)
+        block.validate(
+            self.max_txs_per_block,
+            head=head,
+            merkle_root=checks.merkle_root if checks is not None else None,
+        )
+        if self.check_signatures and block.header.height > 0:
+            if checks is None or not checks.signatures_checked:
+                self.validate_signatures(block.transactions)
+            elif checks.invalid_signature is not None:
+                tx = block.transactions[checks.invalid_signature]
+                raise ValueError(f"invalid signature for {tx.sha256_hash()}")
+        undo: BlockUndo = {}
+        miner, height = block.header.miner, block.header.height
+        try:
+            if len(block.transactions) >= execution.MIN_BATCH_SIZE:
+                touched = ((tx.sender, miner, tx.receiver) for tx in block.transactions)
+                for address in dict.fromkeys(itertools.chain.from_iterable(touched)):
+                    undo[address] = self.balances.get(address)
+                execution.execute_transactions(self, miner, height, block.transactions)
+            else:
+                for tx in block.transactions:
+                    for address in (tx.sender, miner, tx.receiver):
+                        if address not in undo:
+                            undo[address] = self.balances.get(address)
+                    self.process_transaction(miner, height, tx)
+        except Exception:
+            # a block is applied entirely or not at all
+            self._apply_undo(undo)
+            raise
         self.blocks.append(block)
+        self.undo_journal[height] = undo
+        self.undo_journal.pop(height - self.max_reorg_depth, None)
+        if self.journal is not None:
+            self.journal.append(height, block.header.hash, undo)
+        if self.tx_index is not None:
+            self.tx_index.add_block(block)
+
+    def _apply_undo(self, undo: BlockUndo):
+        for address, balance in undo.items():
+            if balance is None:
+                self.balances.pop(address, None)
+            else:
+                self.balances[address] = balance
+
+    def rollback(self, n: int) -> List[Block]:
+        """Removes the last n blocks and returns them, oldest first."""
+        if not 0 <= n <= len(self.blocks):
+            raise ValueError(f"cannot roll back {n} blocks")
+        heights = range(len(self.blocks) - n, len(self.blocks))
+        missing = [h for h in heights if h not in self.undo_journal]
+        if missing:
+            raise ValueError(f"no undo journal for block {missing[-1]}")
+        for height in reversed(heights):
+            self._apply_undo(self.undo_journal.pop(height))
+            tree = self.merkle_trees.pop(height, None)
+            if tree is not None:
+                self._merkle_tree_nodes -= tree.node_count
+        removed = self.blocks[len(self.blocks) - n :]
+        del self.blocks[len(self.blocks) - n :]
+        if self.tx_index is not None:
+            head_hash = self.head.header.hash if self.blocks else ZERO_HASH
+            self.tx_index.rewind(len(self.blocks) - 1, head_hash)
+        return removed
+
+    def reorganize_to(self, blocks: List[Block]) -> List[Block]:
+        """Replaces the blocks from the height of blocks[0] onwards by blocks.
+
+        If a block of the new branch is invalid, the previous branch is
+        restored before the error is raised. Returns the replaced blocks.
+        """
+        if not blocks:
+            raise ValueError("empty branch")
+        fork_height = blocks[0].header.height
+        if not 0 <= fork_height <= len(self.blocks):
+            raise ValueError(f"branch does not connect at height {fork_height}")
+        removed = self.rollback(len(self.blocks) - fork_height)
+        try:
+            for block in blocks:
+                self.process_block(block)
+        except Exception:
+            self.rollback(len(self.blocks) - fork_height)
+            for block in removed:
+                self.process_block(block)
+            raise
+        return removed
 
     def process_transaction(self, miner: str, height: int, transaction: Transaction):
         if height > 0:
@@ -51,29 +303,81 @@ class Blockchain:
                 raise ValueError("invalid sender")
         self.update_balances(self.balances, transaction, miner)
 
+    @staticmethod
+    def validate_signatures(transactions: List[Transaction]):
+        for tx, valid in zip(transactions, verify_signatures(transactions)):
+            if not valid:
+                raise ValueError(f"invalid signature for {tx.sha256_hash()}")
+
     @staticmethod
     def update_balances(
-        balances: Dict[str, int], tx: Transaction, miner: Optional[str] = None
+        balances: MutableMapping[str, int],
+        tx: Transaction,
+        miner: Optional[str] = None,
     ):
+        if isinstance(balances, Ledger):
+            sender = tx.sender if tx.sender != ZERO_ADDRESS else None
+            balances.transfer(sender, tx.receiver, tx.amount, tx.transaction_fee, miner)
+            return
         if tx.sender != ZERO_ADDRESS:
             balances[tx.sender] -= tx.amount + tx.transaction_fee
         if miner:
             balances[miner] = tx.transaction_fee + balances.get(miner, 0)
         balances[tx.receiver] = tx.amount + balances.get(tx.receiver, 0)
 
+    def get_merkle_tree(self, block_height: int) -> merkle.MerkleTree:
+        tree = self.merkle_trees.get(block_height)
+        if tree is not None:
+            self.merkle_trees.move_to_end(block_height)
+            return tree
+        block = self.blocks[block_height]
+        tree = merkle.MerkleTree([t.sha256_hash() for t in block.transactions])
+        self.merkle_trees[block_height] = tree
+        self._merkle_tree_nodes += tree.node_count
+        while (
+            self._merkle_tree_nodes > self.max_merkle_tree_nodes
+            and len(self.merkle_trees) > 1
+        ):
+            _, evicted = self.merkle_trees.popitem(last=False)
+            self._merkle_tree_nodes -= evicted.node_count
+        return tree
+
     def generate_inclusion_proof(
         self, block_height: int, transaction_hash: str
     ) -> List[str]:
-        block = self.blocks[block_height]
-        return merkle.generate_proof(
-            transaction_hash, [t.sha256_hash() for t in block.transactions]
-        )
+        return self.get_merkle_tree(block_height).generate_proof(transaction_hash)
+
+    def generate_inclusion_multiproof(
+        self, block_height: int, transaction_hashes: Sequence[str]
+    ) -> dict:
+        tree = self.get_merkle_tree(block_height)
+        return tree.generate_multiproof(transaction_hashes)
+
+    def find_transaction(self, transaction_hash: str) -> Optional[Location]:
+        """Returns the height and position of a transaction in the chain, using
+        the transaction index if there is one, or walking the blocks."""
+        candidates: Iterable[Location]
+        if self.tx_index is not None:
+            candidates = self.tx_index.lookup(transaction_hash)
+        else:
+            candidates = (
+                (height, position)
+                for height in reversed(range(len(self.blocks)))
+                for position in range(len(self.blocks[height].transactions))
+            )
+        for height, position in candidates:
+            if height >= len(self.blocks):
+                continue
+            transactions = self.blocks[height].transactions
+            if (
+                position < len(transactions)
+                and transactions[position].sha256_hash() == transaction_hash
+            ):
+                return height, position
+        return None
 
     def get_next_difficulty(self):
-        difficulty = 1 + (self.height + 1) // 50
-        if difficulty > 6:
-            return 6
-        return difficulty
+        return difficulty_for_height(self.height + 1)
 
     def verify_inclusion_proof(
         self, block_height: int, transaction_hash: str, proof: List[str]
@@ -81,6 +385,12 @@ class Blockchain:
         merkle_root = self.blocks[block_height].header.transactions_merkle_root
         return merkle.verify_proof(transaction_hash, merkle_root, proof)
 
+    def verify_inclusion_multiproof(
+        self, block_height: int, transaction_hashes: Sequence[str], proof: dict
+    ) -> bool:
+        merkle_root = self.blocks[block_height].header.transactions_merkle_root
+        return merkle.verify_multiproof(transaction_hashes, merkle_root, proof)
+
     @property
     def height(self) -> int:
         return self.head.header.height
@@ -94,3 +404,25 @@ class Blockchain:
         if len(self.blocks) == 0:
             raise ValueError("chain is not initialized")
         return self.blocks[-1]
+
+
+def verify_snapshots(
+    state_path: str, snapshot_dir: str, max_txs_per_block: int = 100
+) -> Dict[str, bool]:
+    snapshots = {}
+    for filename in list_snapshots(snapshot_dir):
+        snapshot = BalanceSnapshot.from_file(filename)
+        snapshots.setdefault(snapshot.height, []).append((filename, snapshot))
+
+    results = {}
+    blockchain = Blockchain(max_txs_per_block)
+    for block in iter_state_blocks(state_path):
+        blockchain.process_block(block)
+        for filename, snapshot in snapshots.pop(block.header.height, []):
+            results[filename] = snapshot.head_hash == block.header.hash and (
+                snapshot.balances == blockchain.balances.to_dict()
+            )
+    for entries in snapshots.values():
+        for filename, _ in entries:
+            results[filename] = False
+    return results
@@ -1,19 +1,79 @@
 import argparse
+import asyncio
 import json
+import sys
+from typing import Iterable, Optional
 
 from .block import Block
+from .block_store import FSYNC_ON_CLOSE, FSYNC_POLICIES, STORE_SUFFIX, BlockStore
 from .transaction import Transaction
-from .blockchain import Blockchain
+from .blockchain import Blockchain, verify_snapshots
+from .header_chain import HeaderChain
 from .mempool import Mempool
-from .miner import Miner
-from . import transaction_generator
+from .miner import ContinuousMiner, Miner
+from . import codec, node, server, stats, transaction_generator
+from .snapshot import write_snapshot
 from .utils import open_file
 
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 parser = argparse.ArgumentParser(
     prog="blockchain_poc", description="Proof of Concept blockchain implementation"
 )
 parser.add_argument(
-    "--blockchain-state", required=True, help="Path to blockchain state file"
+    "--blockchain-state",
+    required=True,
+    help="Path to blockchain state file or block store directory",
+)
+parser.add_argument(
+    "--check-signatures",
+    action="store_true",
+    help="Verify transaction signatures when loading the blockchain state",
+)
+parser.add_argument(
+    "--snapshot-dir",
+    help="Directory of balance snapshots used to speed up loading the state",
+)
+parser.add_argument(
+    "--tx-index",
+    help="Directory of the transaction hash index, created or brought up to date when loading the state",
+)
+parser.add_argument(
+    "--journal",
+    help="Balance undo journal file, read when loading the state and updated by the commands writing it",
+)
+parser.add_argument(
+    "--reorg-depth",
+    type=int,
+    default=100,
+    help="Number of last blocks that can be rolled back, whose undo entries are kept in memory and in the journal",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=1,
+    help="Number of processes checking Merkle roots and signatures when loading the state",
+)
+parser.add_argument(
+    "--stats",
+    action="store_true",
+    help="Time the hot paths and print a summary to stderr when the command ends",
+)
+parser.add_argument(
+    "--stats-output",
+    help="File to write the stats to when the command ends, implies --stats",
+)
+parser.add_argument(
+    "--stats-format",
+    choices=["json", "prometheus"],
+    default="json",
+    help="Format of the --stats-output file",
 )
 
 subparsers = parser.add_subparsers(dest="command", help="Command to run")
@@ -36,6 +96,30 @@ produce_blocks_parser.add_argument(
     default="0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c",
     help="Address of the miner",
 )
+produce_blocks_parser.add_argument(
+    "--fsync",
+    choices=FSYNC_POLICIES,
+    default=FSYNC_ON_CLOSE,
+    help="When to fsync a block store output",
+)
+produce_blocks_parser.add_argument(
+    "--snapshot-interval",
+    type=int,
+    default=0,
+    help="Write a balance snapshot every N heights (requires --snapshot-dir)",
+)
+produce_blocks_parser.add_argument(
+    "--workers",
+    type=positive_int,
+    default=1,
+    help="Number of processes to use for the proof-of-work search",
+)
+produce_blocks_parser.add_argument(
+    "--continuous",
+    action="store_true",
+    help="Keep the workers hashing while the next block template is built, "
+    "and print template latency and hashing share",
+)
 
 
 transaction_hash_parser = subparsers.add_parser(
@@ -49,7 +133,12 @@ transaction_hash_parser.add_argument(
 generate_proof_parser = subparsers.add_parser(
     "generate-proof", help="Generate an inclusion proof for a transaction"
 )
-generate_proof_parser.add_argument("block", type=int, help="Block number")
+generate_proof_parser.add_argument(
+    "block",
+    type=int,
+    nargs="?",
+    help="Block number (default: looked up from the transaction hash)",
+)
 generate_proof_parser.add_argument(
     "hash", help="Hash of thee transaction for which to produce the proof"
 )
@@ -57,10 +146,151 @@ generate_proof_parser.add_argument(
     "-o", "--output", help="Output file for the proof (default: stdout)"
 )
 
+generate_multiproof_parser = subparsers.add_parser(
+    "generate-multiproof",
+    help="Generate a single inclusion proof for several transactions of a block",
+)
+generate_multiproof_parser.add_argument(
+    "hash", nargs="*", help="Hashes of the transactions to prove"
+)
+generate_multiproof_parser.add_argument(
+    "-f", "--hashes-file", help="File with more transaction hashes, one per line"
+)
+generate_multiproof_parser.add_argument(
+    "--block",
+    type=int,
+    help="Block number (default: looked up from the first transaction hash)",
+)
+generate_multiproof_parser.add_argument(
+    "-o", "--output", help="Output file for the proof (default: stdout)"
+)
+
+find_transaction_parser = subparsers.add_parser(
+    "find-tx", help="Find the block and position of a transaction"
+)
+find_transaction_parser.add_argument("hash", help="Hash of the transaction")
+
 verify_proof_parser = subparsers.add_parser(
-    "verify-proof", help="Verify an inclusion proof for a transaction"
+    "verify-proof", help="Verify inclusion proofs and multiproofs"
+)
+verify_proof_parser.add_argument(
+    "proof", nargs="+", help="Files containing the JSON proofs"
+)
+verify_proof_parser.add_argument(
+    "--strict",
+    action="store_true",
+    help="Also recompute every header hash, which legacy chains do not pass",
+)
+
+convert_parser = subparsers.add_parser(
+    "convert",
+    help="Write the blockchain state or a mempool to another file or block store",
+)
+convert_parser.add_argument(
+    "-o",
+    "--output",
+    required=True,
+    help=f"Output file, in the binary format if it ends in .bin or .bin.gz, or block store directory (existing or ending in {STORE_SUFFIX})",
+)
+convert_parser.add_argument(
+    "--mempool",
+    help="Convert this mempool file instead of the blockchain state",
+)
+convert_parser.add_argument(
+    "--headers-only",
+    action="store_true",
+    help="Only write the block headers, for use with verify-proof",
+)
+convert_parser.add_argument(
+    "--fsync",
+    choices=FSYNC_POLICIES,
+    default=FSYNC_ON_CLOSE,
+    help="When to fsync a block store output",
+)
+
+snapshot_parser = subparsers.add_parser(
+    "snapshot", help="Create or verify balance snapshots (requires --snapshot-dir)"
+)
+snapshot_parser.add_argument(
+    "action",
+    choices=["create", "verify"],
+    help="Snapshot the balances at the head, or replay the chain to check snapshots",
+)
+
+node_parser = subparsers.add_parser(
+    "node", help="Run a node gossiping transactions and blocks with its peers"
+)
+node_parser.add_argument(
+    "--listen", default="127.0.0.1:8333", help="Address to listen on (HOST:PORT)"
+)
+node_parser.add_argument(
+    "--peer",
+    action="append",
+    default=[],
+    help="Address of a peer to connect to (HOST:PORT), can be repeated",
+)
+node_parser.add_argument("--mempool", help="Path to the initial mempool file")
+node_parser.add_argument(
+    "--mempool-max-count",
+    type=int,
+    help="Number of transactions past which the lowest-fee ones are evicted",
+)
+node_parser.add_argument(
+    "--mempool-max-bytes",
+    type=int,
+    help="Memory, in bytes, past which the lowest-fee transactions are evicted",
+)
+node_parser.add_argument(
+    "--mempool-expiry",
+    type=int,
+    help="Seconds after their lock time past which transactions are dropped",
+)
+node_parser.add_argument(
+    "--max-pending",
+    type=int,
+    default=1024,
+    help="Number of received items waiting for validation before reading from peers stops",
+)
+node_parser.add_argument(
+    "--stats-interval",
+    type=float,
+    default=0,
+    help="Print the node counters every N seconds",
+)
+node_parser.add_argument(
+    "--blockchain-output", help="Path to write the blockchain to on exit"
+)
+node_parser.add_argument(
+    "--mempool-output", help="Path to write the mempool to on exit"
+)
+
+serve_parser = subparsers.add_parser(
+    "serve",
+    help="Keep the blockchain in memory and answer tx-hash and proof queries over HTTP",
+)
+serve_parser.add_argument(
+    "--listen", default="127.0.0.1:8080", help="Address to listen on (HOST:PORT)"
+)
+serve_parser.add_argument(
+    "--unix-socket", help="Listen on this Unix socket instead of a TCP port"
+)
+serve_parser.add_argument(
+    "--poll-interval",
+    type=float,
+    default=1.0,
+    help="Seconds between checks for new blocks in the state (0 to disable)",
+)
+serve_parser.add_argument(
+    "-v", "--verbose", action="store_true", help="Log every request"
+)
+
+rollback_parser = subparsers.add_parser(
+    "rollback", help="Remove the last blocks using the undo journal"
+)
+rollback_parser.add_argument("number", type=int, help="Number of blocks to remove")
+rollback_parser.add_argument(
+    "-o", "--output", required=True, help="Output file or new block store directory"
 )
-verify_proof_parser.add_argument("proof", help="File containig the JSON proof")
 
 generate_transactions_parser = subparsers.add_parser(
     "generate-txs", help="Generate transactions"
@@ -78,68 +308,280 @@ generate_transactions_parser.add_argument(
 generate_transactions_parser.add_argument(
     "-o", "--output", required=True, help="Output file for the transactions"
 )
+generate_transactions_parser.add_argument(
+    "--workers",
+    type=positive_int,
+    default=1,
+    help="Number of processes signing the transactions",
+)
+generate_transactions_parser.add_argument(
+    "--seed",
+    type=int,
+    help="Seed of the random generator, for a reproducible output",
+)
+generate_transactions_parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=1000,
+    help="Number of transactions signed and written at a time",
+)
+
+
+def load_blockchain(args) -> Blockchain:
+    return Blockchain.from_file(
+        args.blockchain_state,
+        check_signatures=args.check_signatures,
+        snapshot_dir=args.snapshot_dir,
+        journal_path=args.journal,
+        tx_index_path=args.tx_index,
+        jobs=args.jobs,
+        max_reorg_depth=args.reorg_depth,
+    )
+
+
+def save_chain_metadata(args, blockchain: Blockchain):
+    if blockchain.journal is not None:
+        blockchain.journal.flush()
+    if blockchain.tx_index is not None:
+        blockchain.tx_index.close()
 
 
 def produce_blocks(args):
-    blockchain = Blockchain.from_file(args.blockchain_state)
+    blockchain = load_blockchain(args)
     mempool = Mempool.from_file(args.mempool)
-    miner = Miner(args.miner_address, blockchain, mempool)
-    for _ in range(args.number):
-        miner.mine_next()
-    blockchain.write_state(args.blockchain_output)
+    blocks: Iterable[Block]
+    if args.continuous:
+        miner = ContinuousMiner(
+            args.miner_address, blockchain, mempool, workers=args.workers
+        )
+        blocks = miner.iter_blocks(args.number)
+    else:
+        miner = Miner(args.miner_address, blockchain, mempool, workers=args.workers)
+        blocks = (miner.mine_next() for _ in range(args.number))
+    for block in blocks:
+        if (
+            args.snapshot_dir
+            and args.snapshot_interval
+            and block.header.height % args.snapshot_interval == 0
+        ):
+            write_snapshot(blockchain.create_snapshot(), args.snapshot_dir)
+    if isinstance(miner, ContinuousMiner):
+        print(miner.report.summary(), file=sys.stderr)
+    blockchain.write_state(args.blockchain_output, fsync=args.fsync)
+    save_chain_metadata(args, blockchain)
     mempool.to_file(args.mempool_output)
 
 
 def get_transaction_hash(args):
-    blockchain = Blockchain.from_file(args.blockchain_state)
-    block: Block = blockchain.blocks[args.block]
+    block: Block
+    if BlockStore.is_block_store(args.blockchain_state):
+        with BlockStore(args.blockchain_state, read_only=True) as store:
+            block = store.read_block(args.block)
+    else:
+        block = load_blockchain(args).blocks[args.block]
     tx: Transaction = block.transactions[args.index]
     print(tx.sha256_hash())
 
 
+def snapshot(args):
+    if args.snapshot_dir is None:
+        parser.error("snapshot requires --snapshot-dir")
+    if args.action == "create":
+        blockchain = load_blockchain(args)
+        print(write_snapshot(blockchain.create_snapshot(), args.snapshot_dir))
+        return
+
+    results = verify_snapshots(args.blockchain_state, args.snapshot_dir)
+    for filename, valid in sorted(results.items()):
+        print(f"{filename}: {'valid' if valid else 'invalid'}")
+    if not all(results.values()):
+        sys.exit(1)
+
+
+def convert(args):
+    if args.mempool:
+        codec.write_transactions(args.output, codec.read_transactions(args.mempool))
+        return
+    if args.headers_only:
+        chain = HeaderChain.from_file(args.blockchain_state)
+        chain.write_state(args.output)
+        return
+    blockchain = load_blockchain(args)
+    blockchain.write_state(args.output, fsync=args.fsync)
+
+
+def run_node(args):
+    blockchain = load_blockchain(args)
+    limits = dict(
+        max_count=args.mempool_max_count,
+        max_bytes=args.mempool_max_bytes,
+        expiry=args.mempool_expiry,
+    )
+    if args.mempool:
+        mempool = Mempool.from_file(args.mempool, **limits)
+    else:
+        mempool = Mempool(**limits)
+    host, port = node.parse_address(args.listen)
+    gossip_node = node.Node(
+        blockchain, mempool, host=host, port=port, max_pending=args.max_pending
+    )
+    try:
+        asyncio.run(node.run_node(gossip_node, args.peer, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+    if args.blockchain_output:
+        blockchain.write_state(args.blockchain_output)
+    save_chain_metadata(args, blockchain)
+    if args.mempool_output:
+        mempool.to_file(args.mempool_output)
+
+
+def serve(args):
+    service = server.QueryService(args.blockchain_state, lambda: load_blockchain(args))
+    try:
+        server.serve(
+            service,
+            address=node.parse_address(args.listen),
+            unix_socket=args.unix_socket,
+            poll_interval=args.poll_interval,
+            verbose=args.verbose,
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+def rollback(args):
+    blockchain = load_blockchain(args)
+    removed = blockchain.rollback(args.number)
+    blockchain.write_state(args.output)
+    save_chain_metadata(args, blockchain)
+    for block in removed:
+        print(block.header.hash)
+
+
+def find_transaction(args):
+    blockchain = load_blockchain(args)
+    location = blockchain.find_transaction(args.hash)
+    if location is None:
+        print(f"transaction {args.hash} not found", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps({"block": location[0], "index": location[1]}))
+
+
 def generate_proof(args):
-    blockchain = Blockchain.from_file(args.blockchain_state)
-    proof = blockchain.generate_inclusion_proof(args.block, args.hash)
+    blockchain = load_blockchain(args)
+    block = args.block
+    if block is None:
+        location = blockchain.find_transaction(args.hash)
+        if location is None:
+            print(f"transaction {args.hash} not found", file=sys.stderr)
+            sys.exit(1)
+        block = location[0]
+    proof = blockchain.generate_inclusion_proof(block, args.hash)
     full_proof = {
-        "block": args.block,
+        "block": block,
         "hash": args.hash,
         "proof": proof,
     }
-    if args.output:
-        with open(args.output, "w") as f:
+    write_proof(full_proof, args.output)
+
+
+def generate_multiproof(args):
+    hashes = list(args.hash)
+    if args.hashes_file:
+        with open_file(args.hashes_file, "rt") as f:
+            hashes.extend(line.strip() for line in f if line.strip())
+    if not hashes:
+        parser.error("generate-multiproof requires transaction hashes")
+    hashes = list(dict.fromkeys(hashes))
+    blockchain = load_blockchain(args)
+    block = args.block
+    if block is None:
+        location = blockchain.find_transaction(hashes[0])
+        if location is None:
+            print(f"transaction {hashes[0]} not found", file=sys.stderr)
+            sys.exit(1)
+        block = location[0]
+    proof = blockchain.generate_inclusion_multiproof(block, hashes)
+    write_proof({"block": block, "hashes": hashes, "proof": proof}, args.output)
+
+
+def write_proof(full_proof: dict, output: Optional[str]):
+    if output:
+        with open(output, "w") as f:
             json.dump(full_proof, f)
     else:
         print(json.dumps(full_proof, indent=2))
 
 
 def verify_proof(args):
-    blockchain = Blockchain.from_file(args.blockchain_state)
-    with open(args.proof) as f:
-        proof = json.load(f)
-    if blockchain.verify_inclusion_proof(proof["block"], proof["hash"], proof["proof"]):
-        print("proof valid")
-    else:
-        print("proof invalid")
+    chain = HeaderChain.from_file(args.blockchain_state, strict=args.strict)
+    for filename in args.proof:
+        with open(filename) as f:
+            proof = json.load(f)
+        if "hashes" in proof:
+            valid = chain.verify_inclusion_multiproof(
+                proof["block"], proof["hashes"], proof["proof"]
+            )
+        else:
+            valid = chain.verify_inclusion_proof(
+                proof["block"], proof["hash"], proof["proof"]
+            )
+        prefix = f"{filename}: " if len(args.proof) > 1 else ""
+        print(prefix + ("proof valid" if valid else "proof invalid"))
 
 
 def generate_transactions(args):
-    blockchain = Blockchain.from_file(args.blockchain_state)
+    blockchain = load_blockchain(args)
     accounts = transaction_generator.load_accounts(args.accounts)
-    txs = transaction_generator.generate_transactions(blockchain, accounts, args.number)
-    with open_file(args.output, "wt") as f:
-        json.dump([t.to_dict() for t in txs], f)
+    txs = transaction_generator.iter_transactions(
+        blockchain,
+        accounts,
+        args.number,
+        workers=args.workers,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    )
+    codec.write_transactions(args.output, txs)
 
 
 def main():
     args = parser.parse_args()
+    if not (args.stats or args.stats_output):
+        run_command(args)
+        return
+    stats.enable()
+    try:
+        run_command(args)
+    finally:
+        print(stats.STATS.summary(), file=sys.stderr)
+        if args.stats_output:
+            stats.write_report(args.stats_output, args.stats_format)
+
+
+def run_command(args):
     if args.command == "produce-blocks":
         produce_blocks(args)
     elif args.command == "get-tx-hash":
         get_transaction_hash(args)
     elif args.command == "generate-proof":
         generate_proof(args)
+    elif args.command == "generate-multiproof":
+        generate_multiproof(args)
+    elif args.command == "find-tx":
+        find_transaction(args)
     elif args.command == "verify-proof":
         verify_proof(args)
+    elif args.command == "snapshot":
+        snapshot(args)
+    elif args.command == "convert":
+        convert(args)
+    elif args.command == "node":
+        run_node(args)
+    elif args.command == "serve":
+        serve(args)
+    elif args.command == "rollback":
+        rollback(args)
     elif args.command == "generate-txs":
         generate_transactions(args)
     else:
@@ -0,0 +1,500 @@
+"""Compact binary encoding of blocks and transactions.
+
+A binary file starts with MAGIC, a version and the kind of records it holds
+(blocks, transactions or headers), followed by records each prefixed with their
+length. Within a record, integers are zigzag-encoded compact sizes: one byte
+below 0xfd, otherwise a marker byte followed by 2, 4 or 8 little-endian
+bytes. Hashes and addresses are stored as raw 32 and 20 bytes, and
+signatures as their two length-prefixed DER parts.
+
+Text fields are only stored raw when decoding gives back the exact same
+text. Others, like an empty hash or uppercase hex, are stored as
+length-prefixed UTF-8, which a bit of the record's flags signals.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict
+import io
+import struct
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from .block import Block
+from .block_header import BlockHeader
+from .transaction import Transaction
+from .utils import dump_json_array, iter_json_array, open_file
+
+MAGIC = b"BCPB"
+VERSION = 1
+KIND_BLOCKS = 1
+KIND_TRANSACTIONS = 2
+KIND_HEADERS = 3
+FILE_HEADER = struct.Struct("<4sBB")
+BINARY_SUFFIXES = (".bin", ".bin.gz")
+
+HASH_SIZE = 32
+ADDRESS_SIZE = 20
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+
+# flags of a transaction record: fields stored as text
+TX_SENDER_TEXT = 1
+TX_RECEIVER_TEXT = 2
+TX_SIGNATURE_TEXT = 4
+
+# flags of a header record: fields stored as text
+HEADER_MINER_TEXT = 1
+HEADER_PREVIOUS_HASH_TEXT = 2
+HEADER_MERKLE_ROOT_TEXT = 4
+HEADER_HASH_TEXT = 8
+
+T = TypeVar("T")
+
+
+def is_binary_path(path: str) -> bool:
+    return path.endswith(BINARY_SUFFIXES)
+
+
+def _write_uint(out: bytearray, value: int):
+    if value < 0xFD:
+        out.append(value)
+    elif value <= 0xFFFF:
+        out.append(0xFD)
+        out += _U16.pack(value)
+    elif value <= 0xFFFFFFFF:
+        out.append(0xFE)
+        out += _U32.pack(value)
+    elif value <= 0xFFFFFFFFFFFFFFFF:
+        out.append(0xFF)
+        out += _U64.pack(value)
+    else:
+        raise ValueError(f"integer too large for the binary format: {value}")
+
+
+def _write_int(out: bytearray, value: int):
+    _write_uint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+def _read_uint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = data[offset]
+    if value < 0xFD:
+        return value, offset + 1
+    if value == 0xFD:
+        return _U16.unpack_from(data, offset + 1)[0], offset + 3
+    if value == 0xFE:
+        return _U32.unpack_from(data, offset + 1)[0], offset + 5
+    return _U64.unpack_from(data, offset + 1)[0], offset + 9
+
+
+def _read_int(data: bytes, offset: int) -> Tuple[int, int]:
+    value, offset = _read_uint(data, offset)
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), offset
+
+
+def _raw_hex(text: str, size: int) -> bytes:
+    """Returns the bytes of a 0x-prefixed lowercase hex string of size bytes,
+    or b"" if it is not one."""
+    if len(text) != 2 + 2 * size or not text.startswith("0x"):
+        return b""
+    try:
+        raw = bytes.fromhex(text[2:])
+    except ValueError:
+        return b""
+    return raw if raw.hex() == text[2:] else b""
+
+
+def _raw_signature(text: str) -> Tuple[bytes, bytes]:
+    parts = text.split(",")
+    if len(parts) != 2:
+        return b"", b""
+    raws = []
+    for part in parts:
+        raw = _raw_hex(part, (len(part) - 2) // 2)
+        if not raw:
+            return b"", b""
+        raws.append(raw)
+    return raws[0], raws[1]
+
+
+def _write_bytes(out: bytearray, value: bytes):
+    _write_uint(out, len(value))
+    out += value
+
+
+def _write_text(out: bytearray, value: str):
+    _write_bytes(out, value.encode())
+
+
+def _read_bytes(data: bytes, offset: int) -> Tuple[bytes, int]:
+    length, offset = _read_uint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("truncated binary record")
+    return data[offset:end], end
+
+
+def _read_text(data: bytes, offset: int) -> Tuple[str, int]:
+    value, offset = _read_bytes(data, offset)
+    return value.decode(), offset
+
+
+def encode_transaction(tx: Transaction, out: bytearray):
+    sender = _raw_hex(tx.sender, ADDRESS_SIZE)
+    receiver = _raw_hex(tx.receiver, ADDRESS_SIZE)
+    public_key, signature = _raw_signature(tx.signature)
+    flags = (
+        (0 if sender else TX_SENDER_TEXT)
+        | (0 if receiver else TX_RECEIVER_TEXT)
+        | (0 if public_key else TX_SIGNATURE_TEXT)
+    )
+    out.append(flags)
+    if sender:
+        out += sender
+    else:
+        _write_text(out, tx.sender)
+    if receiver:
+        out += receiver
+    else:
+        _write_text(out, tx.receiver)
+    _write_int(out, tx.amount)
+    _write_int(out, tx.transaction_fee)
+    _write_int(out, tx.lock_time)
+    if public_key:
+        _write_bytes(out, public_key)
+        _write_bytes(out, signature)
+    else:
+        _write_text(out, tx.signature)
+
+
+def decode_transaction(data: bytes, offset: int) -> Tuple[Transaction, int]:
+    if data[offset]:
+        return _decode_transaction_with_text(data, offset)
+    # every field is raw: the common case, decoded without helper calls as
+    # this is the hot path of loading a chain
+    start = offset
+    offset += 1 + 2 * ADDRESS_SIZE
+    sender = "0x" + data[offset - 2 * ADDRESS_SIZE : offset - ADDRESS_SIZE].hex()
+    receiver = "0x" + data[offset - ADDRESS_SIZE : offset].hex()
+    value = data[offset]
+    if value < 0xFD:
+        offset += 1
+    else:
+        value, offset = _read_uint(data, offset)
+    amount = value >> 1 if not value & 1 else -((value + 1) >> 1)
+    value = data[offset]
+    if value < 0xFD:
+        offset += 1
+    else:
+        value, offset = _read_uint(data, offset)
+    transaction_fee = value >> 1 if not value & 1 else -((value + 1) >> 1)
+    value = data[offset]
+    if value < 0xFD:
+        offset += 1
+    else:
+        value, offset = _read_uint(data, offset)
+    lock_time = value >> 1 if not value & 1 else -((value + 1) >> 1)
+    # DER public keys and signatures are shorter than 0xfd bytes
+    length = data[offset]
+    if length >= 0xFD:
+        return _decode_transaction_with_text(data, start)
+    public_key = data[offset + 1 : offset + 1 + length]
+    offset += 1 + length
+    length = data[offset]
+    if length >= 0xFD:
+        return _decode_transaction_with_text(data, start)
+    raw_signature = data[offset + 1 : offset + 1 + length]
+    offset += 1 + length
+    tx = Transaction(
+        sender=sender,
+        receiver=receiver,
+        amount=amount,
+        transaction_fee=transaction_fee,
+        lock_time=lock_time,
+        signature="0x" + public_key.hex() + ",0x" + raw_signature.hex(),
+    )
+    return tx, offset
+
+
+def _decode_transaction_with_text(data: bytes, offset: int) -> Tuple[Transaction, int]:
+    flags = data[offset]
+    offset += 1
+    if flags & TX_SENDER_TEXT:
+        sender, offset = _read_text(data, offset)
+    else:
+        sender = "0x" + data[offset : offset + ADDRESS_SIZE].hex()
+        offset += ADDRESS_SIZE
+    if flags & TX_RECEIVER_TEXT:
+        receiver, offset = _read_text(data, offset)
+    else:
+        receiver = "0x" + data[offset : offset + ADDRESS_SIZE].hex()
+        offset += ADDRESS_SIZE
+    amount, offset = _read_int(data, offset)
+    transaction_fee, offset = _read_int(data, offset)
+    lock_time, offset = _read_int(data, offset)
+    if flags & TX_SIGNATURE_TEXT:
+        signature, offset = _read_text(data, offset)
+    else:
+        public_key, offset = _read_bytes(data, offset)
+        raw_signature, offset = _read_bytes(data, offset)
+        signature = "0x" + public_key.hex() + ",0x" + raw_signature.hex()
+    tx = Transaction(
+        sender=sender,
+        receiver=receiver,
+        amount=amount,
+        transaction_fee=transaction_fee,
+        lock_time=lock_time,
+        signature=signature,
+    )
+    return tx, offset
+
+
+def _write_hex_field(out: bytearray, raw: bytes, text: str):
+    if raw:
+        out += raw
+    else:
+        _write_text(out, text)
+
+
+def _read_hex_field(
+    data: bytes, offset: int, size: int, is_text: int
+) -> Tuple[str, int]:
+    if is_text:
+        return _read_text(data, offset)
+    return "0x" + data[offset : offset + size].hex(), offset + size
+
+
+def encode_header(header: BlockHeader, out: bytearray):
+    miner = _raw_hex(header.miner, ADDRESS_SIZE)
+    previous_hash = _raw_hex(header.previous_block_header_hash, HASH_SIZE)
+    merkle_root = _raw_hex(header.transactions_merkle_root, HASH_SIZE)
+    header_hash = _raw_hex(header.hash, HASH_SIZE)
+    out.append(
+        (0 if miner else HEADER_MINER_TEXT)
+        | (0 if previous_hash else HEADER_PREVIOUS_HASH_TEXT)
+        | (0 if merkle_root else HEADER_MERKLE_ROOT_TEXT)
+        | (0 if header_hash else HEADER_HASH_TEXT)
+    )
+    _write_int(out, header.difficulty)
+    _write_int(out, header.height)
+    _write_hex_field(out, miner, header.miner)
+    _write_int(out, header.nonce)
+    _write_hex_field(out, previous_hash, header.previous_block_header_hash)
+    _write_int(out, header.timestamp)
+    _write_int(out, header.transactions_count)
+    _write_hex_field(out, merkle_root, header.transactions_merkle_root)
+    _write_hex_field(out, header_hash, header.hash)
+
+
+def decode_header(data: bytes, offset: int) -> Tuple[BlockHeader, int]:
+    flags = data[offset]
+    offset += 1
+    difficulty, offset = _read_int(data, offset)
+    height, offset = _read_int(data, offset)
+    miner, offset = _read_hex_field(
+        data, offset, ADDRESS_SIZE, flags & HEADER_MINER_TEXT
+    )
+    nonce, offset = _read_int(data, offset)
+    previous_hash, offset = _read_hex_field(
+        data, offset, HASH_SIZE, flags & HEADER_PREVIOUS_HASH_TEXT
+    )
+    timestamp, offset = _read_int(data, offset)
+    transactions_count, offset = _read_int(data, offset)
+    merkle_root, offset = _read_hex_field(
+        data, offset, HASH_SIZE, flags & HEADER_MERKLE_ROOT_TEXT
+    )
+    header_hash, offset = _read_hex_field(
+        data, offset, HASH_SIZE, flags & HEADER_HASH_TEXT
+    )
+    header = BlockHeader(
+        difficulty=difficulty,
+        height=height,
+        miner=miner,
+        nonce=nonce,
+        previous_block_header_hash=previous_hash,
+        timestamp=timestamp,
+        transactions_count=transactions_count,
+        transactions_merkle_root=merkle_root,
+        hash=header_hash,
+    )
+    return header, offset
+
+
+def encode_block(block: Block, out: bytearray):
+    encode_header(block.header, out)
+    # transactions_count is part of the header and may not match in invalid
+    # blocks, so the number of encoded transactions is stored separately
+    _write_uint(out, len(block.transactions))
+    for tx in block.transactions:
+        encode_transaction(tx, out)
+
+
+def decode_block(data: bytes, offset: int) -> Tuple[Block, int]:
+    header, offset = decode_header(data, offset)
+    count, offset = _read_uint(data, offset)
+    transactions: List[Transaction] = []
+    for _ in range(count):
+        tx, offset = decode_transaction(data, offset)
+        transactions.append(tx)
+    return Block(header=header, transactions=transactions), offset
+
+
+def _decode_record(
+    decode: Callable[[bytes, int], Tuple[T, int]], data: bytes, start: int, end: int
+) -> T:
+    try:
+        value, offset = decode(data, start)
+    except (IndexError, struct.error):
+        raise ValueError("truncated binary record") from None
+    if offset != end:
+        raise ValueError("invalid binary record length")
+    return value
+
+
+def write_records(
+    f: BinaryIO,
+    kind: int,
+    values: Iterable[T],
+    encode: Callable[[T, bytearray], None],
+):
+    f.write(FILE_HEADER.pack(MAGIC, VERSION, kind))
+    out = bytearray()
+    record = bytearray()
+    for value in values:
+        record.clear()
+        encode(value, record)
+        _write_bytes(out, record)
+        if len(out) >= 1 << 16:
+            f.write(out)
+            out.clear()
+    f.write(out)
+
+
+def iter_records(
+    f: BinaryIO,
+    decode: Callable[[bytes, int], Tuple[T, int]],
+    chunk_size: int = 1 << 16,
+) -> Iterator[T]:
+    """Decodes the records following the file header."""
+    buffer = b""
+    offset = 0
+    while True:
+        # a length prefix is at most 9 bytes
+        if len(buffer) - offset < 9:
+            buffer = buffer[offset:] + f.read(chunk_size)
+            offset = 0
+            if not buffer:
+                return
+        try:
+            length, start = _read_uint(buffer, offset)
+        except (IndexError, struct.error):
+            raise ValueError("truncated binary file") from None
+        end = start + length
+        if end > len(buffer):
+            buffer = buffer[start:] + _read_exactly(f, end - len(buffer))
+            start, end = 0, length
+        yield _decode_record(decode, buffer, start, end)
+        offset = end
+
+
+def _read_exactly(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    while len(data) < size:
+        more = f.read(size - len(data))
+        if not more:
+            raise ValueError("truncated binary file")
+        data += more
+    return data
+
+
+def _read_kind(f: BinaryIO) -> Optional[int]:
+    """Reads the header of a binary file and returns the kind of its records,
+    or None, with the file rewound, if it is not a binary file."""
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        f.seek(0)
+        return None
+    version, kind = FILE_HEADER.unpack(magic + _read_exactly(f, 2))[1:]
+    if version != VERSION:
+        raise ValueError(f"unsupported binary format version {version}")
+    return kind
+
+
+def _write_file(path: str, kind: int, values: Iterable[T], encode, to_dict):
+    if is_binary_path(path):
+        with open_file(path, "wb") as f:
+            write_records(cast(BinaryIO, f), kind, values, encode)
+    else:
+        with open_file(path, "wt") as f:
+            dump_json_array((to_dict(v) for v in values), f)
+
+
+def _read_file(
+    path: str, decoders: Dict[int, Callable[[bytes, int], Tuple[Any, int]]], from_dict
+) -> Iterator:
+    # a single open, so that the format is detected without reading twice
+    with open_file(path, "rb") as f:
+        binary = cast(BinaryIO, f)
+        kind = _read_kind(binary)
+        if kind is None:
+            for obj in iter_json_array(io.TextIOWrapper(binary, encoding="utf-8")):
+                yield from_dict(obj)
+            return
+        if kind not in decoders:
+            raise ValueError(f"unexpected records of kind {kind} in {path}")
+        yield from iter_records(binary, decoders[kind])
+
+
+def _header_of_block(data: bytes, offset: int) -> Tuple[BlockHeader, int]:
+    block, offset = decode_block(data, offset)
+    return block.header, offset
+
+
+# files are written in the binary format when their name ends with one of
+# BINARY_SUFFIXES and in JSON otherwise, and read in the format they are in
+
+
+def write_blocks(path: str, blocks: Iterable[Block]):
+    _write_file(path, KIND_BLOCKS, blocks, encode_block, Block.to_dict)
+
+
+def read_blocks(path: str) -> Iterator[Block]:
+    return _read_file(path, {KIND_BLOCKS: decode_block}, Block.from_dict)
+
+
+def write_transactions(path: str, transactions: Iterable[Transaction]):
+    _write_file(
+        path, KIND_TRANSACTIONS, transactions, encode_transaction, Transaction.to_dict
+    )
+
+
+def read_transactions(path: str) -> Iterator[Transaction]:
+    return _read_file(
+        path, {KIND_TRANSACTIONS: decode_transaction}, Transaction.from_dict
+    )
+
+
+def write_headers(path: str, headers: Iterable[BlockHeader]):
+    _write_file(path, KIND_HEADERS, headers, encode_header, asdict)
+
+
+def read_headers(path: str) -> Iterator[BlockHeader]:
+    """Reads the headers of a headers-only file or of a full state file."""
+    return _read_file(
+        path,
+        {KIND_HEADERS: decode_header, KIND_BLOCKS: _header_of_block},
+        lambda obj: BlockHeader(**obj.get("header", obj)),
+    )
@@ -0,0 +1,151 @@
+"""Execution of the transactions of a block in batches.
+
+A transaction only reads the balance of its sender, so when every sender
+affords all its debits up front and no balance can overflow, no transaction
+can fail in any order: debits and credits are summed per account and
+applied at once. Otherwise, the transactions touching an account at risk
+are replayed one transaction at a time, in block order, and the others,
+which cannot fail, are batched. Replayed transactions include every one
+changing the balance of an account at risk, so the first to fail is the
+first one to fail sequentially, and raises the same error. Blocks where the
+miner or the zero address sends, with negative amounts or fees, or whose
+miner balance could overflow are executed sequentially, and so are blocks
+with few transactions per account, for which summing costs more than it
+saves.
+
+Everything runs in the calling thread: transfers are a few Python
+operations, which threads would serialize on the GIL and processes would
+spend pickling balances. Batching removes the per-transaction overhead
+instead.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import itertools
+from operator import attrgetter
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+from .constants import ZERO_ADDRESS
+from .ledger import INT64_MAX, Ledger
+from .transaction import Transaction
+
+if TYPE_CHECKING:
+    from .blockchain import Blockchain
+
+# blocks with fewer transactions are executed sequentially
+MIN_BATCH_SIZE = 64
+# blocks with more distinct senders and receivers per transaction are too
+MAX_ACCOUNTS_PER_TRANSACTION = 1.5
+
+
+@dataclass
+class Batch:
+    """Totals debited and credited per account by transactions."""
+
+    debits: Dict[str, int]
+    # the miner first, then receivers in the order they are first credited,
+    # so that new accounts are created in the same order as sequentially
+    credits: Dict[str, int]
+
+    @classmethod
+    def of(cls, transactions: Sequence[Transaction], miner: str) -> Optional[Batch]:
+        """Returns None if the transactions cannot be batched."""
+        debits: Dict[str, int] = {}
+        # the miner's account is created by the first transaction
+        rewarded = bool(miner) and len(transactions) > 0
+        credits: Dict[str, int] = {miner: 0} if rewarded else {}
+        fees = 0
+        for tx in transactions:
+            sender, amount, fee = tx.sender, tx.amount, tx.transaction_fee
+            if amount < 0 or fee < 0:
+                return None
+            debits[sender] = debits.get(sender, 0) + amount + fee
+            credits[tx.receiver] = credits.get(tx.receiver, 0) + amount
+            fees += fee
+        if miner in debits or ZERO_ADDRESS in debits:
+            return None
+        if rewarded:
+            credits[miner] += fees
+        return cls(debits, credits)
+
+    def unsafe_accounts(self, balances: Ledger) -> List[str]:
+        """Accounts for which a transaction may fail in some order: senders
+        not affording all their debits, and balances which may overflow."""
+        unsafe = [
+            address
+            for (address, total), balance in zip(
+                self.debits.items(), balances.get_many(self.debits)
+            )
+            if balance is None or balance < total
+        ]
+        unsafe.extend(
+            address
+            for (address, total), balance in zip(
+                self.credits.items(), balances.get_many(self.credits)
+            )
+            if (balance or 0) + total > INT64_MAX
+        )
+        return unsafe
+
+    def discount(self, transactions: Sequence[Transaction], miner: str):
+        """Removes the totals of transactions, which are part of the batch."""
+        debits, credits = self.debits, self.credits
+        for tx in transactions:
+            debits[tx.sender] -= tx.amount + tx.transaction_fee
+            credits[tx.receiver] -= tx.amount
+            if miner:
+                credits[miner] -= tx.transaction_fee
+
+    def apply(self, balances: Ledger):
+        debits = ((address, -total) for address, total in self.debits.items())
+        balances.credit_many(itertools.chain(debits, self.credits.items()))
+
+
+def execute_transactions(
+    blockchain: Blockchain,
+    miner: str,
+    height: int,
+    transactions: Sequence[Transaction],
+):
+    """Applies transactions to the balances of blockchain, with the same
+    result as processing them one by one, or the same error. On error, the
+    balances are left partly updated, for the caller to restore."""
+    balances = blockchain.balances
+    batch = None
+    if height > 0 and isinstance(balances, Ledger) and _reuses_accounts(transactions):
+        batch = Batch.of(transactions, miner)
+    unsafe = set(batch.unsafe_accounts(balances)) if batch is not None else set()
+    # the miner is credited by every transaction, replayed or not
+    if batch is None or miner in unsafe:
+        for tx in transactions:
+            blockchain.process_transaction(miner, height, tx)
+        return
+    if not unsafe:
+        batch.apply(balances)
+        return
+
+    replayed = [
+        tx for tx in transactions if tx.sender in unsafe or tx.receiver in unsafe
+    ]
+    # replayed and batched transactions create accounts out of order: their
+    # addresses are interned first, so that they are listed in the same order
+    balances.reserve(
+        address
+        for address, balance in zip(batch.credits, balances.get_many(batch.credits))
+        if balance is None
+    )
+    for tx in replayed:
+        blockchain.process_transaction(miner, height, tx)
+    batch.discount(replayed, miner)
+    batch.apply(balances)
+
+
+def _reuses_accounts(transactions: Sequence[Transaction]) -> bool:
+    # batching pays off when accounts appear in several transactions: summing
+    # per account costs more than executing each transaction otherwise
+    senders = set(map(attrgetter("sender"), transactions))
+    receivers = set(map(attrgetter("receiver"), transactions))
+    return len(senders) + len(receivers) <= MAX_ACCOUNTS_PER_TRANSACTION * len(
+        transactions
+    )
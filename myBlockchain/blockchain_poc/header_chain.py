@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from typing import Iterator, List, Optional, Sequence
+
+from . import codec, merkle
+from .block_header import BlockHeader, difficulty_for_height
+from .block_store import BlockStore
+from .constants import ZERO_HASH
+from .header_hasher import compute_target
+
+
+def iter_state_headers(state_path: str) -> Iterator[BlockHeader]:
+    if BlockStore.is_block_store(state_path):
+        with BlockStore(state_path, read_only=True) as store:
+            for block in store.iter_blocks():
+                yield block.header
+        return
+    # works with both full state files and files written by HeaderChain.write_state
+    yield from codec.read_headers(state_path)
+
+
+def validate_hash(header: BlockHeader):
+    if header.hash != header.sha256_hash():
+        raise ValueError("invalid hash")
+
+
+def validate_work(header: BlockHeader):
+    """Checks the difficulty of a mined header and its hash against the
+    proof-of-work target."""
+    if header.difficulty != difficulty_for_height(header.height):
+        raise ValueError("invalid difficulty")
+
+    if int(header.hash, 16) >= compute_target(header.difficulty):
+        raise ValueError("insufficient proof of work")
+
+
+class HeaderChain:
+    """Headers-only view of the chain, enough to check inclusion proofs.
+
+    Unlike a full Blockchain, transactions and balances are not kept. Headers
+    are linked by their stored hashes, as in the full chain, and the stored
+    hashes are checked against the difficulty schedule and proof-of-work
+    target. In strict mode, every header hash is also recomputed, which chains
+    written before hashes were checked, such as data/blockchain.json.gz, do
+    not pass.
+    """
+
+    def __init__(self, strict: bool = False):
+        self.headers: List[BlockHeader] = []
+        self.strict = strict
+
+    @classmethod
+    def from_file(cls, filename: str, strict: bool = False) -> HeaderChain:
+        chain = cls(strict)
+        chain.load_state(filename)
+        return chain
+
+    def load_state(self, state_path: str):
+        for header in iter_state_headers(state_path):
+            self.process_header(header)
+
+    def write_state(self, state_path: str):
+        codec.write_headers(state_path, self.headers)
+
+    def process_header(self, header: BlockHeader):
+        self.validate_header(header)
+        self.headers.append(header)
+
+    def validate_header(self, header: BlockHeader):
+        if self.strict:
+            validate_hash(header)
+
+        if not self.headers:
+            if header.height != 0:
+                raise ValueError("invalid height")
+            if header.previous_block_header_hash != ZERO_HASH:
+                raise ValueError("invalid previous_block_header_hash")
+            return
+
+        head = self.head
+        if header.height != head.height + 1:
+            raise ValueError("invalid height")
+
+        if header.previous_block_header_hash != head.hash:
+            raise ValueError("invalid previous_block_header_hash")
+
+        if header.timestamp <= head.timestamp:
+            raise ValueError("invalid timestamp")
+
+        validate_work(header)
+
+    def _merkle_root(self, block_height: int) -> Optional[str]:
+        # heights come from proofs, which may point past the tip
+        if not isinstance(block_height, int) or not (
+            0 <= block_height < len(self.headers)
+        ):
+            return None
+        return self.headers[block_height].transactions_merkle_root
+
+    def verify_inclusion_proof(
+        self, block_height: int, transaction_hash: str, proof: List[str]
+    ) -> bool:
+        merkle_root = self._merkle_root(block_height)
+        if merkle_root is None:
+            return False
+        return merkle.verify_proof(transaction_hash, merkle_root, proof)
+
+    def verify_inclusion_multiproof(
+        self, block_height: int, transaction_hashes: Sequence[str], proof: dict
+    ) -> bool:
+        merkle_root = self._merkle_root(block_height)
+        if merkle_root is None:
+            return False
+        return merkle.verify_multiproof(transaction_hashes, merkle_root, proof)
+
+    @property
+    def height(self) -> int:
+        return self.head.height
+
+    @property
+    def head(self) -> BlockHeader:
+        if len(self.headers) == 0:
+            raise ValueError("chain is not initialized")
+        return self.headers[-1]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import itertools
+from typing import Iterable, Optional
+
+from .block_header import BlockHeader
+
+
+def compute_target(difficulty: int) -> int:
+    # a hex hash starting with `difficulty` zeros is below 16 ** (64 - difficulty)
+    return 16 ** (64 - max(difficulty, 0)) if difficulty <= 64 else 0
+
+
+class HeaderHasher:
+    """Hashes a header for many nonces without re-serializing the other fields.
+
+    The fields serialized before the nonce are absorbed once into a SHA-256
+    state that is copied for every attempt; the ones after it are pre-encoded.
+    """
+
+    def __init__(self, header: BlockHeader):
+        excluded = header.fields_to_exclude()
+        names = sorted(
+            f.name for f in dataclasses.fields(header) if f.name not in excluded
+        )
+        nonce_index = names.index("nonce")
+        values = [f"{getattr(header, name)}" for name in names]
+        prefix = "".join(v + "," for v in values[:nonce_index])
+        suffix = "".join("," + v for v in values[nonce_index + 1 :])
+
+        self.target = compute_target(header.difficulty)
+        self._prefix_state = hashlib.sha256(prefix.encode())
+        self._suffix = suffix.encode()
+        # digests are 32 bytes, so comparing them to the big-endian target is
+        # the same as comparing integers, without converting every digest
+        if self.target >= 2**256:
+            self._target_bytes = None
+        else:
+            self._target_bytes = self.target.to_bytes(32, "big")
+
+    def digest(self, nonce: int) -> bytes:
+        state = self._prefix_state.copy()
+        state.update(b"%d%s" % (nonce, self._suffix))
+        return state.digest()
+
+    def sha256_hash(self, nonce: int) -> str:
+        return "0x" + self.digest(nonce).hex()
+
+    def is_below_target(self, nonce: int) -> bool:
+        if self._target_bytes is None:
+            return True
+        return self.digest(nonce) < self._target_bytes
+
+    def find_nonce(
+        self, start: int = 0, step: int = 1, stop: Optional[int] = None
+    ) -> Optional[int]:
+        nonces: Iterable[int]
+        if stop is None:
+            nonces = itertools.count(start, step)
+        else:
+            nonces = range(start, stop, step)
+        if self._target_bytes is None:
+            return next(iter(nonces), None)
+
+        copy_state = self._prefix_state.copy
+        suffix = self._suffix
+        target = self._target_bytes
+        for nonce in nonces:
+            state = copy_state()
+            state.update(b"%d%s" % (nonce, suffix))
+            if state.digest() < target:
+                return nonce
+        return None
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .block import Block
+from .utils import open_file
+
+# previous balance of every account touched by a block, None if it had none
+BlockUndo = Dict[str, Optional[int]]
+
+
+class UndoJournal:
+    """Append-only file of the undo entries of the last max_depth blocks.
+
+    Each line holds the height and hash of a block and its undo entry. New
+    entries are appended on flush; once the file holds more than twice
+    max_depth lines, it is rewritten with the last entry of each of the last
+    max_depth heights instead. Entries of blocks rolled back stay in the file,
+    so readers only keep those whose hash matches the chain.
+    """
+
+    def __init__(self, filename: str, max_depth: int):
+        self.filename = filename
+        self.max_depth = max_depth
+        self._pending: List[str] = []
+        self._count = sum(1 for _ in self._iter_lines())
+
+    def _iter_lines(self) -> Iterator[str]:
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open_file(self.filename, "rt") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        yield line
+        except EOFError:
+            # a crash while appending only loses the entries being appended
+            return
+
+    def _iter_records(self) -> Iterator[Tuple[int, str, BlockUndo]]:
+        for line in self._iter_lines():
+            record = json.loads(line)
+            yield record["height"], record["hash"], record["undo"]
+
+    def read(self, blocks: Sequence[Block]) -> Dict[int, BlockUndo]:
+        """Returns the entries of the blocks of the chain."""
+        entries = {}
+        for height, block_hash, undo in self._iter_records():
+            if 0 <= height < len(blocks) and blocks[height].header.hash == block_hash:
+                entries[height] = undo
+        return entries
+
+    def append(self, height: int, block_hash: str, undo: BlockUndo):
+        record = {"height": height, "hash": block_hash, "undo": undo}
+        self._pending.append(json.dumps(record) + "\n")
+        if len(self._pending) >= self.max_depth:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        if self._count + len(self._pending) > 2 * self.max_depth:
+            self._rotate()
+        else:
+            with open_file(self.filename, "at") as f:
+                for line in self._pending:
+                    f.write(line)
+            self._count += len(self._pending)
+        self._pending = []
+
+    def _rotate(self):
+        latest: Dict[int, str] = {}
+        for line in itertools.chain(self._iter_lines(), self._pending):
+            latest[json.loads(line)["height"]] = line
+        heights = sorted(latest)[-self.max_depth :]
+        # same as snapshots: never leave a truncated journal behind
+        directory, name = os.path.split(self.filename)
+        temporary_filename = os.path.join(directory, "tmp-" + name)
+        with open_file(temporary_filename, "wt") as f:
+            for height in heights:
+                f.write(latest[height])
+        os.replace(temporary_filename, self.filename)
+        self._count = len(heights)
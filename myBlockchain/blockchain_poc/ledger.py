@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+from array import array
+from collections import defaultdict
+from itertools import chain, compress, islice
+import sys
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+
+# largest balance an account can hold
+INT64_MAX = 2**63 - 1
+
+
+class AddressTable:
+    """Assigns consecutive ids to addresses, shared by a ledger and its copies.
+
+    Ids are never reused, so the insertion order of `ids` is the id order.
+    Only the ledger which created the table interns addresses in it.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, address: str) -> int:
+        address_id = self.ids.get(address)
+        if address_id is None:
+            address_id = self.ids[address] = len(self.ids)
+        return address_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class Ledger(MutableMapping[str, int]):
+    """Account balances stored as int64 values indexed by interned address ids.
+
+    Reads and writes behave like a Dict[str, int]. Copies share the address
+    table, so copying only duplicates the balance and presence arrays. The
+    table is copy-on-write: a copy only sees the ids interned before it was
+    made, and interns the addresses it adds in a local table of its own, so
+    that scratch copies never grow the shared one.
+    """
+
+    def __init__(
+        self,
+        balances: Optional[Mapping[str, int]] = None,
+    ):
+        self._table = AddressTable()
+        self._owns_table = True
+        # ids of the shared table below _limit are visible, the addresses
+        # interned locally take the following ids
+        self._limit = sys.maxsize
+        self._local: Dict[str, int] = {}
+        self._values = array("q")
+        # accounts with a zero balance are kept, so presence is tracked apart
+        self._present = bytearray()
+        self._len = 0
+        if balances is not None:
+            self.update(balances)
+
+    def _lookup(self, address: str) -> Optional[int]:
+        # id of an address, present or not
+        address_id = self._table.ids.get(address)
+        if address_id is None or address_id >= self._limit:
+            address_id = self._local.get(address)
+        return address_id
+
+    def _intern(self, address: str) -> int:
+        address_id = self._lookup(address)
+        if address_id is not None:
+            return address_id
+        if self._owns_table:
+            return self._table.intern(address)
+        address_id = self._local[address] = self._limit + len(self._local)
+        return address_id
+
+    def _id(self, address: str) -> Optional[int]:
+        address_id = self._lookup(address)
+        if address_id is None or address_id >= len(self._present):
+            return None
+        return address_id if self._present[address_id] else None
+
+    def _add(self, address: str) -> int:
+        address_id = self._intern(address)
+        if address_id < len(self._present) and self._present[address_id]:
+            return address_id
+        missing = address_id + 1 - len(self._present)
+        if missing > 0:
+            self._values.frombytes(bytes(8 * missing))
+            self._present.extend(bytes(missing))
+        self._present[address_id] = 1
+        self._len += 1
+        return address_id
+
+    def __getitem__(self, address: str) -> int:
+        address_id = self._id(address)
+        if address_id is None:
+            raise KeyError(address)
+        return self._values[address_id]
+
+    def get(self, address: str, default=None):
+        address_id = self._id(address)
+        return default if address_id is None else self._values[address_id]
+
+    def __setitem__(self, address: str, balance: int):
+        self._values[self._add(address)] = balance
+
+    def __delitem__(self, address: str):
+        address_id = self._id(address)
+        if address_id is None:
+            raise KeyError(address)
+        self._present[address_id] = 0
+        self._values[address_id] = 0
+        self._len -= 1
+
+    def __contains__(self, address) -> bool:
+        return self._id(address) is not None
+
+    def _addresses(self) -> Iterator[str]:
+        # in id order
+        return chain(islice(self._table.ids, self._limit), self._local)
+
+    def __iter__(self) -> Iterator[str]:
+        return compress(self._addresses(), self._present)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Ledger):
+            other = other.to_dict()
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return self.to_dict() == dict(other)
+
+    def __repr__(self) -> str:
+        return f"Ledger({self.to_dict()!r})"
+
+    def copy(self) -> Ledger:
+        ledger = Ledger()
+        ledger._table = self._table
+        ledger._owns_table = False
+        ledger._limit = min(self._limit, len(self._table))
+        ledger._local = dict(self._local)
+        ledger._values = self._values[:]
+        ledger._present = self._present[:]
+        ledger._len = self._len
+        return ledger
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(
+            zip(
+                compress(self._addresses(), self._present),
+                compress(self._values, self._present),
+            )
+        )
+
+    def update(self, balances=(), **kwargs):
+        items = balances.items() if isinstance(balances, Mapping) else balances
+        for address, balance in items:
+            self._values[self._add(address)] = balance
+        for address, balance in kwargs.items():
+            self._values[self._add(address)] = balance
+
+    def reserve(self, addresses: Iterable[str]):
+        """Interns addresses in order, so that accounts created for them later
+        are listed in this order whatever the order they are created in."""
+        for address in addresses:
+            self._intern(address)
+
+    def credit(self, address: str, amount: int):
+        self._values[self._add(address)] += amount
+
+    def debit(self, address: str, amount: int):
+        address_id = self._id(address)
+        if address_id is None:
+            raise KeyError(address)
+        self._values[address_id] -= amount
+
+    def get_many(self, addresses: Iterable[str]) -> List[Optional[int]]:
+        ids, present, values = self._table.ids, self._present, self._values
+        bound = min(self._limit, len(present))
+        balances: List[Optional[int]] = []
+        for address in addresses:
+            address_id = ids.get(address)
+            if address_id is None or address_id >= bound or not present[address_id]:
+                balances.append(self.get(address))
+            else:
+                balances.append(values[address_id])
+        return balances
+
+    def credit_many(self, credits: Iterable[Tuple[str, int]]):
+        # inlined lookups, as in transfer
+        ids, present, values = self._table.ids, self._present, self._values
+        bound = min(self._limit, len(present))
+        for address, amount in credits:
+            address_id = ids.get(address)
+            if address_id is None or address_id >= bound or not present[address_id]:
+                address_id = self._add(address)
+                bound = min(self._limit, len(present))
+            values[address_id] += amount
+
+    def debit_many(self, debits: Iterable[Tuple[str, int]]):
+        # all or nothing: the totals per account are checked before any debit
+        totals: Dict[str, int] = defaultdict(int)
+        for address, amount in debits:
+            totals[address] += amount
+        ids = {}
+        for address, total in totals.items():
+            address_id = self._id(address)
+            if address_id is None:
+                raise KeyError(address)
+            if self._values[address_id] < total:
+                raise ValueError(
+                    f"insufficient funds for {address}: {self._values[address_id]} < {total}"
+                )
+            ids[address_id] = total
+        values = self._values
+        for address_id, total in ids.items():
+            values[address_id] -= total
+
+    def transfer(
+        self,
+        sender: Optional[str],
+        receiver: str,
+        amount: int,
+        fee: int = 0,
+        miner: Optional[str] = None,
+    ):
+        # inlined lookups: this is the per-transaction path of block processing.
+        # Ids past bound, interned locally by a copy or in the shared table
+        # after the copy was made, take the general path
+        ids, present, values = self._table.ids, self._present, self._values
+        bound = min(self._limit, len(present))
+        if sender is not None:
+            sender_id = ids.get(sender)
+            if sender_id is None or sender_id >= bound or not present[sender_id]:
+                sender_id = self._id(sender)
+                if sender_id is None:
+                    raise KeyError(sender)
+            values[sender_id] -= amount + fee
+        if miner:
+            miner_id = ids.get(miner)
+            if miner_id is None or miner_id >= bound or not present[miner_id]:
+                miner_id = self._add(miner)
+            values[miner_id] += fee
+        receiver_id = ids.get(receiver)
+        if receiver_id is None or receiver_id >= bound or not present[receiver_id]:
+            receiver_id = self._add(receiver)
+        values[receiver_id] += amount
@@ -1,27 +1,251 @@
 from __future__ import annotations
 
-import json
-from typing import Iterable
+import heapq
+import itertools
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .transaction import Transaction
-from .utils import open_file
+from . import codec
+from .transaction import TRANSACTION_FIELDS, Transaction
+
+# heap entries are (key, sequence number, transaction): sequence numbers are
+# unique, so transactions themselves are never compared
+HeapEntry = Tuple[int, int, Transaction]
+
+# a heap entry: the tuple, its list slot and the int key owned by the entry
+_HEAP_ENTRY_SIZE = sys.getsizeof((0, 0, None)) + 8 + sys.getsizeof(2**40)
+# a dict entry (hash, key and value, plus index slots at a typical load) and
+# the sequence number it maps to
+_DICT_ENTRY_SIZE = 3 * 8 * 3 // 2 + 8 + sys.getsizeof(2**40)
+# digest and hash to sign, cached on transactions once hashed
+_CACHES_SIZE = 2 * sys.getsizeof(bytes(32))
+
+
+def transaction_size(tx: Transaction) -> int:
+    """Bytes used by a transaction, its fields and caches."""
+    size = sys.getsizeof(tx) + _CACHES_SIZE
+    for name in TRANSACTION_FIELDS:
+        size += sys.getsizeof(getattr(tx, name))
+    return size
 
 
 class Mempool:
-    def __init__(self, transactions: Iterable[Transaction]):
-        self.transactions = set(transactions)
+    """Pending transactions, indexed for block assembly.
+
+    Transactions wait in a heap ordered by lock time until a block timestamp
+    makes them live, and are then moved to a heap ordered by decreasing fee
+    (ties broken by arrival order). Removed transactions are dropped lazily
+    from both heaps.
+
+    The mempool can be bounded by a number of transactions and by bytes.
+    Past either limit, the transactions with the lowest fee are evicted,
+    newest first among equal fees, and the minimum fee for admission is
+    raised above the last evicted fee. It is halved whenever removing a
+    block's transactions leaves the mempool less than half full. With an
+    expiry, transactions live for that many seconds are dropped by expire.
+    Bytes are those of the transactions and of their index entries. Entries
+    of removed transactions waiting to be dropped from the heaps are not
+    counted, and are compacted away before they reach a quarter of the
+    others in a bounded mempool.
+    """
+
+    def __init__(
+        self,
+        transactions: Iterable[Transaction] = (),
+        max_count: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        expiry: Optional[int] = None,
+    ):
+        self.transactions: Dict[Transaction, int] = {}
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.expiry = expiry
+        self._size = 0
+        self.min_fee = 0
+        self.evicted = 0
+        self.expired = 0
+        self._sequence = itertools.count()
+        self._pending: List[HeapEntry] = []
+        self._live: List[HeapEntry] = []
+        # lowest fee first, newest first among equal fees
+        self._by_fee: List[HeapEntry] = []
+        self._by_lock_time: List[HeapEntry] = []
+        self._bounded = max_count is not None or max_bytes is not None
+        # heaps each transaction has an entry in
+        self._heaps = 1 + self._bounded + (expiry is not None)
+        self._entry_size = _DICT_ENTRY_SIZE + _HEAP_ENTRY_SIZE * self._heaps
+        self._promoted_until: Optional[int] = None
+        for tx in transactions:
+            self.add(tx)
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __contains__(self, tx: Transaction) -> bool:
+        return tx in self.transactions
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self.transactions)
+
+    @property
+    def size(self) -> int:
+        """Bytes used by the transactions, kept up to date when bounded and
+        computed on each call otherwise."""
+        if self._bounded:
+            return self._size
+        entries = len(self.transactions) * self._entry_size
+        return entries + sum(transaction_size(tx) for tx in self.transactions)
 
-    def get_live_transactions(self, timestamp: int):
-        return [tx for tx in self.transactions if tx.lock_time <= timestamp]
+    def add(self, tx: Transaction) -> bool:
+        """Adds tx unless it is already there, pays less than the minimum fee
+        or is evicted right away."""
+        if tx in self.transactions or tx.transaction_fee < self.min_fee:
+            return False
+        sequence = next(self._sequence)
+        self.transactions[tx] = sequence
+        if self._promoted_until is not None and tx.lock_time <= self._promoted_until:
+            heapq.heappush(self._live, (-tx.transaction_fee, sequence, tx))
+        else:
+            heapq.heappush(self._pending, (tx.lock_time, sequence, tx))
+        if self.expiry is not None:
+            heapq.heappush(self._by_lock_time, (tx.lock_time, sequence, tx))
+        if self._bounded:
+            self._size += transaction_size(tx) + self._entry_size
+            heapq.heappush(self._by_fee, (tx.transaction_fee, -sequence, tx))
+            if self._is_full():
+                self._evict()
+                return tx in self.transactions
+        return True
+
+    def _is_full(self) -> bool:
+        return (self.max_count is not None and len(self) > self.max_count) or (
+            self.max_bytes is not None and self._size > self.max_bytes
+        )
+
+    def _evict(self):
+        by_fee = self._by_fee
+        while self._is_full():
+            fee, negated_sequence, tx = heapq.heappop(by_fee)
+            if self.transactions.get(tx) == -negated_sequence:
+                self._discard(tx)
+                self.evicted += 1
+                self.min_fee = max(self.min_fee, fee + 1)
+        self._compact_if_sparse()
+
+    def expire(self, timestamp: int) -> int:
+        """Drops the transactions live for more than expiry seconds at
+        timestamp, and returns how many were dropped."""
+        if self.expiry is None:
+            return 0
+        by_lock_time = self._by_lock_time
+        expired = 0
+        while by_lock_time and by_lock_time[0][0] + self.expiry < timestamp:
+            entry = heapq.heappop(by_lock_time)
+            if self._is_current(entry):
+                self._discard(entry[2])
+                expired += 1
+        self.expired += expired
+        self._compact_if_sparse()
+        return expired
+
+    def _discard(self, tx: Transaction):
+        del self.transactions[tx]
+        if self._bounded:
+            self._size -= transaction_size(tx) + self._entry_size
+
+    def _is_current(self, entry: HeapEntry) -> bool:
+        _, sequence, tx = entry
+        return self.transactions.get(tx) == sequence
+
+    def _promote(self, timestamp: int):
+        if self._promoted_until is None or timestamp > self._promoted_until:
+            self._promoted_until = timestamp
+        pending = self._pending
+        while pending and pending[0][0] <= timestamp:
+            entry = heapq.heappop(pending)
+            if self._is_current(entry):
+                _, sequence, tx = entry
+                heapq.heappush(self._live, (-tx.transaction_fee, sequence, tx))
+
+    def iter_live_by_fee(self, timestamp: int) -> Iterator[Transaction]:
+        # walks the fee heap in order without popping it, so that transactions
+        # which end up not being mined stay in place; the mempool must not be
+        # modified while iterating
+        self._promote(timestamp)
+        live = self._live
+        if not live:
+            return
+        frontier = [(live[0], 0)]
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            tx = entry[2]
+            if tx.lock_time <= timestamp and self._is_current(entry):
+                yield tx
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(live):
+                    heapq.heappush(frontier, (live[child], child))
+
+    def get_live_transactions(self, timestamp: int) -> List[Transaction]:
+        return list(self.iter_live_by_fee(timestamp))
 
     def remove_transactions(self, transactions: Iterable[Transaction]):
-        self.transactions -= set(transactions)
+        if self._bounded:
+            for tx in transactions:
+                if tx in self.transactions:
+                    self._discard(tx)
+        else:
+            for tx in transactions:
+                self.transactions.pop(tx, None)
+        for heap in (self._pending, self._live, self._by_lock_time):
+            while heap and not self._is_current(heap[0]):
+                heapq.heappop(heap)
+        if self.min_fee and not self._is_half_full():
+            self.min_fee //= 2
+        self._compact_if_sparse()
+
+    def _is_half_full(self) -> bool:
+        return (self.max_count is not None and 2 * len(self) > self.max_count) or (
+            self.max_bytes is not None and 2 * self._size > self.max_bytes
+        )
+
+    def _compact_if_sparse(self):
+        # entries of removed transactions are otherwise only dropped when they
+        # reach the top of a heap, and keep the transactions alive, so
+        # rebuild once there are as many removed as current transactions, or
+        # a quarter as many when bounded
+        entries = (
+            len(self._pending)
+            + len(self._live)
+            + len(self._by_fee)
+            + len(self._by_lock_time)
+        )
+        removed = entries - len(self.transactions) * self._heaps
+        if removed > len(self.transactions) // (4 if self._bounded else 1) + 1024:
+            self._compact()
+
+    def _compact(self):
+        self._pending = [e for e in self._pending if self._is_current(e)]
+        self._live = [e for e in self._live if self._is_current(e)]
+        self._by_lock_time = [e for e in self._by_lock_time if self._is_current(e)]
+        self._by_fee = [e for e in self._by_fee if self.transactions.get(e[2]) == -e[1]]
+        for heap in (self._pending, self._live, self._by_fee, self._by_lock_time):
+            heapq.heapify(heap)
 
     @classmethod
-    def from_file(cls, filename: str) -> Mempool:
-        with open_file(filename) as f:
-            return cls(set(Transaction.from_dict(t) for t in json.load(f)))
+    def from_file(
+        cls,
+        filename: str,
+        max_count: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        expiry: Optional[int] = None,
+    ) -> Mempool:
+        # transactions are streamed, so a bounded mempool stays bounded
+        return cls(
+            codec.read_transactions(filename),
+            max_count=max_count,
+            max_bytes=max_bytes,
+            expiry=expiry,
+        )
 
     def to_file(self, filename: str):
-        with open_file(filename, "wt") as f:
-            json.dump([t.to_dict() for t in self.transactions], f)
+        codec.write_transactions(filename, self.transactions)
@@ -1,33 +1,54 @@
-from typing import Generator, List
+import hashlib
+from typing import Any, Dict, Generator, List, Sequence, Union
 
 from .constants import ZERO_HASH
 from .utils import hash_pair
 
+# the tree hashes the text of the "0x"-prefixed hashes, so nodes are kept as
+# their ASCII encoding and only decoded to strings at the API boundary
+HASH_SIZE = len(ZERO_HASH)
+_ZERO_HASH_BYTES = ZERO_HASH.encode()
 
-def _compute_next_hashes(hashes: List[str]) -> List[str]:
-    return [hash_pair(a, b) for a, b in zip(hashes[::2], hashes[1::2])]
 
+def _compute_next_hashes(hashes: List[bytes]) -> List[bytes]:
+    sha256 = hashlib.sha256
+    return [
+        b"0x" + sha256(a + b if a < b else b + a).hexdigest().encode()
+        for a, b in zip(hashes[::2], hashes[1::2])
+    ]
 
-def _iterate_merkle_tree(hashes: List[str]) -> Generator[List[str], None, None]:
-    while len(hashes) > 1:
-        if len(hashes) % 2 == 1:
-            hashes.append(ZERO_HASH)
-        yield hashes
-        hashes = _compute_next_hashes(hashes)
+
+def _iterate_merkle_tree(hashes: List[str]) -> Generator[List[bytes], None, None]:
+    if len(hashes) < 2:
+        raise ValueError("a Merkle tree needs at least two leaves")
+    level = [h.encode() for h in hashes]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(_ZERO_HASH_BYTES)
+        yield level
+        level = _compute_next_hashes(level)
+
+
+def _pack_level(level: List[bytes]) -> Union[bytes, List[bytes]]:
+    packed = b"".join(level)
+    if len(packed) != HASH_SIZE * len(level):
+        return level
+    return packed
+
+
+def _get_node(level: Union[bytes, List[bytes]], index: int) -> str:
+    if isinstance(level, list):
+        return level[index].decode()
+    return level[index * HASH_SIZE : (index + 1) * HASH_SIZE].decode()
 
 
 def generate_root(hashes: List[str]) -> str:
-    return hash_pair(*list(_iterate_merkle_tree(hashes))[-1])
+    *_, last_level = _iterate_merkle_tree(hashes)
+    return _compute_next_hashes(last_level)[0].decode()
 
 
 def generate_proof(target: str, hashes: List[str]) -> List[str]:
-    proof = []
-    target_index = hashes.index(target)
-    for hashes in _iterate_merkle_tree(hashes):
-        proof_item_index = target_index + (1 if target_index % 2 == 0 else -1)
-        proof.append(hashes[proof_item_index])
-        target_index //= 2
-    return proof
+    return MerkleTree(hashes).generate_proof(target)
 
 
 def verify_proof(target: str, root: str, proof: List[str]) -> bool:
@@ -35,3 +56,121 @@ def verify_proof(target: str, root: str, proof: List[str]) -> bool:
     for hash_value in proof:
         current = hash_pair(current, hash_value)
     return current == root
+
+
+def _level_sizes(leaf_count: int) -> List[int]:
+    # number of nodes of each level below the root, before padding
+    sizes = []
+    while leaf_count > 1:
+        sizes.append(leaf_count)
+        leaf_count = (leaf_count + 1) // 2
+    return sizes
+
+
+def generate_multiproof(targets: Sequence[str], hashes: List[str]) -> dict:
+    return MerkleTree(hashes).generate_multiproof(targets)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_well_formed(targets: Sequence[str], proof: Any) -> bool:
+    # proofs are read from untrusted JSON
+    if not isinstance(proof, dict):
+        return False
+    indices, hashes = proof.get("indices"), proof.get("hashes")
+    return (
+        _is_int(proof.get("leaf_count"))
+        and isinstance(indices, list)
+        and all(_is_int(index) for index in indices)
+        and isinstance(hashes, list)
+        and all(isinstance(h, str) for h in hashes)
+        and all(isinstance(target, str) for target in targets)
+    )
+
+
+def verify_multiproof(targets: Sequence[str], root: str, proof: Dict[str, Any]) -> bool:
+    """Checks that targets are the leaves at proof["indices"] of the tree with
+    the given root, hashing each needed node once, level by level. Malformed
+    proofs are invalid."""
+    if not _is_well_formed(targets, proof):
+        return False
+    indices = proof["indices"]
+    leaf_count = proof["leaf_count"]
+    if not targets or len(targets) != len(indices) or leaf_count < 2:
+        return False
+    level: Dict[int, str] = {}
+    for index, target in zip(indices, targets):
+        if not 0 <= index < leaf_count or level.setdefault(index, target) != target:
+            return False
+    hashes = iter(proof["hashes"])
+    for size in _level_sizes(leaf_count):
+        parents = {}
+        for index in sorted(level):
+            if index & 1 and index - 1 in level:
+                continue
+            sibling = level.get(index ^ 1)
+            if sibling is None:
+                sibling = ZERO_HASH if index ^ 1 >= size else next(hashes, None)
+                if sibling is None:
+                    return False
+            parents[index // 2] = hash_pair(level[index], sibling)
+        level = parents
+    return next(hashes, None) is None and level == {0: root}
+
+
+class MerkleTree:
+    def __init__(self, hashes: List[str]):
+        # levels are packed into a single buffer of fixed-width hashes, unless
+        # the leaves are not all "0x"-prefixed 32-byte hex strings
+        self.levels = [_pack_level(level) for level in _iterate_merkle_tree(hashes)]
+        last_level = [_get_node(self.levels[-1], i).encode() for i in (0, 1)]
+        self.root = _compute_next_hashes(last_level)[0].decode()
+        self._leaf_indices: Dict[str, int] = {}
+        for index, hash_value in enumerate(hashes):
+            self._leaf_indices.setdefault(hash_value, index)
+        self.leaf_count = len(hashes)
+
+    def __len__(self) -> int:
+        return len(self._leaf_indices)
+
+    def __contains__(self, target: str) -> bool:
+        return target in self._leaf_indices
+
+    @property
+    def node_count(self) -> int:
+        return sum(
+            len(level) if isinstance(level, list) else len(level) // HASH_SIZE
+            for level in self.levels
+        )
+
+    def index(self, target: str) -> int:
+        try:
+            return self._leaf_indices[target]
+        except KeyError:
+            raise ValueError(f"{target} is not in the tree") from None
+
+    def generate_proof(self, target: str) -> List[str]:
+        index = self.index(target)
+        proof = []
+        for level in self.levels:
+            proof.append(_get_node(level, index ^ 1))
+            index //= 2
+        return proof
+
+    def generate_multiproof(self, targets: Sequence[str]) -> dict:
+        """Returns a proof for several leaves at once: their indices, the
+        number of leaves and the nodes which cannot be computed from them,
+        level by level in index order. Padding nodes are left out."""
+        indices = list(dict.fromkeys(self.index(target) for target in targets))
+        known = sorted(indices)
+        hashes = []
+        for level, size in zip(self.levels, _level_sizes(self.leaf_count)):
+            known_set = set(known)
+            for index in known:
+                sibling = index ^ 1
+                if sibling not in known_set and sibling < size:
+                    hashes.append(_get_node(level, sibling))
+            known = list(dict.fromkeys(index // 2 for index in known))
+        return {"indices": indices, "leaf_count": self.leaf_count, "hashes": hashes}
@@ -1,45 +1,336 @@
-from typing import List
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, replace
+import queue
+import time
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
 
 from .transaction import Transaction
 from .blockchain import Blockchain
 from .block import Block
+from .block_header import BlockHeader
+from .header_hasher import HeaderHasher
+from .ledger import Ledger
 from .mempool import Mempool
 
+# seconds between the timestamps of consecutive mined blocks
+BLOCK_INTERVAL = 10
+# nonces tried for a header before its timestamp is rolled, as with 32-bit nonces
+NONCE_RANGE = 2**32
+# nonces searched by a worker per task
+SLICE_SIZE = 1 << 16
+
+
+@dataclass
+class BlockTemplate:
+    """Transactions selected for a block and their Merkle root, everything
+    needed to mine it except the header fields depending on the head."""
+
+    # timestamp for which the transactions were selected: the block can be
+    # mined with any later timestamp
+    timestamp: int
+    transactions: List[Transaction]
+    transactions_merkle_root: str
+    build_time: float
+
+    @property
+    def fees(self) -> int:
+        return sum(tx.transaction_fee for tx in self.transactions)
+
+    @property
+    def min_fee(self) -> int:
+        return min(tx.transaction_fee for tx in self.transactions)
+
 
 class Miner:
-    def __init__(self, address: str, blockchain: Blockchain, mempool: Mempool):
+    def __init__(
+        self,
+        address: str,
+        blockchain: Blockchain,
+        mempool: Mempool,
+        workers: int = 1,
+    ):
         self.address = address
         self.blockchain = blockchain
         self.mempool = mempool
+        self.workers = workers
 
     def mine_next(self):
-        timestamp = self.blockchain.timestamp + 10
-        txs_to_mine = self.get_most_profitable_transactions(timestamp)
+        timestamp = self.blockchain.timestamp + BLOCK_INTERVAL
+        self.mempool.expire(timestamp)
+        template = self.build_template(timestamp)
         block = Block.mine(
             difficulty=self.blockchain.get_next_difficulty(),
             height=self.blockchain.height + 1,
             miner=self.address,
             previous_block_header_hash=self.blockchain.head.header.hash,
             timestamp=timestamp,
-            transactions=txs_to_mine,
+            transactions=template.transactions,
+            workers=self.workers,
+            transactions_merkle_root=template.transactions_merkle_root,
         )
         self.blockchain.process_block(block)
-        self.mempool.remove_transactions(txs_to_mine)
+        self.mempool.remove_transactions(template.transactions)
         return block
 
-    def get_most_profitable_transactions(self, timestamp: int) -> List[Transaction]:
-        txs_by_fee = sorted(
-            self.mempool.get_live_transactions(timestamp),
-            key=lambda tx: tx.transaction_fee,
-            reverse=True,
+    def build_template(
+        self,
+        timestamp: int,
+        balances: Optional[Ledger] = None,
+        exclude: Collection[Transaction] = (),
+    ) -> BlockTemplate:
+        """Selects transactions for a block at timestamp, spending from
+        balances (the head's by default) and skipping those in exclude."""
+        start = time.perf_counter()
+        transactions = self.get_most_profitable_transactions(
+            timestamp, balances, exclude
+        )
+        merkle_root = Block._compute_transactions_merkle_root(transactions)
+        return BlockTemplate(
+            timestamp, transactions, merkle_root, time.perf_counter() - start
         )
 
-        balances = self.blockchain.balances.copy()
+    def get_most_profitable_transactions(
+        self,
+        timestamp: int,
+        balances: Optional[Ledger] = None,
+        exclude: Collection[Transaction] = (),
+    ) -> List[Transaction]:
+        if balances is None:
+            balances = self.blockchain.balances
+        balances = balances.copy()
         txs_to_mine = []
-        for tx in txs_by_fee:
+        for tx in self.mempool.iter_live_by_fee(timestamp):
+            if tx in exclude:
+                continue
             if balances.get(tx.sender, 0) >= tx.amount + tx.transaction_fee:
                 Blockchain.update_balances(balances, tx, self.address)
                 txs_to_mine.append(tx)
                 if len(txs_to_mine) == self.blockchain.max_txs_per_block:
                     break
         return txs_to_mine
+
+
+@dataclass
+class MiningReport:
+    workers: int
+    blocks: int = 0
+    templates: int = 0
+    template_time: float = 0.0
+    template_time_max: float = 0.0
+    # templates rebuilt because of higher-fee transactions
+    refreshes: int = 0
+    timestamp_rolls: int = 0
+    hash_attempts: int = 0
+    # time spent by the workers hashing
+    hashing_time: float = 0.0
+    elapsed: float = 0.0
+
+    def add_template(self, template: BlockTemplate):
+        self.templates += 1
+        self.template_time += template.build_time
+        self.template_time_max = max(self.template_time_max, template.build_time)
+
+    @property
+    def hashing_share(self) -> float:
+        """Fraction of the workers' time spent hashing."""
+        if self.elapsed == 0:
+            return 0.0
+        return self.hashing_time / (self.elapsed * self.workers)
+
+    def summary(self) -> str:
+        mean = self.template_time / self.templates if self.templates else 0.0
+        hashrate = self.hash_attempts / self.hashing_time if self.hashing_time else 0.0
+        return "\n".join(
+            [
+                f"blocks mined: {self.blocks} in {self.elapsed:.2f} s",
+                f"templates built: {self.templates} ({self.refreshes} refreshes, "
+                f"{self.timestamp_rolls} timestamp rolls)",
+                f"template latency: mean {mean * 1e3:.2f} ms, "
+                f"max {self.template_time_max * 1e3:.2f} ms",
+                f"hashing: {self.hashing_share:.1%} of {self.workers} workers' time, "
+                f"{hashrate:,.0f} hashes/s",
+            ]
+        )
+
+
+def _search_slice(
+    header: BlockHeader, start: int, stop: int
+) -> Tuple[Optional[int], int, float]:
+    begin = time.perf_counter()
+    nonce = HeaderHasher(header).find_nonce(start, 1, stop)
+    elapsed = time.perf_counter() - begin
+    attempts = stop - start if nonce is None else nonce - start + 1
+    return nonce, attempts, elapsed
+
+
+class ContinuousMiner(Miner):
+    """Mines blocks back to back, keeping a pool of processes hashing.
+
+    The nonce space of a header is searched in slices by the workers, with
+    twice as many slices in flight as workers. Meanwhile, the mining thread
+    builds the template of the next block, assuming the current one gets
+    mined, so that only the header is left to fill once it is. Transactions
+    handed to submit, from any thread, are added to the mempool by the mining
+    thread between slices. The current template is rebuilt when they could
+    make it pay more, and its timestamp is rolled when its nonces run out.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        blockchain: Blockchain,
+        mempool: Mempool,
+        workers: int = 1,
+        slice_size: int = SLICE_SIZE,
+        nonce_range: int = NONCE_RANGE,
+    ):
+        super().__init__(address, blockchain, mempool, workers=workers)
+        self.slice_size = slice_size
+        self.nonce_range = nonce_range
+        self.report = MiningReport(workers)
+        self._incoming: queue.SimpleQueue = queue.SimpleQueue()
+        self._next_template: Optional[BlockTemplate] = None
+
+    def submit(self, tx: Transaction):
+        self._incoming.put(tx)
+
+    def iter_blocks(self, count: int) -> Iterator[Block]:
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for _ in range(count):
+                yield self._mine_block(executor)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _build(
+        self,
+        timestamp: int,
+        balances: Optional[Ledger] = None,
+        exclude: Collection[Transaction] = (),
+    ) -> BlockTemplate:
+        template = self.build_template(timestamp, balances, exclude)
+        self.report.add_template(template)
+        return template
+
+    def _build_next(self, template: BlockTemplate, timestamp: int) -> BlockTemplate:
+        balances = self.blockchain.balances.copy()
+        for tx in template.transactions:
+            Blockchain.update_balances(balances, tx, self.address)
+        return self._build(
+            timestamp + BLOCK_INTERVAL, balances, set(template.transactions)
+        )
+
+    def _receive(self) -> List[Transaction]:
+        received = []
+        while True:
+            try:
+                tx = self._incoming.get_nowait()
+            except queue.Empty:
+                break
+            if self.mempool.add(tx):
+                received.append(tx)
+        if received:
+            # the next template may now miss better transactions
+            self._next_template = None
+        return received
+
+    def _is_improved_by(
+        self, template: BlockTemplate, timestamp: int, received: List[Transaction]
+    ) -> bool:
+        # balances are not checked, so the rebuilt template may be the same
+        full = len(template.transactions) == self.blockchain.max_txs_per_block
+        min_fee = template.min_fee if template.transactions else 0
+        return any(
+            tx.lock_time <= timestamp and (not full or tx.transaction_fee > min_fee)
+            for tx in received
+        )
+
+    def _header(self, template: BlockTemplate, timestamp: int) -> BlockHeader:
+        return BlockHeader(
+            difficulty=self.blockchain.get_next_difficulty(),
+            height=self.blockchain.height + 1,
+            miner=self.address,
+            nonce=0,
+            previous_block_header_hash=self.blockchain.head.header.hash,
+            timestamp=timestamp,
+            transactions_count=len(template.transactions),
+            transactions_merkle_root=template.transactions_merkle_root,
+        )
+
+    def _mine_block(self, executor: ProcessPoolExecutor) -> Block:
+        start = time.perf_counter()
+        report = self.report
+        self._receive()
+        timestamp = self.blockchain.timestamp + BLOCK_INTERVAL
+        template = self._next_template
+        self._next_template = None
+        if self.mempool.expire(timestamp):
+            # the prefetched template may include expired transactions
+            template = None
+        if template is None or template.timestamp > timestamp:
+            template = self._build(timestamp)
+        header = self._header(template, timestamp)
+        nonce = 0
+        in_flight: Dict[Future, BlockHeader] = {}
+        prefetch = True
+        try:
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    if nonce >= self.nonce_range:
+                        header = replace(header, timestamp=header.timestamp + 1)
+                        nonce = 0
+                        report.timestamp_rolls += 1
+                    stop = min(nonce + self.slice_size, self.nonce_range)
+                    future = executor.submit(_search_slice, header, nonce, stop)
+                    in_flight[future] = header
+                    nonce = stop
+
+                if self._next_template is None and prefetch:
+                    try:
+                        self._next_template = self._build_next(
+                            template, header.timestamp
+                        )
+                    except ValueError:
+                        # e.g. too few transactions left: the error is raised
+                        # when the next block is mined, as with mine_next
+                        prefetch = False
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                # in submission order, so that the lowest nonce found wins
+                for future in [f for f in in_flight if f in done]:
+                    searched = in_flight.pop(future)
+                    found, attempts, elapsed = future.result()
+                    report.hash_attempts += attempts
+                    report.hashing_time += elapsed
+                    if found is not None and searched is header:
+                        return self._add_block(template, replace(header, nonce=found))
+
+                received = self._receive()
+                if received and self._is_improved_by(
+                    template, header.timestamp, received
+                ):
+                    template = self._build(header.timestamp)
+                    header = self._header(template, header.timestamp)
+                    nonce = 0
+                    report.refreshes += 1
+                    prefetch = True
+                    in_flight = {
+                        future: searched
+                        for future, searched in in_flight.items()
+                        if not future.cancel()
+                    }
+        finally:
+            # slices already running finish in the background, and are ignored
+            for future in in_flight:
+                future.cancel()
+            report.elapsed += time.perf_counter() - start
+
+    def _add_block(self, template: BlockTemplate, header: BlockHeader) -> Block:
+        header.hash = header.sha256_hash()
+        block = Block(header=header, transactions=template.transactions)
+        self.blockchain.process_block(block)
+        self.mempool.remove_transactions(template.transactions)
+        self.report.blocks += 1
+        return block
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+from typing import List, Optional, Set, Tuple, Union
+
+from .block import Block
+from .blockchain import Blockchain
+from .header_chain import validate_hash, validate_work
+from .mempool import Mempool
+from .transaction import Transaction
+
+# messages are single JSON lines: {"type": "tx" | "block", "data": {...}}
+MAX_MESSAGE_SIZE = 1 << 22
+VALIDATION_BATCH_SIZE = 256
+
+Item = Union[Transaction, Block]
+
+
+def encode_message(item: Item) -> bytes:
+    kind = "tx" if isinstance(item, Transaction) else "block"
+    return json.dumps({"type": kind, "data": item.to_dict()}).encode() + b"\n"
+
+
+def decode_message(line: bytes) -> Tuple[str, Item]:
+    message = json.loads(line)
+    if message["type"] == "tx":
+        tx = Transaction.from_dict(message["data"])
+        return tx.sha256_hash(), tx
+    if message["type"] == "block":
+        block = Block.from_dict(message["data"])
+        # checked before the hash is marked as seen, so that a forged block
+        # cannot take the place of the real one
+        validate_hash(block.header)
+        validate_work(block.header)
+        return block.header.hash, block
+    raise ValueError(f"unknown message type {message['type']}")
+
+
+class SeenHashes:
+    """Bounded set of recently seen hashes, the least recently seen evicted."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._hashes: OrderedDict[str, None] = OrderedDict()
+
+    def add(self, item_hash: str) -> bool:
+        if item_hash in self._hashes:
+            self._hashes.move_to_end(item_hash)
+            return False
+        self._hashes[item_hash] = None
+        if len(self._hashes) > self.max_size:
+            self._hashes.popitem(last=False)
+        return True
+
+    def __contains__(self, item_hash: str) -> bool:
+        return item_hash in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+class Peer:
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        max_outbound: int,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.outbound: asyncio.Queue[bytes] = asyncio.Queue(max_outbound)
+        self.tasks: List[asyncio.Task] = []
+
+
+class Node:
+    """Gossips transactions and blocks with peers over TCP.
+
+    The network side only parses and deduplicates messages. Validation runs
+    one item at a time in a worker thread, fed by a bounded queue: when it is
+    full, reading from the peers stops until validation catches up, and TCP
+    flow control pushes back on the senders. Outbound messages are dropped
+    for peers whose own queue is full.
+    """
+
+    def __init__(
+        self,
+        blockchain: Blockchain,
+        mempool: Mempool,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_pending: int = 1024,
+        max_outbound: int = 4096,
+        max_seen: int = 100_000,
+    ):
+        self.blockchain = blockchain
+        self.mempool = mempool
+        self.host = host
+        self.port = port
+        self.max_outbound = max_outbound
+        self.peers: Set[Peer] = set()
+        self.seen = SeenHashes(max_seen)
+        self.stats: Counter[str] = Counter()
+        self._pending: Optional[asyncio.Queue] = None
+        self.max_pending = max_pending
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._validator: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._pending = asyncio.Queue(self.max_pending)
+        # a single thread, so that the chain and the mempool are only ever
+        # modified by one validation at a time
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._validator = asyncio.create_task(self._validate_loop())
+        self._server = await asyncio.start_server(
+            self._add_peer, self.host, self.port, limit=MAX_MESSAGE_SIZE
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def connect(self, host: str, port: int):
+        reader, writer = await asyncio.open_connection(
+            host, port, limit=MAX_MESSAGE_SIZE
+        )
+        await self._add_peer(reader, writer)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        tasks = [t for peer in self.peers for t in peer.tasks]
+        if self._validator is not None:
+            tasks.append(self._validator)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for peer in list(self.peers):
+            peer.writer.close()
+        self.peers.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    async def submit(self, item: Item):
+        """Validates a local transaction or block and gossips it if valid."""
+        line = encode_message(item)
+        try:
+            item_hash, item = decode_message(line)
+        except ValueError:
+            self.stats["rejected"] += 1
+            return
+        await self._receive(item_hash, item, line, None)
+
+    async def wait_idle(self):
+        await self._pending.join()
+
+    async def _add_peer(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        peer = Peer(reader, writer, self.max_outbound)
+        self.peers.add(peer)
+        peer.tasks = [
+            asyncio.create_task(self._read_loop(peer)),
+            asyncio.create_task(self._write_loop(peer)),
+        ]
+
+    def _drop_peer(self, peer: Peer):
+        if peer in self.peers:
+            self.peers.remove(peer)
+            for task in peer.tasks:
+                if task is not asyncio.current_task():
+                    task.cancel()
+            peer.writer.close()
+
+    async def _read_loop(self, peer: Peer):
+        try:
+            while True:
+                line = await peer.reader.readline()
+                if not line:
+                    break
+                item_hash, item = decode_message(line)
+                await self._receive(item_hash, item, line, peer)
+        except (ValueError, KeyError, TypeError, ConnectionError):
+            # malformed messages, blocks without proof of work or oversized
+            # lines: the peer is disconnected
+            self.stats["malformed"] += 1
+        finally:
+            self._drop_peer(peer)
+
+    async def _write_loop(self, peer: Peer):
+        try:
+            while True:
+                lines = [await peer.outbound.get()]
+                while not peer.outbound.empty():
+                    lines.append(peer.outbound.get_nowait())
+                peer.writer.writelines(lines)
+                await peer.writer.drain()
+        except ConnectionError:
+            self._drop_peer(peer)
+
+    async def _receive(
+        self, item_hash: str, item: Item, line: bytes, origin: Optional[Peer]
+    ):
+        self.stats["received"] += 1
+        if not self.seen.add(item_hash):
+            self.stats["duplicate"] += 1
+            return
+        await self._pending.put((item, line, origin))
+
+    async def _validate_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # everything already queued is validated in one hand-off to the
+            # worker thread, in arrival order
+            batch = [await self._pending.get()]
+            while len(batch) < VALIDATION_BATCH_SIZE and not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            results = await loop.run_in_executor(
+                self._executor, self._validate_batch, [item for item, _, _ in batch]
+            )
+            for (_, line, origin), accepted in zip(batch, results):
+                if accepted:
+                    self.stats["accepted"] += 1
+                    self._broadcast(line, origin)
+                else:
+                    self.stats["rejected"] += 1
+                self._pending.task_done()
+
+    def _validate_batch(self, items: List[Item]) -> List[bool]:
+        results = []
+        for item in items:
+            try:
+                results.append(self._validate(item))
+            except Exception:
+                results.append(False)
+        return results
+
+    def _validate(self, item: Item) -> bool:
+        if isinstance(item, Transaction):
+            if self.blockchain.check_signatures and not item.verify_signature():
+                return False
+            return self.mempool.add(item)
+        # only blocks extending the head are accepted, there is no fork choice
+        self.blockchain.process_block(item)
+        self.mempool.remove_transactions(item.transactions)
+        self.mempool.expire(item.header.timestamp)
+        return True
+
+    def _broadcast(self, line: bytes, origin: Optional[Peer]):
+        for peer in self.peers:
+            if peer is origin:
+                continue
+            try:
+                peer.outbound.put_nowait(line)
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def run_node(node: Node, peers: List[str], stats_interval: float = 0):
+    await node.start()
+    try:
+        for address in peers:
+            await node.connect(*parse_address(address))
+        while True:
+            await asyncio.sleep(stats_interval or 3600)
+            if stats_interval:
+                mempool = node.mempool
+                print(
+                    json.dumps(
+                        {
+                            "height": node.blockchain.height,
+                            **node.stats,
+                            "mempool": len(mempool),
+                            "mempool_evicted": mempool.evicted,
+                            "mempool_expired": mempool.expired,
+                            "mempool_min_fee": mempool.min_fee,
+                        }
+                    )
+                )
+    finally:
+        await node.close()
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import Callable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .block_store import INDEX_FILE, BlockStore
+from .blockchain import Blockchain, iter_state_blocks
+
+
+class QueryService:
+    """Answers transaction hash and inclusion proof queries from a chain kept
+    in memory, following the blocks appended to its state.
+
+    Only the follower thread writes to the chain: blocks are appended one at a
+    time, and a rewritten state is loaded into a new Blockchain which then
+    replaces the current one, so queries never wait for validation.
+
+    A block store is followed by reading only the new blocks. A JSON state
+    file cannot be read from the middle: every change decodes it from the
+    start, which grows with the chain, so large chains are better served from
+    a block store.
+    """
+
+    def __init__(self, state_path: str, load: Callable[[], Blockchain]):
+        self.state_path = state_path
+        self._load = load
+        self.blockchain = load()
+        self._state_version: Optional[Tuple[float, int]] = self._get_state_version()
+        # Merkle trees are cached by the chain, which is not thread-safe
+        self._merkle_lock = threading.Lock()
+
+    def _get_state_version(self) -> Tuple[float, int]:
+        if BlockStore.is_block_store(self.state_path):
+            stat = os.stat(os.path.join(self.state_path, INDEX_FILE))
+        else:
+            stat = os.stat(self.state_path)
+        return stat.st_mtime, stat.st_size
+
+    def refresh(self) -> int:
+        """Processes the blocks added to the state since the last call and
+        returns how many there were."""
+        version = self._get_state_version()
+        if version == self._state_version:
+            return 0
+        self._state_version = version
+        blockchain = self.blockchain
+        known = len(blockchain.blocks)
+        if BlockStore.is_block_store(self.state_path):
+            with BlockStore(self.state_path, read_only=True) as store:
+                if (
+                    len(store) >= known
+                    and store.read_block(known - 1).header.hash
+                    == blockchain.head.header.hash
+                ):
+                    for block in store.iter_blocks(known):
+                        blockchain.process_block(block)
+                    return len(blockchain.blocks) - known
+        else:
+            # the known blocks are decoded again, only to check their hashes
+            count = added = 0
+            for count, block in enumerate(iter_state_blocks(self.state_path), 1):
+                if count <= known:
+                    if block.header.hash != blockchain.blocks[count - 1].header.hash:
+                        break
+                else:
+                    blockchain.process_block(block)
+                    added += 1
+            else:
+                if count >= known:
+                    return added
+        # the state no longer extends the chain in memory
+        self.blockchain = self._load()
+        return len(self.blockchain.blocks)
+
+    def follow(self, interval: float, stop: threading.Event, max_backoff: float = 60.0):
+        delay = interval
+        while not stop.wait(delay):
+            try:
+                self.refresh()
+                delay = interval
+            except Exception as error:
+                # a state being rewritten can be read half written, or hold an
+                # invalid block: it is read again, less often while it fails
+                height = len(self.blockchain.blocks)
+                print(
+                    f"cannot follow {self.state_path} at block {height}: {error!r}",
+                    file=sys.stderr,
+                )
+                self._state_version = None
+                delay = min(2 * delay, max(interval, max_backoff))
+
+    def status(self) -> dict:
+        blockchain = self.blockchain
+        return {"height": blockchain.height, "head": blockchain.head.header.hash}
+
+    def get_transaction_hash(self, block: int, index: int) -> dict:
+        transactions = self.blockchain.blocks[block].transactions
+        return {"hash": transactions[index].sha256_hash()}
+
+    def generate_proof(self, block: int, transaction_hash: str) -> dict:
+        with self._merkle_lock:
+            proof = self.blockchain.generate_inclusion_proof(block, transaction_hash)
+        return {"block": block, "hash": transaction_hash, "proof": proof}
+
+    def verify_proof(self, proof: dict) -> dict:
+        if "hashes" in proof:
+            valid = self.blockchain.verify_inclusion_multiproof(
+                proof["block"], proof["hashes"], proof["proof"]
+            )
+            return {"valid": valid}
+        valid = self.blockchain.verify_inclusion_proof(
+            proof["block"], proof["hash"], proof["proof"]
+        )
+        return {"valid": valid}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP/1.1, with keep-alive connections.
+
+    GET /status, GET /tx-hash?block=N&index=I, GET /proof?block=N&hash=H and
+    POST /verify with a proof as written by generate-proof or generate-multiproof.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: QueryServer
+
+    def setup(self):
+        # headers and body are written separately, which Nagle's algorithm
+        # would delay on keep-alive TCP connections
+        self.disable_nagle_algorithm = self.request.family != socket.AF_UNIX
+        super().setup()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        service = self.server.service
+        if url.path == "/status":
+            self._respond(service.status)
+        elif url.path == "/tx-hash":
+            self._respond(
+                lambda: service.get_transaction_hash(
+                    int(query["block"]), int(query["index"])
+                )
+            )
+        elif url.path == "/proof":
+            self._respond(
+                lambda: service.generate_proof(int(query["block"]), query["hash"])
+            )
+        else:
+            self._send(404, {"error": f"unknown path {url.path}"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path == "/verify":
+            self._respond(lambda: self.server.service.verify_proof(json.loads(body)))
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def _respond(self, query: Callable[[], dict]):
+        try:
+            result = query()
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            self._send(400, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            self._send(200, result)
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: QueryService, verbose: bool = False):
+        self.service = service
+        self.verbose = verbose
+        super().__init__(address, QueryHandler)
+
+
+class UnixQueryServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: QueryService, verbose: bool = False):
+        self.service = service
+        self.verbose = verbose
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, QueryHandler)
+
+
+def serve(
+    service: QueryService,
+    address: Optional[Tuple[str, int]] = None,
+    unix_socket: Optional[str] = None,
+    poll_interval: float = 1.0,
+    verbose: bool = False,
+):
+    server: socketserver.BaseServer
+    if unix_socket is not None:
+        server = UnixQueryServer(unix_socket, service, verbose=verbose)
+    else:
+        server = QueryServer(address, service, verbose=verbose)
+    stop = threading.Event()
+    if poll_interval > 0:
+        threading.Thread(
+            target=service.follow, args=(poll_interval, stop), daemon=True
+        ).start()
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        if unix_socket is not None and os.path.exists(unix_socket):
+            os.remove(unix_socket)
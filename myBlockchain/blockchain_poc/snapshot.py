@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .block import Block
+from .utils import fsync_path, open_file, sha256_hexdigest
+
+SNAPSHOT_FILE = "snapshot-{:010d}.json.gz"
+SNAPSHOT_FILE_PATTERN = re.compile(r"^snapshot-(\d+)\.json\.gz$")
+
+
+@dataclass
+class BalanceSnapshot:
+    height: int
+    head_hash: str
+    balances: Dict[str, int]
+    # of the balances, see balances_checksum
+    checksum: str = ""
+
+    @classmethod
+    def from_file(cls, filename: str) -> BalanceSnapshot:
+        with open_file(filename) as f:
+            return cls(**json.load(f))
+
+    def to_file(self, filename: str):
+        with open_file(filename, "wt") as f:
+            json.dump(asdict(self), f)
+
+    def matches(self, blocks: Sequence[Block]) -> bool:
+        return (
+            0 <= self.height < len(blocks)
+            and blocks[self.height].header.hash == self.head_hash
+        )
+
+    def checksum_matches(self) -> bool:
+        return self.checksum == balances_checksum(self.balances)
+
+    def verify(self, blocks: Sequence[Block]):
+        if not self.matches(blocks):
+            raise ValueError(
+                f"snapshot head hash {self.head_hash} does not match the chain at height {self.height}"
+            )
+        if not self.checksum_matches():
+            raise ValueError(
+                f"snapshot balances at height {self.height} do not match their checksum"
+            )
+
+
+def balances_checksum(balances: Dict[str, int]) -> str:
+    # independent of the order of the accounts
+    return sha256_hexdigest(json.dumps(balances, sort_keys=True))
+
+
+def _list_snapshots(directory: str) -> List[Tuple[int, str]]:
+    # newest first
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for filename in os.listdir(directory):
+        match = SNAPSHOT_FILE_PATTERN.match(filename)
+        if match:
+            snapshots.append((int(match.group(1)), os.path.join(directory, filename)))
+    return sorted(snapshots, reverse=True)
+
+
+def list_snapshots(directory: str) -> List[str]:
+    return [filename for _, filename in _list_snapshots(directory)]
+
+
+def latest_snapshot_height(directory: str) -> int:
+    """Returns -1 if there is no snapshot."""
+    snapshots = _list_snapshots(directory)
+    return snapshots[0][0] if snapshots else -1
+
+
+def write_snapshot(snapshot: BalanceSnapshot, directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, SNAPSHOT_FILE.format(snapshot.height))
+    # written under a temporary name so that a crash never leaves a truncated
+    # snapshot behind
+    temporary_filename = os.path.join(directory, "tmp-" + os.path.basename(filename))
+    snapshot.to_file(temporary_filename)
+    fsync_path(temporary_filename)
+    os.replace(temporary_filename, filename)
+    fsync_path(directory)
+    return filename
+
+
+def find_latest_snapshot(
+    directory: str, blocks: Sequence[Block]
+) -> Optional[BalanceSnapshot]:
+    """Snapshots whose balances do not match their checksum are skipped."""
+    for height, filename in _list_snapshots(directory):
+        if height >= len(blocks):
+            continue
+        snapshot = BalanceSnapshot.from_file(filename)
+        if snapshot.matches(blocks) and snapshot.checksum_matches():
+            return snapshot
+    return None
@@ -0,0 +1,260 @@
+"""Timers and counters for the hot paths.
+
+Instrumentation is off by default and then costs nothing: enable() wraps the
+instrumented methods and functions with timed versions, and disable() puts
+the originals back. Only open_file checks whether stats are enabled, once
+per opened file. Totals include nested calls, e.g. process_block includes
+process_transaction, and updates are not locked, so numbers from the
+threaded commands are approximate.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import functools
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROMETHEUS_PREFIX = "blockchain_poc_"
+
+
+@dataclass
+class Timer:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class Stats:
+    def __init__(self):
+        self.enabled = False
+        self.timers: Dict[str, Timer] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add_time(self, name: str, elapsed: float):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = Timer()
+        timer.add(elapsed)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+
+    def derived(self) -> Dict[str, float]:
+        values = {}
+        mine = self.timers.get("block.mine")
+        if mine is not None and mine.total > 0:
+            values["block.hashrate"] = (
+                self.counters.get("block.hash_attempts", 0) / mine.total
+            )
+        return values
+
+    def to_dict(self) -> dict:
+        return {
+            "timers": {
+                name: {"count": t.count, "total": t.total, "max": t.max}
+                for name, t in sorted(self.timers.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "derived": self.derived(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, value: float):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value!r}")
+
+        for name, t in sorted(self.timers.items()):
+            base = PROMETHEUS_PREFIX + _metric_name(name)
+            metric(base + "_calls_total", "counter", t.count)
+            metric(base + "_seconds_total", "counter", t.total)
+            metric(base + "_seconds_max", "gauge", t.max)
+        for name, value in sorted(self.counters.items()):
+            metric(PROMETHEUS_PREFIX + _metric_name(name) + "_total", "counter", value)
+        for name, value in sorted(self.derived().items()):
+            metric(PROMETHEUS_PREFIX + _metric_name(name), "gauge", value)
+        return "".join(line + "\n" for line in lines)
+
+    def summary(self) -> str:
+        lines = [f"{'timer':40s}{'calls':>10s}{'total (s)':>12s}{'mean (ms)':>12s}"]
+        for name, t in sorted(self.timers.items()):
+            lines.append(
+                f"{name:40s}{t.count:10d}{t.total:12.3f}"
+                f"{t.total / t.count * 1e3:12.3f}"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:40s}{value:10d}")
+        for name, derived in sorted(self.derived().items()):
+            lines.append(f"{name:40s}{derived:22,.0f}/s")
+        return "\n".join(lines)
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+STATS = Stats()
+
+# counters updated from the arguments and result of an instrumented call
+After = Callable[[Tuple[Any, ...], Any], None]
+
+
+def _count_block_transactions(args: Tuple[Any, ...], result: Any):
+    STATS.count("blockchain.transactions", len(args[1].transactions))
+
+
+def _count_hash_attempts(args: Tuple[Any, ...], block: Any):
+    # nonces are tried in increasing order, by every worker at the same pace
+    STATS.count("block.hash_attempts", block.header.nonce + 1)
+
+
+def _count_selected_transactions(args: Tuple[Any, ...], transactions: Any):
+    STATS.count("miner.selected_transactions", len(transactions))
+
+
+def _instrumented() -> List[Tuple[Any, str, str, Optional[After]]]:
+    # imported here, as the instrumented modules import this one
+    from . import block, blockchain, execution, mempool, merkle, miner
+
+    return [
+        (block.Block, "mine", "block.mine", _count_hash_attempts),
+        (block.Block, "validate", "block.validate", None),
+        (
+            blockchain.Blockchain,
+            "process_block",
+            "blockchain.process_block",
+            _count_block_transactions,
+        ),
+        (
+            blockchain.Blockchain,
+            "process_transaction",
+            "blockchain.process_transaction",
+            None,
+        ),
+        (
+            execution,
+            "execute_transactions",
+            "execution.execute_transactions",
+            None,
+        ),
+        (blockchain.Blockchain, "load_state", "blockchain.load_state", None),
+        (blockchain.Blockchain, "write_state", "blockchain.write_state", None),
+        (merkle, "generate_root", "merkle.generate_root", None),
+        (merkle.MerkleTree, "__init__", "merkle.build_tree", None),
+        (mempool.Mempool, "from_file", "mempool.from_file", None),
+        (
+            miner.Miner,
+            "get_most_profitable_transactions",
+            "miner.select_transactions",
+            _count_selected_transactions,
+        ),
+        (miner.Miner, "build_template", "miner.build_template", None),
+    ]
+
+
+def _timed(func: Callable, name: str, after: Optional[After]) -> Callable:
+    add_time = STATS.add_time
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            add_time(name, perf_counter() - start)
+        if after is not None:
+            after(args, result)
+        return result
+
+    return wrapper
+
+
+_originals: List[Tuple[Any, str, Any]] = []
+
+
+def enable():
+    if STATS.enabled:
+        return
+    for owner, attribute, name, after in _instrumented():
+        original = vars(owner)[attribute]
+        if isinstance(original, (classmethod, staticmethod)):
+            wrapped: Any = type(original)(_timed(original.__func__, name, after))
+        else:
+            wrapped = _timed(original, name, after)
+        _originals.append((owner, attribute, original))
+        setattr(owner, attribute, wrapped)
+    STATS.enabled = True
+
+
+def disable():
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    STATS.enabled = False
+
+
+class TimedFile:
+    """File proxy timing reads and writes, returned by open_file when stats
+    are enabled. Time spent decompressing gzip files is included."""
+
+    def __init__(self, f: Any):
+        self._file = f
+
+    def read(self, *args):
+        start = time.perf_counter()
+        data = self._file.read(*args)
+        STATS.add_time("file.read", time.perf_counter() - start)
+        STATS.count("file.read_size", len(data))
+        return data
+
+    def read1(self, *args):
+        # used by text wrappers around binary files
+        start = time.perf_counter()
+        data = self._file.read1(*args)
+        STATS.add_time("file.read", time.perf_counter() - start)
+        STATS.count("file.read_size", len(data))
+        return data
+
+    def readline(self, *args):
+        start = time.perf_counter()
+        line = self._file.readline(*args)
+        STATS.add_time("file.read", time.perf_counter() - start)
+        STATS.count("file.read_size", len(line))
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, self._file.read(0))
+
+    def write(self, data):
+        start = time.perf_counter()
+        written = self._file.write(data)
+        STATS.add_time("file.write", time.perf_counter() - start)
+        STATS.count("file.write_size", len(data))
+        return written
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
+
+
+def write_report(path: str, output_format: str):
+    report = STATS.to_prometheus() if output_format == "prometheus" else STATS.to_json()
+    with open(path, "w") as f:
+        f.write(report)
@@ -0,0 +1,81 @@
+"""Stateless block checks run ahead of processing, in worker processes.
+
+Merkle roots and signatures only depend on the block itself, so they are
+computed by a pool of processes, in batches of consecutive blocks. Results
+come back in block order and Blockchain.process_block uses them in place of
+computing them, at the same point of its checks as the sequential path, so
+that the first error is the same. Everything depending on the chain (height,
+linkage, timestamps and balances) stays in the main process.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+import itertools
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .block import Block
+from .transaction import verify_signatures
+
+# blocks sent to a worker at a time
+BATCH_SIZE = 8
+
+
+@dataclass
+class BlockChecks:
+    # None when the root could not be computed, in which case computing it
+    # again raises the error in the main process
+    merkle_root: Optional[str]
+    signatures_checked: bool
+    # index of the first transaction with an invalid signature
+    invalid_signature: Optional[int] = None
+
+
+def compute_checks(block: Block, check_signatures: bool) -> BlockChecks:
+    try:
+        merkle_root: Optional[str] = block.compute_transactions_merkle_root()
+    except ValueError:
+        merkle_root = None
+    # like the sequential path, the genesis block is not signed
+    signatures_checked = check_signatures and block.header.height > 0
+    invalid_signature = None
+    if signatures_checked:
+        results = verify_signatures(block.transactions)
+        invalid_signature = next(
+            (i for i, valid in enumerate(results) if not valid), None
+        )
+    return BlockChecks(merkle_root, signatures_checked, invalid_signature)
+
+
+def _compute_batch(blocks: List[Block], check_signatures: bool) -> List[BlockChecks]:
+    return [compute_checks(block, check_signatures) for block in blocks]
+
+
+def iter_checked_blocks(
+    blocks: Iterable[Block],
+    check_signatures: bool,
+    jobs: int,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[Tuple[Block, BlockChecks]]:
+    """Yields blocks in order along with their checks, computed by jobs
+    processes with at most 2 batches per process in flight."""
+    iterator = iter(blocks)
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    in_flight: Deque[Tuple[List[Block], Future]] = deque()
+    try:
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if batch:
+                future = executor.submit(_compute_batch, batch, check_signatures)
+                in_flight.append((batch, future))
+                if len(in_flight) < 2 * jobs:
+                    continue
+            if not in_flight:
+                return
+            done, future = in_flight.popleft()
+            yield from zip(done, future.result())
+    finally:
+        # pending batches are dropped when processing stops at an invalid block
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -1,6 +1,10 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import dataclasses
+import functools
 import json
 import random
-from typing import Dict, List
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
 import ecdsa
 
@@ -8,36 +12,115 @@ from .blockchain import Blockchain
 from .transaction import Transaction
 from .utils import from_hex, open_file
 
+# unsigned transactions along with the private key of their sender
+SigningChunk = List[Tuple[Transaction, str]]
 
-def load_accounts(filename: str) -> Dict[str, ecdsa.SigningKey]:
+
+def load_accounts(filename: str) -> Dict[str, str]:
+    """Returns the hex-encoded DER private keys by address. Keys are only
+    parsed when an account is first used to sign."""
     with open_file(filename) as f:
-        raw_accounts = json.load(f)
-    accounts = {}
-    for address, private_key in raw_accounts.items():
-        accounts[address] = ecdsa.SigningKey.from_der(from_hex(private_key))
-    return accounts
+        return json.load(f)
 
 
-def generate_transactions(
-    blockchain: Blockchain, accounts: Dict[str, ecdsa.SigningKey], count: int
-) -> List[Transaction]:
-    transactions = []
+@functools.lru_cache(maxsize=4096)
+def _load_signing_key(private_key: str) -> ecdsa.SigningKey:
+    return ecdsa.SigningKey.from_der(from_hex(private_key))
+
+
+def _sign_chunk(chunk: SigningChunk) -> List[str]:
+    # deterministic signatures (RFC 6979), so that the output only depends on
+    # the seed and not on how the chunks were spread over the workers
+    signatures = []
+    for tx, private_key in chunk:
+        tx.sign(_load_signing_key(private_key), deterministic=True)
+        signatures.append(tx.signature)
+    return signatures
+
+
+def plan_transactions(
+    blockchain: Blockchain,
+    addresses: List[str],
+    count: int,
+    rng: random.Random,
+) -> Iterator[Transaction]:
+    """Yields unsigned transactions, each one spendable after the previous."""
     balances = blockchain.balances.copy()
-    addresses = list(accounts)
-    while len(transactions) < count:
-        sender = random.choice(addresses)
-        receiver = random.choice(addresses)
-        transaction_fee = random.randint(1, 10)
+    planned = 0
+    while planned < count:
+        sender = rng.choice(addresses)
+        receiver = rng.choice(addresses)
+        transaction_fee = rng.randint(1, 10)
         if transaction_fee >= balances.get(sender, 0):
             continue
         tx = Transaction(
-            amount=random.randint(0, balances[sender] - transaction_fee),
-            lock_time=blockchain.timestamp + random.randint(0, 3600),
+            amount=rng.randint(0, balances[sender] - transaction_fee),
+            lock_time=blockchain.timestamp + rng.randint(0, 3600),
             receiver=receiver,
             sender=sender,
             transaction_fee=transaction_fee,
         )
-        tx.sign(accounts[sender])
-        transactions.append(tx)
         Blockchain.update_balances(balances, tx)
-    return transactions
+        planned += 1
+        yield tx
+
+
+def _iter_chunks(
+    transactions: Iterator[Transaction], accounts: Dict[str, str], chunk_size: int
+) -> Iterator[SigningChunk]:
+    chunk: SigningChunk = []
+    for tx in transactions:
+        chunk.append((tx, accounts[tx.sender]))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_transactions(
+    blockchain: Blockchain,
+    accounts: Dict[str, str],
+    count: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Transaction]:
+    """Plans transactions in sequence and signs them in chunks, across workers
+    processes when there are several. Transactions are yielded in order, and
+    at most 2 chunks per worker are in flight."""
+    rng = random.Random(seed)
+    planned = plan_transactions(blockchain, list(accounts), count, rng)
+    chunks = _iter_chunks(planned, accounts, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _with_signatures(chunk, _sign_chunk(chunk))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: Deque[Tuple[SigningChunk, Future]] = deque()
+        for chunk in chunks:
+            in_flight.append((chunk, executor.submit(_sign_chunk, chunk)))
+            if len(in_flight) >= 2 * workers:
+                done, future = in_flight.popleft()
+                yield from _with_signatures(done, future.result())
+        while in_flight:
+            done, future = in_flight.popleft()
+            yield from _with_signatures(done, future.result())
+
+
+def _with_signatures(
+    chunk: SigningChunk, signatures: List[str]
+) -> Iterator[Transaction]:
+    for (tx, _), signature in zip(chunk, signatures):
+        yield dataclasses.replace(tx, signature=signature)
+
+
+def generate_transactions(
+    blockchain: Blockchain,
+    accounts: Dict[str, str],
+    count: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+) -> List[Transaction]:
+    return list(iter_transactions(blockchain, accounts, count, workers, seed))
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import json
+import mmap
+import os
+import re
+import struct
+from typing import Dict, Iterable, List, Tuple
+
+from .block import Block
+from .constants import ZERO_HASH
+from .utils import from_hex
+
+META_FILE = "index.json"
+RUN_FILE = "run-{:06d}.dat"
+RUN_FILE_PATTERN = re.compile(r"^run-\d{6}\.dat$")
+RUN_MAGIC = b"TXRN"
+
+RUN_HEADER = struct.Struct("<4sQ")
+# FANOUT[b] is the number of records whose hash starts with a byte below b
+FANOUT = struct.Struct("<257Q")
+# transaction hash, block height and position of the transaction in the block
+RECORD = struct.Struct("<32sII")
+
+Location = Tuple[int, int]
+
+
+class _Run:
+    """Immutable file of records sorted by hash, searched through a memory map."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = RUN_HEADER.unpack_from(self._map)
+        if magic != RUN_MAGIC:
+            raise ValueError(f"{path} is not a transaction index run")
+        self._fanout = FANOUT.unpack_from(self._map, RUN_HEADER.size)
+        self._start = RUN_HEADER.size + FANOUT.size
+
+    def _key(self, i: int) -> bytes:
+        offset = self._start + i * RECORD.size
+        return self._map[offset : offset + 32]
+
+    def lookup(self, digest: bytes) -> List[Location]:
+        low, high = self._fanout[digest[0]], self._fanout[digest[0] + 1]
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < digest:
+                low = middle + 1
+            else:
+                high = middle
+        locations = []
+        while low < self.count and self._key(low) == digest:
+            _, height, position = RECORD.unpack_from(
+                self._map, self._start + low * RECORD.size
+            )
+            locations.append((height, position))
+            low += 1
+        return sorted(locations, reverse=True)
+
+    def bucket(self, first_byte: int) -> bytes:
+        start = self._start + self._fanout[first_byte] * RECORD.size
+        end = self._start + self._fanout[first_byte + 1] * RECORD.size
+        return self._map[start:end]
+
+    def close(self):
+        self._map.close()
+
+
+def _write_run(path: str, buckets: Iterable[bytes]):
+    # buckets hold the sorted records starting with each byte value, in order
+    fanout = [0]
+    with open(path, "wb") as f:
+        f.seek(RUN_HEADER.size + FANOUT.size)
+        for bucket in buckets:
+            f.write(bucket)
+            fanout.append(fanout[-1] + len(bucket) // RECORD.size)
+        f.seek(0)
+        f.write(RUN_HEADER.pack(RUN_MAGIC, fanout[-1]))
+        f.write(FANOUT.pack(*fanout))
+
+
+def _split_records(data: bytes) -> List[bytes]:
+    return [data[i : i + RECORD.size] for i in range(0, len(data), RECORD.size)]
+
+
+class TransactionIndex:
+    """Persisted index from transaction hash to (height, position).
+
+    New entries are kept in memory and written as a sorted run once there are
+    max_pending of them, or on flush. Runs are merged whenever the newest one
+    is at least half the size of the one before, so there are O(log n) of
+    them. A hash can appear several times, for example after a rollback, so
+    lookups return every candidate and callers check them against the chain.
+    """
+
+    def __init__(self, directory: str, max_pending: int = 1 << 20):
+        self.directory = directory
+        self.max_pending = max_pending
+        self.height = -1
+        self.head_hash = ZERO_HASH
+        self._runs: List[_Run] = []
+        self._next_run = 0
+        self._pending: Dict[bytes, Location] = {}
+        # older pending locations of hashes added again, which are rare
+        self._shadowed: List[Tuple[bytes, Location]] = []
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, META_FILE)
+
+    def _load(self):
+        names = []
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self.height = meta["height"]
+            self.head_hash = meta["head_hash"]
+            self._next_run = meta["next_run"]
+            names = meta["runs"]
+        self._runs = [_Run(os.path.join(self.directory, name)) for name in names]
+        # runs left behind by an interrupted flush
+        for name in os.listdir(self.directory):
+            if RUN_FILE_PATTERN.match(name) and name not in names:
+                os.remove(os.path.join(self.directory, name))
+
+    def _write_meta(self):
+        meta = {
+            "height": self.height,
+            "head_hash": self.head_hash,
+            "next_run": self._next_run,
+            "runs": [os.path.basename(run.path) for run in self._runs],
+        }
+        temporary_path = self._meta_path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(temporary_path, self._meta_path)
+
+    def _new_run_path(self) -> str:
+        path = os.path.join(self.directory, RUN_FILE.format(self._next_run))
+        self._next_run += 1
+        return path
+
+    def __len__(self) -> int:
+        pending = len(self._pending) + len(self._shadowed)
+        return pending + sum(run.count for run in self._runs)
+
+    def add_block(self, block: Block):
+        height = block.header.height
+        if height != self.height + 1:
+            raise ValueError(
+                f"expected block at height {self.height + 1}, got {height}"
+            )
+        for position, tx in enumerate(block.transactions):
+            digest = tx.digest()
+            previous = self._pending.get(digest)
+            if previous is not None:
+                self._shadowed.append((digest, previous))
+            self._pending[digest] = (height, position)
+        self.height = height
+        self.head_hash = block.header.hash
+        if len(self._pending) >= self.max_pending:
+            self.flush()
+
+    def rewind(self, height: int, head_hash: str):
+        """Forgets the blocks above height. Their entries already written to
+        runs stay, and are filtered out by the callers' checks."""
+        if height >= self.height:
+            return
+        self._pending = {
+            digest: location
+            for digest, location in self._pending.items()
+            if location[0] <= height
+        }
+        # the newest remaining location of a hash goes back to the pending ones
+        shadowed = []
+        for digest, location in reversed(self._shadowed):
+            if location[0] > height:
+                continue
+            if digest in self._pending:
+                shadowed.append((digest, location))
+            else:
+                self._pending[digest] = location
+        self._shadowed = shadowed[::-1]
+        self.height = height
+        self.head_hash = head_hash
+
+    def lookup(self, transaction_hash: str) -> List[Location]:
+        """Returns the candidate locations of a transaction, newest first."""
+        digest = from_hex(transaction_hash)
+        if len(digest) != 32:
+            raise ValueError(f"invalid transaction hash {transaction_hash}")
+        locations = []
+        if digest in self._pending:
+            locations.append(self._pending[digest])
+            locations.extend(reversed([l for d, l in self._shadowed if d == digest]))
+        for run in reversed(self._runs):
+            locations.extend(run.lookup(digest))
+        return locations
+
+    def flush(self):
+        obsolete: List[_Run] = []
+        if self._pending:
+            entries = itertools.chain(self._pending.items(), self._shadowed)
+            records = sorted(
+                RECORD.pack(digest, height, position)
+                for digest, (height, position) in entries
+            )
+            bounds = [bisect.bisect_left(records, bytes([b])) for b in range(256)]
+            bounds.append(len(records))
+            path = self._new_run_path()
+            _write_run(
+                path,
+                (b"".join(records[bounds[b] : bounds[b + 1]]) for b in range(256)),
+            )
+            self._runs.append(_Run(path))
+            self._pending = {}
+            self._shadowed = []
+            while len(self._runs) >= 2 and (
+                self._runs[-2].count <= 2 * self._runs[-1].count
+            ):
+                newer = self._runs.pop()
+                older = self._runs.pop()
+                self._runs.append(self._merge(older, newer))
+                obsolete.extend([older, newer])
+        self._write_meta()
+        for run in obsolete:
+            run.close()
+            os.remove(run.path)
+
+    def _merge(self, older: _Run, newer: _Run) -> _Run:
+        def buckets():
+            # a bucket is a 1/256th of the records, small enough to be sorted
+            # in memory
+            for b in range(256):
+                records = _split_records(older.bucket(b) + newer.bucket(b))
+                records.sort()
+                yield b"".join(records)
+
+        path = self._new_run_path()
+        _write_run(path, buckets())
+        return _Run(path)
+
+    def clear(self):
+        for run in self._runs:
+            run.close()
+            os.remove(run.path)
+        self._runs = []
+        self._pending = {}
+        self._shadowed = []
+        self.height = -1
+        self.head_hash = ZERO_HASH
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+        for run in self._runs:
+            run.close()
+        self._runs = []
+
+    def __enter__(self) -> TransactionIndex:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -3,7 +3,21 @@ import dataclasses
 import gzip
 import hashlib
 from io import TextIOWrapper
-from typing import BinaryIO, Generator, List, Optional, TextIO, Union, cast
+import json
+import os
+from typing import (
+    Any,
+    BinaryIO,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    TextIO,
+    Union,
+    cast,
+)
+
+from .stats import STATS, TimedFile
 
 
 def sha256_hexdigest(data: Union[str, bytes]) -> str:
@@ -32,14 +46,94 @@ def from_hex(value: str) -> bytes:
     return bytes.fromhex(value[2:])
 
 
+def fsync_path(path: str):
+    # also works on directories, to persist the files renamed into them
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
 @contextmanager
 def open_file(path: str, mode: str = "rb") -> Generator[TextIOWrapper, None, None]:
     open_func = gzip.open if path.endswith(".gz") else open
     with open_func(path, mode) as f:
+        if STATS.enabled:
+            STATS.count("file.opened")
+            f = TimedFile(f)
         yield cast(TextIOWrapper, f)
 
 
+def iter_json_array(f: TextIO, chunk_size: int = 1 << 16) -> Generator[Any, None, None]:
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        # read at least as much as is already buffered so that retrying to
+        # decode a large element stays linear in its size
+        data = f.read(max(chunk_size, len(buffer) - position))
+        buffer = buffer[position:] + data
+        position = 0
+        eof = not data
+
+    def next_token() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                raise ValueError("unexpected end of JSON array")
+            read_more()
+
+    if next_token() != "[":
+        raise ValueError("expected a JSON array")
+    position += 1
+    if next_token() == "]":
+        return
+    while True:
+        next_token()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # a number at the very end of the buffer may be truncated
+            if end == len(buffer) and not eof:
+                read_more()
+                continue
+            break
+        position = end
+        yield value
+        token = next_token()
+        position += 1
+        if token == "]":
+            return
+        if token != ",":
+            raise ValueError(f"expected ',' or ']' in JSON array, got {token!r}")
+
+
+def dump_json_array(values: Iterable[Any], f: TextIO):
+    # same output as json.dump(list(values), f), one element at a time
+    f.write("[")
+    for i, value in enumerate(values):
+        if i > 0:
+            f.write(", ")
+        f.write(json.dumps(value))
+    f.write("]")
+
+
 class Serializable:
+    __slots__ = ()
+
     def serialize(self, fields_to_exclude: Optional[List[str]] = None) -> str:
         if fields_to_exclude is None:
             fields_to_exclude = self.fields_to_exclude()
@@ -52,5 +146,7 @@ class Serializable:
 
 
 class SHA256Hashable(Serializable):
+    __slots__ = ()
+
     def sha256_hash(self):
         return sha256_hexdigest(self.serialize())
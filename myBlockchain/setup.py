@@ -7,6 +7,7 @@ setup(
     author="Daniel Perez",
     author_email="daniel@perez.sh",
     packages=["blockchain_poc"],
+    python_requires=">=3.10",
     install_requires=[
         "ecdsa",
     ],
@@ -0,0 +1,31 @@
+from benchmarks import synthetic
+from benchmarks.suite import compare
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.miner import Miner
+
+
+def test_synthetic_chain_is_valid_and_reproducible():
+    blockchain, addresses = synthetic.make_chain(5, 10, 20, seed=3)
+    assert blockchain.height == 4
+    replayed = Blockchain(max_txs_per_block=blockchain.max_txs_per_block)
+    for block in blockchain.blocks:
+        replayed.process_block(block)
+    assert replayed.balances == blockchain.balances
+    same, _ = synthetic.make_chain(5, 10, 20, seed=3)
+    assert same.head.header.hash == blockchain.head.header.hash
+
+    transactions = synthetic.make_mempool_transactions(blockchain, addresses, 50)
+    miner = Miner(synthetic.MINER, blockchain, Mempool(transactions))
+    assert len(miner.mine_next().transactions) > 0
+
+
+def test_compare():
+    baseline = {"a": {"per_operation": 1.0}, "b": {"per_operation": 1.0}}
+    results = {
+        "a": {"per_operation": 1.05},
+        "b": {"per_operation": 1.2},
+        "new": {"per_operation": 5.0},
+    }
+    assert compare(results, baseline, 0.1) == ["b"]
+    assert compare(results, baseline, 0.3) == []
@@ -0,0 +1,42 @@
+import gzip
+import json
+from os import path
+
+from blockchain_poc.block import Block
+from blockchain_poc.constants import ZERO_HASH
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+
+def load_sample_block(height: int) -> Block:
+    with gzip.open(STATE_FILE) as f:
+        return Block.from_dict(json.load(f)[height])
+
+
+def mine_sample_block(difficulty: int, workers: int) -> Block:
+    transactions = load_sample_block(3).transactions
+    return Block.mine(
+        difficulty=difficulty,
+        height=1,
+        miner="0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c",
+        previous_block_header_hash=ZERO_HASH,
+        timestamp=1674520200,
+        transactions=transactions,
+        workers=workers,
+    )
+
+
+def test_mine():
+    block = mine_sample_block(difficulty=2, workers=1)
+    assert block.header.is_below_target()
+    assert block.header.hash == block.header.sha256_hash()
+    assert block.header.hash.startswith("0x00")
+
+
+def test_mine_parallel():
+    block = mine_sample_block(difficulty=2, workers=3)
+    assert block.header.is_below_target()
+    assert block.header.hash == block.header.sha256_hash()
+    assert block.header.hash.startswith("0x00")
+    assert block.header.transactions_count == len(block.transactions)
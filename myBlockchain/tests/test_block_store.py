@@ -0,0 +1,139 @@
+import gzip
+import json
+import os
+from os import path
+
+import pytest
+
+from blockchain_poc.block import Block
+from blockchain_poc.block_store import (
+    FSYNC_ALWAYS,
+    INDEX_ENTRY,
+    INDEX_FILE,
+    BlockStore,
+)
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.miner import Miner
+from tests.conftest import DATA_DIR
+
+SAMPLE_DIR = path.join(DATA_DIR, "sample")
+STATE_FILE = path.join(SAMPLE_DIR, "blockchain.json.gz")
+MEMPOOL_FILE = path.join(SAMPLE_DIR, "mempool.json.gz")
+
+
+def load_sample_blocks():
+    with gzip.open(STATE_FILE) as f:
+        return [Block.from_dict(b) for b in json.load(f)]
+
+
+def test_append_and_read(tmp_path):
+    blocks = load_sample_blocks()
+    with BlockStore(str(tmp_path / "chain.store"), max_segment_size=1) as store:
+        store.append_blocks(blocks)
+        assert store.read_block(2) == blocks[2]
+    with BlockStore(str(tmp_path / "chain.store")) as store:
+        assert len(store) == len(blocks)
+        assert store.height == 3
+        assert list(store.iter_blocks()) == blocks
+        assert store.read_block(-1) == blocks[-1]
+        with pytest.raises(IndexError):
+            store.read_block(len(blocks))
+    assert len(os.listdir(tmp_path / "chain.store")) == len(blocks) + 1
+
+
+def test_append_wrong_height(tmp_path):
+    blocks = load_sample_blocks()
+    with BlockStore(str(tmp_path / "chain.store")) as store:
+        with pytest.raises(ValueError):
+            store.append(blocks[1])
+
+
+def test_missing_store(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        BlockStore(str(tmp_path / "missing.store"), create=False)
+    with pytest.raises(FileNotFoundError):
+        BlockStore(str(tmp_path / "missing.store"), read_only=True)
+
+
+def test_recover_torn_writes(tmp_path):
+    directory = str(tmp_path / "chain.store")
+    blocks = load_sample_blocks()
+    with BlockStore(directory, fsync=FSYNC_ALWAYS) as store:
+        store.append_blocks(blocks[:3])
+
+    # a record without its index entry and a torn index entry
+    with open(path.join(directory, "blocks-00000.dat"), "ab") as f:
+        f.write(b"\x10\x00\x00\x00garbage")
+    with open(path.join(directory, INDEX_FILE), "ab") as f:
+        f.write(INDEX_ENTRY.pack(0, 10**6, 100)[:5])
+
+    # readers see the complete records only, and leave the files untouched
+    sizes = {
+        name: os.path.getsize(path.join(directory, name))
+        for name in os.listdir(directory)
+    }
+    with BlockStore(directory, read_only=True) as store:
+        assert list(store.iter_blocks()) == blocks[:3]
+        with pytest.raises(ValueError, match="read-only"):
+            store.append(blocks[3])
+    assert sizes == {
+        name: os.path.getsize(path.join(directory, name))
+        for name in os.listdir(directory)
+    }
+
+    with BlockStore(directory) as store:
+        assert len(store) == 3
+        store.append(blocks[3])
+    with BlockStore(directory) as store:
+        assert list(store.iter_blocks()) == blocks
+
+
+def test_recover_lost_record(tmp_path):
+    directory = str(tmp_path / "chain.store")
+    blocks = load_sample_blocks()
+    with BlockStore(directory) as store:
+        store.append_blocks(blocks)
+    segment = path.join(directory, "blocks-00000.dat")
+    with open(segment, "ab") as f:
+        f.truncate(os.path.getsize(segment) - 1)
+    with BlockStore(directory) as store:
+        assert list(store.iter_blocks()) == blocks[:3]
+
+
+def test_blockchain_state_round_trip(tmp_path):
+    directory = str(tmp_path / "chain.store")
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blockchain.write_state(directory)
+    from_store = Blockchain.from_file(directory, max_txs_per_block=5)
+    assert from_store.blocks == blockchain.blocks
+    assert from_store.balances == blockchain.balances
+
+    output = str(tmp_path / "blockchain.json.gz")
+    from_store.write_state(output)
+    with gzip.open(STATE_FILE) as expected, gzip.open(output) as actual:
+        assert json.load(actual) == json.load(expected)
+
+
+def test_write_state_appends(tmp_path):
+    directory = str(tmp_path / "chain.store")
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blockchain.write_state(directory)
+    index_size = path.getsize(path.join(directory, INDEX_FILE))
+
+    miner = Miner(
+        "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c",
+        blockchain,
+        Mempool.from_file(MEMPOOL_FILE),
+    )
+    miner.mine_next()
+    blockchain.write_state(directory)
+    assert (
+        path.getsize(path.join(directory, INDEX_FILE)) == index_size + INDEX_ENTRY.size
+    )
+    with BlockStore(directory) as store:
+        assert store.read_block(-1) == blockchain.head
+
+    other = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    with pytest.raises(ValueError):
+        other.write_state(directory)
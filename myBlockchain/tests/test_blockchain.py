@@ -1,7 +1,10 @@
+import dataclasses
 import gzip
 import json
 from os import path
 
+import pytest
+
 from blockchain_poc.blockchain import Blockchain
 from blockchain_poc.block import Block
 from blockchain_poc.block_header import BlockHeader
@@ -17,6 +20,29 @@ def test_load_state():
         assert blockchain.height + 1 == len(json.load(f))
 
 
+def test_load_state_check_signatures():
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, check_signatures=True
+    )
+    assert blockchain.height == 3
+
+
+def test_process_block_invalid_signature():
+    with gzip.open(STATE_FILE) as f:
+        blocks = [Block.from_dict(b) for b in json.load(f)]
+    block = blocks[3]
+    first, second = block.transactions[:2]
+    block.transactions[0] = dataclasses.replace(first, signature=second.signature)
+    block.header.transactions_merkle_root = block.compute_transactions_merkle_root()
+
+    blockchain = Blockchain(max_txs_per_block=5)
+    for b in blocks[:3]:
+        blockchain.process_block(b)
+    blockchain.check_signatures = True
+    with pytest.raises(ValueError, match="invalid signature"):
+        blockchain.process_block(block)
+
+
 def test_prove_inclusion():
     blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
     tx_hash = "0xc06eaef0a51caea2e6fcf8ffbc38a0b3c6cf39a8a8214501082a30c265c120ac"  # 3rd tx in block 3
@@ -24,6 +50,18 @@ def test_prove_inclusion():
     assert blockchain.verify_inclusion_proof(3, tx_hash, proof)
 
 
+def test_merkle_tree_eviction():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blockchain.max_merkle_tree_nodes = 8
+    tree = blockchain.get_merkle_tree(0)
+    assert blockchain.get_merkle_tree(0) is tree
+    assert tree.root == blockchain.blocks[0].header.transactions_merkle_root
+    blockchain.get_merkle_tree(3)
+    assert list(blockchain.merkle_trees) == [3]
+    blockchain.get_merkle_tree(1)
+    assert list(blockchain.merkle_trees) == [3, 1]
+
+
 def test_get_next_difficulty():
     blockchain = Blockchain()
     block = Block(
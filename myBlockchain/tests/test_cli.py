@@ -0,0 +1,71 @@
+import json
+import sys
+from os import path
+
+import pytest
+
+from blockchain_poc import cli
+
+STATE_FILE = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))), "data", "blockchain.json.gz"
+)
+TX_HASH = "0x20f9ca5187d9789d983d238f9e80aba6a8fb2cebd0fa775e075fe79c006b6455"
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["blockchain-poc", *args])
+    cli.main()
+
+
+def test_verify_proof(monkeypatch, tmp_path, capsys):
+    proof_file = str(tmp_path / "proof.json")
+    run(
+        monkeypatch,
+        "--blockchain-state",
+        STATE_FILE,
+        "generate-proof",
+        "18",
+        TX_HASH,
+        "-o",
+        proof_file,
+    )
+    with open(proof_file) as f:
+        proof = json.load(f)
+    proof["block"] = 10_000
+    past_tip_file = str(tmp_path / "past-tip.json")
+    with open(past_tip_file, "w") as f:
+        json.dump(proof, f)
+
+    run(
+        monkeypatch,
+        "--blockchain-state",
+        STATE_FILE,
+        "verify-proof",
+        proof_file,
+        past_tip_file,
+    )
+    assert capsys.readouterr().out.splitlines() == [
+        f"{proof_file}: proof valid",
+        f"{past_tip_file}: proof invalid",
+    ]
+
+    # the stored header hashes of this chain are not the hashes of the headers
+    with pytest.raises(ValueError, match="invalid hash"):
+        run(
+            monkeypatch,
+            "--blockchain-state",
+            STATE_FILE,
+            "verify-proof",
+            "--strict",
+            proof_file,
+        )
+
+
+@pytest.mark.parametrize("workers", ["0", "-2"])
+@pytest.mark.parametrize("command", ["produce-blocks", "generate-txs"])
+def test_workers_at_least_one(monkeypatch, capsys, command, workers):
+    with pytest.raises(SystemExit):
+        run(
+            monkeypatch, "--blockchain-state", STATE_FILE, command, "--workers", workers
+        )
+    assert f"--workers: must be at least 1, got {workers}" in capsys.readouterr().err
@@ -0,0 +1,145 @@
+import gzip
+import json
+from os import path
+
+import hypothesis.strategies as st
+import pytest
+from hypothesis import given
+
+from blockchain_poc import codec
+from blockchain_poc.block import Block
+from blockchain_poc.block_header import BlockHeader
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.header_chain import HeaderChain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.transaction import Transaction
+from blockchain_poc.utils import open_file
+from tests.conftest import DATA_DIR, st_addresses, st_hashes
+
+SAMPLE_DIR = path.join(DATA_DIR, "sample")
+STATE_FILE = path.join(SAMPLE_DIR, "blockchain.json.gz")
+
+st_raw_hex = lambda size: st.binary(min_size=size, max_size=size).map(
+    lambda b: "0x" + b.hex()
+)
+# canonical hex is stored raw, anything else as text
+st_address_fields = st.one_of(st_raw_hex(20), st_addresses, st.text(max_size=50))
+st_hash_fields = st.one_of(st_hashes, st.just(""), st.text(max_size=70))
+st_signatures = st.one_of(
+    st.tuples(st.binary(min_size=1, max_size=100), st.binary(min_size=1)).map(
+        lambda parts: "0x" + parts[0].hex() + ",0x" + parts[1].hex()
+    ),
+    st.text(),
+)
+st_integers = st.integers(min_value=-(2**63), max_value=2**63 - 1)
+
+
+@st.composite
+def st_transactions(draw):
+    return Transaction(
+        sender=draw(st_address_fields),
+        receiver=draw(st_address_fields),
+        amount=draw(st_integers),
+        transaction_fee=draw(st_integers),
+        lock_time=draw(st_integers),
+        signature=draw(st_signatures),
+    )
+
+
+@st.composite
+def st_headers(draw):
+    return BlockHeader(
+        difficulty=draw(st_integers),
+        height=draw(st_integers),
+        miner=draw(st_address_fields),
+        nonce=draw(st_integers),
+        previous_block_header_hash=draw(st_hash_fields),
+        timestamp=draw(st_integers),
+        transactions_count=draw(st_integers),
+        transactions_merkle_root=draw(st_hash_fields),
+        hash=draw(st_hash_fields),
+    )
+
+
+def roundtrip(encode, decode, value):
+    out = bytearray()
+    encode(value, out)
+    decoded, offset = decode(bytes(out), 0)
+    assert offset == len(out)
+    return decoded
+
+
+@given(transaction=st_transactions())
+def test_transaction_roundtrip(transaction):
+    decoded = roundtrip(codec.encode_transaction, codec.decode_transaction, transaction)
+    assert decoded.to_dict() == transaction.to_dict()
+
+
+@given(header=st_headers(), transactions=st.lists(st_transactions(), max_size=3))
+def test_block_roundtrip(header, transactions):
+    block = Block(header=header, transactions=transactions)
+    assert roundtrip(codec.encode_block, codec.decode_block, block) == block
+
+
+def test_canonical_fields_are_raw():
+    with gzip.open(STATE_FILE, "rt") as f:
+        block = Block.from_dict(json.load(f)[1])
+    out = bytearray()
+    codec.encode_transaction(block.transactions[0], out)
+    assert out[0] == 0
+    # about half of the hex text
+    assert len(out) < len(json.dumps(block.transactions[0].to_dict())) / 2
+
+
+def test_integer_too_large():
+    tx = Transaction(
+        sender="", receiver="", amount=2**64, transaction_fee=0, lock_time=0
+    )
+    with pytest.raises(ValueError, match="too large"):
+        codec.encode_transaction(tx, bytearray())
+
+
+@pytest.mark.parametrize("suffix", [".bin", ".bin.gz"])
+def test_binary_state(tmp_path, suffix):
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    state_path = str(tmp_path / ("blockchain" + suffix))
+    blockchain.write_state(state_path)
+    with open_file(state_path, "rb") as f:
+        assert f.read(4) == codec.MAGIC
+    loaded = Blockchain.from_file(state_path, max_txs_per_block=5)
+    assert loaded.blocks == blockchain.blocks
+    assert loaded.balances == blockchain.balances
+    headers = HeaderChain.from_file(state_path).headers
+    assert headers == [b.header for b in blockchain.blocks]
+
+    # a binary file is detected whatever its name
+    json_name = str(tmp_path / ("misnamed.json" + suffix[4:]))
+    codec.write_blocks(state_path, blockchain.blocks)
+    with open(state_path, "rb") as src, open(json_name, "wb") as dst:
+        dst.write(src.read())
+    assert list(codec.read_blocks(json_name)) == blockchain.blocks
+
+
+def test_binary_mempool_and_headers(tmp_path):
+    mempool = Mempool.from_file(path.join(SAMPLE_DIR, "mempool.json.gz"))
+    mempool.to_file(str(tmp_path / "mempool.bin"))
+    assert list(Mempool.from_file(str(tmp_path / "mempool.bin"))) == list(mempool)
+    with pytest.raises(ValueError, match="unexpected records"):
+        Blockchain.from_file(str(tmp_path / "mempool.bin"))
+
+    chain = HeaderChain.from_file(STATE_FILE)
+    chain.write_state(str(tmp_path / "headers.bin"))
+    assert HeaderChain.from_file(str(tmp_path / "headers.bin")).headers == chain.headers
+
+
+def test_truncated_file(tmp_path):
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    state_path = str(tmp_path / "blockchain.bin")
+    blockchain.write_state(state_path)
+    with open(state_path, "rb") as f:
+        data = f.read()
+    for size in (len(data) - 1, len(data) - 200, 8):
+        with open(state_path, "wb") as f:
+            f.write(data[:size])
+        with pytest.raises(ValueError, match="truncated"):
+            list(codec.read_blocks(state_path))
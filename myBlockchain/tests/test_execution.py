@@ -0,0 +1,135 @@
+import dataclasses
+
+import hypothesis.strategies as st
+import pytest
+from hypothesis import given
+
+from benchmarks import synthetic
+from blockchain_poc import execution
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.ledger import INT64_MAX, Ledger
+from blockchain_poc.transaction import Transaction
+
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+ADDRESSES = [f"0x{i:040x}" for i in range(1, 7)]
+
+
+@st.composite
+def st_transactions(draw, senders=ADDRESSES):
+    return Transaction(
+        sender=draw(st.sampled_from(senders)),
+        receiver=draw(st.sampled_from(ADDRESSES + [MINER])),
+        amount=draw(st.integers(min_value=-5, max_value=100)),
+        transaction_fee=draw(st.integers(min_value=0, max_value=10)),
+        lock_time=0,
+    )
+
+
+st_balances = st.dictionaries(
+    st.sampled_from(ADDRESSES + [MINER]),
+    st.one_of(
+        st.integers(min_value=0, max_value=300),
+        st.integers(min_value=INT64_MAX - 200, max_value=INT64_MAX),
+    ),
+)
+
+
+def process_sequentially(blockchain, miner, height, transactions):
+    for tx in transactions:
+        blockchain.process_transaction(miner, height, tx)
+
+
+def run(execute, balances, transactions, miner=MINER):
+    blockchain = Blockchain()
+    blockchain.balances = Ledger(balances)
+    try:
+        execute(blockchain, miner, 1, transactions)
+    except Exception as error:
+        return type(error), error.args
+    # in order, as accounts must be created in the same order
+    return list(blockchain.balances.items())
+
+
+@given(balances=st_balances, transactions=st.lists(st_transactions(), max_size=40))
+def test_same_result_as_sequential(balances, transactions):
+    expected = run(process_sequentially, balances, transactions)
+    assert run(execution.execute_transactions, balances, transactions) == expected
+
+
+@given(
+    balances=st_balances,
+    transactions=st.lists(
+        st_transactions(senders=ADDRESSES + [MINER]), min_size=1, max_size=20
+    ),
+    miner=st.sampled_from([MINER, ""]),
+)
+def test_same_result_with_any_miner(balances, transactions, miner):
+    expected = run(process_sequentially, balances, transactions, miner)
+    assert run(execution.execute_transactions, balances, transactions, miner) == (
+        expected
+    )
+
+
+def test_only_transactions_at_risk_are_replayed(monkeypatch):
+    a, b, c, d = ADDRESSES[:4]
+    transactions = [
+        Transaction(a, b, 60, 1, 0),
+        Transaction(c, d, 60, 1, 0),
+        Transaction(b, a, 30, 1, 0),
+        Transaction(c, d, 60, 1, 0),
+    ]
+    blockchain = Blockchain()
+    blockchain.balances = Ledger({a: 100, b: 31, c: 100})
+    replayed = []
+    process_transaction = blockchain.process_transaction
+
+    def record(miner, height, tx):
+        replayed.append(tx)
+        process_transaction(miner, height, tx)
+
+    monkeypatch.setattr(blockchain, "process_transaction", record)
+    with pytest.raises(ValueError, match=f"insufficient funds for {c}: 39 < 61"):
+        execution.execute_transactions(blockchain, MINER, 1, transactions)
+    assert replayed == [transactions[1], transactions[3]]
+
+
+def process_chain(blocks, min_batch_size, monkeypatch):
+    monkeypatch.setattr(execution, "MIN_BATCH_SIZE", min_batch_size)
+    blockchain = Blockchain(max_txs_per_block=100)
+    for block in blocks:
+        blockchain.process_block(block)
+    return blockchain
+
+
+def test_process_block(monkeypatch):
+    blocks = synthetic.make_chain(blocks=4, txs_per_block=100, accounts=50)[0].blocks
+    batched = process_chain(blocks, 64, monkeypatch)
+    sequential = process_chain(blocks, 1000, monkeypatch)
+    assert list(batched.balances.items()) == list(sequential.balances.items())
+    assert batched.undo_journal == sequential.undo_journal
+
+    # the last transaction now overdraws its sender
+    head = blocks[-1]
+    transactions = head.transactions[:]
+    tx = transactions[-1]
+    transactions[-1] = dataclasses.replace(
+        tx, amount=sequential.undo_journal[head.header.height][tx.sender] + 1
+    )
+    block = Block.mine(
+        difficulty=head.header.difficulty,
+        height=head.header.height,
+        miner=head.header.miner,
+        previous_block_header_hash=head.header.previous_block_header_hash,
+        timestamp=head.header.timestamp,
+        transactions=transactions,
+    )
+    errors = []
+    for blockchain in (batched, sequential):
+        blockchain.rollback(1)
+        before = blockchain.balances.to_dict()
+        with pytest.raises(ValueError) as error:
+            blockchain.process_block(block)
+        errors.append(str(error.value))
+        assert blockchain.balances == before
+    assert errors[0] == errors[1] and errors[0].startswith("insufficient funds")
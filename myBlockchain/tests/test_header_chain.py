@@ -0,0 +1,120 @@
+import dataclasses
+import gzip
+import json
+from os import path
+
+import pytest
+
+from blockchain_poc.block_header import BlockHeader, difficulty_for_height
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.header_chain import HeaderChain
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+
+def load_headers():
+    with gzip.open(STATE_FILE) as f:
+        return [BlockHeader(**b["header"]) for b in json.load(f)]
+
+
+def test_load_state():
+    chain = HeaderChain.from_file(STATE_FILE)
+    assert chain.headers == load_headers()
+    assert chain.height == 3
+
+
+def test_write_state(tmp_path):
+    filename = str(tmp_path / "headers.json.gz")
+    HeaderChain.from_file(STATE_FILE).write_state(filename)
+    assert HeaderChain.from_file(filename).headers == load_headers()
+
+
+def test_verify_inclusion_proof():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    chain = HeaderChain.from_file(STATE_FILE)
+    tx_hash = "0xc06eaef0a51caea2e6fcf8ffbc38a0b3c6cf39a8a8214501082a30c265c120ac"
+    proof = blockchain.generate_inclusion_proof(3, tx_hash)
+    assert chain.verify_inclusion_proof(3, tx_hash, proof)
+    assert not chain.verify_inclusion_proof(2, tx_hash, proof)
+    # heights past the tip or of the wrong type make the proof invalid
+    assert not chain.verify_inclusion_proof(4, tx_hash, proof)
+    assert not chain.verify_inclusion_proof(-1, tx_hash, proof)
+    assert not chain.verify_inclusion_proof("3", tx_hash, proof)
+
+
+def test_verify_inclusion_multiproof():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    chain = HeaderChain.from_file(STATE_FILE)
+    tx_hashes = [tx.sha256_hash() for tx in blockchain.blocks[3].transactions[1:4]]
+    proof = blockchain.generate_inclusion_multiproof(3, tx_hashes)
+    assert blockchain.verify_inclusion_multiproof(3, tx_hashes, proof)
+    assert chain.verify_inclusion_multiproof(3, tx_hashes, proof)
+    assert not chain.verify_inclusion_multiproof(2, tx_hashes, proof)
+    assert not chain.verify_inclusion_multiproof(4, tx_hashes, proof)
+
+
+def rehash(header: BlockHeader) -> BlockHeader:
+    header.hash = header.sha256_hash()
+    return header
+
+
+@pytest.mark.parametrize(
+    "changes,error",
+    [
+        ({"nonce": 0}, "invalid hash"),
+        ({"height": 5}, "invalid height"),
+        ({"previous_block_header_hash": "0x" + "0" * 64}, "invalid previous"),
+        ({"timestamp": 0}, "invalid timestamp"),
+        ({"difficulty": 2}, "invalid difficulty"),
+    ],
+)
+def test_invalid_header(changes, error):
+    headers = load_headers()
+    chain = HeaderChain(strict=True)
+    for header in headers[:3]:
+        chain.process_header(header)
+    invalid = dataclasses.replace(headers[3], **changes)
+    if changes.get("nonce") is None:
+        rehash(invalid)
+    with pytest.raises(ValueError, match=error):
+        chain.process_header(invalid)
+
+
+def test_not_strict():
+    headers = load_headers()
+    chain = HeaderChain(strict=False)
+    for header in headers[:3]:
+        chain.process_header(header)
+    # stored hashes are trusted, but headers must still link to them
+    chain.process_header(dataclasses.replace(headers[3], nonce=0))
+    with pytest.raises(ValueError, match="invalid previous"):
+        chain.process_header(dataclasses.replace(headers[3], height=4))
+
+    # difficulties and proof of work are still checked
+    chain = HeaderChain()
+    for header in headers[:3]:
+        chain.process_header(header)
+    with pytest.raises(ValueError, match="invalid difficulty"):
+        chain.process_header(dataclasses.replace(headers[3], difficulty=2))
+    with pytest.raises(ValueError, match="insufficient proof of work"):
+        chain.process_header(dataclasses.replace(headers[3], hash="0x" + "f" * 64))
+
+
+def test_insufficient_proof_of_work():
+    headers = load_headers()
+    chain = HeaderChain()
+    for header in headers[:3]:
+        chain.process_header(header)
+    invalid = dataclasses.replace(headers[3])
+    while rehash(invalid).hash.startswith("0x0"):
+        invalid.nonce += 1
+    with pytest.raises(ValueError, match="insufficient proof of work"):
+        chain.process_header(invalid)
+
+
+def test_difficulty_for_height():
+    assert difficulty_for_height(1) == 1
+    assert difficulty_for_height(49) == 1
+    assert difficulty_for_height(50) == 2
+    assert difficulty_for_height(10_000) == 6
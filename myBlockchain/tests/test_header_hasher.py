@@ -0,0 +1,63 @@
+import json
+from os import path
+
+import hypothesis.strategies as st
+from hypothesis import given
+
+from blockchain_poc.block_header import BlockHeader
+from blockchain_poc.header_hasher import HeaderHasher, compute_target
+from tests.conftest import DATA_DIR, st_addresses, st_hashes
+
+
+@st.composite
+def st_headers(draw, max_difficulty: int = 3):
+    return BlockHeader(
+        difficulty=draw(st.integers(min_value=0, max_value=max_difficulty)),
+        height=draw(st.integers(min_value=0, max_value=10_000)),
+        miner=draw(st_addresses),
+        nonce=draw(st.integers(min_value=0, max_value=2**32)),
+        previous_block_header_hash=draw(st_hashes),
+        timestamp=draw(st.integers(min_value=0, max_value=2**32)),
+        transactions_count=draw(st.integers(min_value=0, max_value=1000)),
+        transactions_merkle_root=draw(st_hashes),
+    )
+
+
+def test_sample():
+    with open(path.join(DATA_DIR, "header-119.json")) as f:
+        header = BlockHeader(**json.load(f))
+    hasher = HeaderHasher(header)
+    assert hasher.sha256_hash(header.nonce) == header.hash
+    assert hasher.is_below_target(header.nonce)
+    assert hasher.find_nonce() == header.nonce
+
+
+def test_compute_target():
+    assert compute_target(0) == 2**256
+    assert compute_target(1) == 2**252
+    assert compute_target(6) == 2**232
+
+
+def test_find_nonce_exhausted():
+    with open(path.join(DATA_DIR, "header-119.json")) as f:
+        header = BlockHeader(**json.load(f))
+    assert HeaderHasher(header).find_nonce(0, 1, header.nonce) is None
+
+
+@given(header=st_headers())
+def test_matches_sha256_hash(header: BlockHeader):
+    hasher = HeaderHasher(header)
+    assert hasher.sha256_hash(header.nonce) == header.sha256_hash()
+    assert hasher.is_below_target(header.nonce) == header.is_below_target()
+
+
+@given(header=st_headers(max_difficulty=2))
+def test_find_nonce(header: BlockHeader):
+    start = header.nonce
+    nonce = HeaderHasher(header).find_nonce(start)
+    assert nonce is not None
+    for candidate in range(start, nonce):
+        header.nonce = candidate
+        assert not header.is_below_target()
+    header.nonce = nonce
+    assert header.is_below_target()
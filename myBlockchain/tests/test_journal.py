@@ -0,0 +1,181 @@
+from os import path
+
+import pytest
+
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.journal import UndoJournal
+from blockchain_poc.snapshot import write_snapshot
+from blockchain_poc.transaction import Transaction
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+RECEIVER = "0x" + "ab" * 20
+
+
+def replay(blocks) -> Blockchain:
+    blockchain = Blockchain(max_txs_per_block=5)
+    for block in blocks:
+        blockchain.process_block(block)
+    return blockchain
+
+
+def mine_branch(blockchain: Blockchain, fork_height: int, length: int):
+    # spends from the richest account at the fork point, to a new receiver so
+    # that the branch touches accounts the replaced blocks did not
+    parent = blockchain.blocks[fork_height - 1]
+    balances = replay(blockchain.blocks[:fork_height]).balances
+    sender = max(balances, key=balances.get)
+    branch = []
+    for _ in range(length):
+        transactions = [
+            Transaction(
+                sender=sender,
+                receiver=RECEIVER,
+                amount=1,
+                transaction_fee=j + 1,
+                lock_time=0,
+            )
+            for j in range(2)
+        ]
+        block = Block.mine(
+            difficulty=1,
+            height=parent.header.height + 1,
+            miner=MINER,
+            previous_block_header_hash=parent.header.hash,
+            timestamp=parent.header.timestamp + 1,
+            transactions=transactions,
+        )
+        branch.append(block)
+        parent = block
+    return branch
+
+
+def test_rollback():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blocks = list(blockchain.blocks)
+    blockchain.get_merkle_tree(3)
+    assert blockchain.rollback(2) == blocks[2:]
+    assert blockchain.blocks == blocks[:2]
+    assert blockchain.balances == replay(blocks[:2]).balances
+    assert 3 not in blockchain.merkle_trees
+    assert blockchain.rollback(0) == []
+
+    with pytest.raises(ValueError, match="cannot roll back"):
+        blockchain.rollback(3)
+    for block in blocks[2:]:
+        blockchain.process_block(block)
+    assert blockchain.balances == replay(blocks).balances
+
+
+def test_failed_block_leaves_balances_unchanged():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    before = blockchain.balances.to_dict()
+    block = mine_branch(blockchain, blockchain.height + 1, 1)[0]
+    overdraft = Transaction(
+        sender=block.transactions[0].sender,
+        receiver=RECEIVER,
+        amount=before[block.transactions[0].sender],
+        transaction_fee=1,
+        lock_time=0,
+    )
+    block.transactions[1] = overdraft
+    block.header.transactions_merkle_root = block.compute_transactions_merkle_root()
+    with pytest.raises(ValueError, match="insufficient funds"):
+        blockchain.process_block(block)
+    assert blockchain.balances == before
+    assert sorted(blockchain.undo_journal) == list(range(len(blockchain.blocks)))
+
+
+def test_reorganize_to():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blocks = list(blockchain.blocks)
+    branch = mine_branch(blockchain, 2, 3)
+    assert blockchain.reorganize_to(branch) == blocks[2:]
+    assert blockchain.blocks == blocks[:2] + branch
+    assert blockchain.balances == replay(blocks[:2] + branch).balances
+    assert RECEIVER in blockchain.balances
+
+    assert blockchain.reorganize_to(blocks[2:]) == branch
+    assert blockchain.balances == replay(blocks).balances
+    assert RECEIVER not in blockchain.balances
+
+
+def test_reorganize_to_invalid_branch():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blocks = list(blockchain.blocks)
+    expected = blockchain.balances.to_dict()
+    branch = mine_branch(blockchain, 1, 3)
+    branch[2].header.previous_block_header_hash = branch[0].header.hash
+    with pytest.raises(ValueError, match="invalid previous_block_header_hash"):
+        blockchain.reorganize_to(branch)
+    assert blockchain.blocks == blocks
+    assert blockchain.balances == expected
+    detached = mine_branch(blockchain, len(blocks), 1)
+    detached[0].header.height += 1
+    with pytest.raises(ValueError, match="does not connect"):
+        blockchain.reorganize_to(detached)
+
+
+def test_journal_with_snapshot(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    journal_path = str(tmp_path / "journal.json.gz")
+    full = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, journal_path=journal_path
+    )
+    full.journal.flush()
+    assert UndoJournal(journal_path, 100).read(full.blocks) == full.undo_journal
+    write_snapshot(replay(full.blocks[:3]).create_snapshot(), snapshot_dir)
+
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, snapshot_dir=snapshot_dir
+    )
+    assert sorted(blockchain.undo_journal) == [3]
+    with pytest.raises(ValueError, match="no undo journal for block 2"):
+        blockchain.rollback(2)
+
+    blockchain = Blockchain.from_file(
+        STATE_FILE,
+        max_txs_per_block=5,
+        snapshot_dir=snapshot_dir,
+        journal_path=journal_path,
+    )
+    blockchain.rollback(3)
+    assert blockchain.balances == replay(full.blocks[:1]).balances
+
+
+def test_reorg_depth(tmp_path):
+    journal_path = str(tmp_path / "journal.json")
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, journal_path=journal_path, max_reorg_depth=2
+    )
+    blocks = list(blockchain.blocks)
+    assert sorted(blockchain.undo_journal) == [2, 3]
+    with pytest.raises(ValueError, match="no undo journal for block 1"):
+        blockchain.rollback(3)
+
+    # rolled back and replaced blocks are appended, and the file is rewritten
+    # with the last entries once it holds more than twice the depth
+    blockchain.reorganize_to(mine_branch(blockchain, 2, 2))
+    blockchain.journal.flush()
+    with open(journal_path) as f:
+        assert len(f.readlines()) == 4
+    blockchain.reorganize_to(mine_branch(blockchain, 3, 1))
+    blockchain.journal.flush()
+    with open(journal_path) as f:
+        assert len(f.readlines()) == 2
+    assert UndoJournal(journal_path, 2).read(blockchain.blocks) == (
+        blockchain.undo_journal
+    )
+
+    # only the entries matching the chain are restored
+    assert UndoJournal(journal_path, 2).read(blocks) == {}
+    restored = Blockchain(max_txs_per_block=5, max_reorg_depth=2)
+    for block in blockchain.blocks:
+        restored.process_block(block)
+    restored.undo_journal.clear()
+    restored.attach_journal(UndoJournal(journal_path, 2))
+    assert restored.undo_journal == blockchain.undo_journal
+    restored.rollback(2)
+    assert restored.balances == replay(blocks[:2]).balances
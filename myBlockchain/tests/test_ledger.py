@@ -0,0 +1,105 @@
+import hypothesis.strategies as st
+import pytest
+from hypothesis import given
+
+from blockchain_poc.ledger import Ledger
+
+ADDRESSES = [f"0x{i:040x}" for i in range(8)]
+
+st_addresses = st.sampled_from(ADDRESSES)
+st_operations = st.lists(
+    st.one_of(
+        st.tuples(st.just("set"), st_addresses, st.integers(0, 1000)),
+        st.tuples(st.just("credit"), st_addresses, st.integers(0, 1000)),
+        st.tuples(st.just("debit"), st_addresses, st.integers(0, 1000)),
+        st.tuples(st.just("delete"), st_addresses, st.just(0)),
+        st.tuples(st.just("copy"), st_addresses, st.just(0)),
+    )
+)
+
+
+@given(operations=st_operations)
+def test_matches_dict(operations):
+    ledger, expected = Ledger(), {}
+    for operation, address, amount in operations:
+        if operation == "set":
+            ledger[address] = amount
+            expected[address] = amount
+        elif operation == "credit":
+            ledger.credit(address, amount)
+            expected[address] = expected.get(address, 0) + amount
+        elif operation == "debit":
+            if address in expected:
+                ledger.debit(address, amount)
+                expected[address] -= amount
+            else:
+                with pytest.raises(KeyError):
+                    ledger.debit(address, amount)
+        elif operation == "delete":
+            if address in expected:
+                del ledger[address]
+                del expected[address]
+            else:
+                with pytest.raises(KeyError):
+                    del ledger[address]
+        else:
+            # the copy interns new addresses locally, and the original
+            # interns its own later: neither sees the other's accounts
+            original, before = ledger, dict(expected)
+            ledger = ledger.copy()
+            ledger.credit(address, amount)
+            expected[address] = expected.get(address, 0) + amount
+            assert original == before
+            original.credit(ADDRESSES[-1], 1)
+            before[ADDRESSES[-1]] = before.get(ADDRESSES[-1], 0) + 1
+            assert original == before
+        assert ledger == expected
+        assert len(ledger) == len(expected)
+        assert list(ledger) == [a for a in ledger.to_dict()]
+    for address in ADDRESSES:
+        assert (address in ledger) == (address in expected)
+        assert ledger.get(address) == expected.get(address)
+
+
+def test_copy_is_independent():
+    ledger = Ledger({ADDRESSES[0]: 10})
+    copy = ledger.copy()
+    copy[ADDRESSES[0]] -= 3
+    copy[ADDRESSES[1]] = 0
+    assert ledger == {ADDRESSES[0]: 10}
+    assert copy == {ADDRESSES[0]: 7, ADDRESSES[1]: 0}
+    assert ADDRESSES[1] not in ledger
+
+
+def test_copies_do_not_grow_the_shared_table():
+    ledger = Ledger({ADDRESSES[0]: 10})
+    copy = ledger.copy()
+    copy.transfer(ADDRESSES[0], ADDRESSES[1], 3, 1, ADDRESSES[2])
+    nested = copy.copy()
+    nested.credit_many([(ADDRESSES[3], 1), (ADDRESSES[1], 1)])
+    assert len(ledger._table) == 1
+    assert copy == {ADDRESSES[0]: 6, ADDRESSES[1]: 3, ADDRESSES[2]: 1}
+    assert list(nested) == list(copy) + [ADDRESSES[3]]
+    assert nested[ADDRESSES[1]] == 4
+
+    # accounts the original creates later do not show up in its copies
+    ledger[ADDRESSES[4]] = 5
+    assert ledger.get_many(ADDRESSES[:5]) == [10, None, None, None, 5]
+    assert nested.get_many(ADDRESSES[:5]) == [6, 4, 1, 1, None]
+    with pytest.raises(KeyError):
+        copy.transfer(ADDRESSES[4], ADDRESSES[0], 1)
+
+
+def test_debit_many_is_atomic():
+    ledger = Ledger({ADDRESSES[0]: 10, ADDRESSES[1]: 5})
+    with pytest.raises(ValueError, match="insufficient funds"):
+        ledger.debit_many([(ADDRESSES[0], 4), (ADDRESSES[1], 3), (ADDRESSES[1], 3)])
+    assert ledger == {ADDRESSES[0]: 10, ADDRESSES[1]: 5}
+    ledger.debit_many([(ADDRESSES[0], 4), (ADDRESSES[1], 3)])
+    ledger.credit_many([(ADDRESSES[0], 1), (ADDRESSES[2], 2)])
+    assert ledger == {ADDRESSES[0]: 7, ADDRESSES[1]: 2, ADDRESSES[2]: 2}
+
+
+def test_int64_overflow():
+    with pytest.raises(OverflowError):
+        Ledger({ADDRESSES[0]: 2**63})
@@ -0,0 +1,180 @@
+from os import path
+
+import hypothesis.strategies as st
+from hypothesis import given
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool, transaction_size
+from blockchain_poc.miner import Miner
+from blockchain_poc.transaction import Transaction
+from tests.conftest import DATA_DIR
+
+MEMPOOL_FILE = path.join(DATA_DIR, "sample", "mempool.json.gz")
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+ADDRESSES = [f"0x{i:040x}" for i in range(1, 6)]
+
+
+@st.composite
+def st_transactions(draw):
+    return Transaction(
+        sender=draw(st.sampled_from(ADDRESSES)),
+        receiver=draw(st.sampled_from(ADDRESSES)),
+        amount=draw(st.integers(min_value=0, max_value=100)),
+        transaction_fee=draw(st.integers(min_value=1, max_value=10)),
+        lock_time=draw(st.integers(min_value=0, max_value=100)),
+    )
+
+
+st_transaction_lists = st.lists(st_transactions(), max_size=50, unique=True)
+
+
+def sorted_live(transactions, timestamp):
+    live = [tx for tx in transactions if tx.lock_time <= timestamp]
+    return sorted(live, key=lambda tx: tx.transaction_fee, reverse=True)
+
+
+def greedy_selection(blockchain, transactions, timestamp):
+    balances = blockchain.balances.copy()
+    txs_to_mine = []
+    for tx in sorted_live(transactions, timestamp):
+        if balances.get(tx.sender, 0) >= tx.amount + tx.transaction_fee:
+            Blockchain.update_balances(balances, tx, MINER)
+            txs_to_mine.append(tx)
+            if len(txs_to_mine) == blockchain.max_txs_per_block:
+                break
+    return txs_to_mine
+
+
+def test_from_file(tmp_path):
+    mempool = Mempool.from_file(MEMPOOL_FILE)
+    assert len(mempool) == 5
+    filename = str(tmp_path / "mempool.json.gz")
+    mempool.to_file(filename)
+    assert list(Mempool.from_file(filename)) == list(mempool)
+
+
+@given(
+    transactions=st_transaction_lists,
+    timestamps=st.lists(st.integers(min_value=0, max_value=100), min_size=1),
+)
+def test_get_live_transactions(transactions, timestamps):
+    mempool = Mempool(transactions)
+    for timestamp in timestamps:
+        expected = sorted_live(transactions, timestamp)
+        assert mempool.get_live_transactions(timestamp) == expected
+
+
+@given(
+    transactions=st_transaction_lists,
+    removed=st.sets(st.integers(min_value=0, max_value=49)),
+    timestamp=st.integers(min_value=0, max_value=100),
+)
+def test_remove_and_add(transactions, removed, timestamp):
+    mempool = Mempool(transactions)
+    mempool.get_live_transactions(timestamp)
+    to_remove = [tx for i, tx in enumerate(transactions) if i in removed]
+    mempool.remove_transactions(to_remove)
+    remaining = [tx for tx in transactions if tx not in to_remove]
+    assert mempool.get_live_transactions(timestamp) == sorted_live(remaining, timestamp)
+    assert all(tx not in mempool for tx in to_remove)
+
+    for tx in to_remove:
+        assert mempool.add(tx)
+        assert not mempool.add(tx)
+    assert mempool.get_live_transactions(timestamp) == sorted_live(
+        remaining + to_remove, timestamp
+    )
+
+
+@given(
+    transactions=st_transaction_lists,
+    timestamp=st.integers(min_value=0, max_value=100),
+    max_txs_per_block=st.integers(min_value=1, max_value=10),
+)
+def test_most_profitable_transactions(transactions, timestamp, max_txs_per_block):
+    blockchain = Blockchain(max_txs_per_block=max_txs_per_block)
+    blockchain.balances = {address: 50 for address in ADDRESSES[:3]}
+    miner = Miner(MINER, blockchain, Mempool(transactions))
+    assert miner.get_most_profitable_transactions(timestamp) == greedy_selection(
+        blockchain, transactions, timestamp
+    )
+
+
+@given(
+    transactions=st_transaction_lists,
+    max_count=st.integers(min_value=1, max_value=20),
+    timestamp=st.integers(min_value=0, max_value=100),
+)
+def test_max_count(transactions, max_count, timestamp):
+    mempool = Mempool(max_count=max_count)
+    for tx in transactions:
+        mempool.add(tx)
+        assert len(mempool) <= max_count
+    # the highest fees are kept, the oldest first among equal fees
+    by_fee = sorted(
+        range(len(transactions)), key=lambda i: -transactions[i].transaction_fee
+    )
+    kept = [transactions[i] for i in by_fee[:max_count]]
+    assert set(mempool) == set(kept)
+    assert mempool.get_live_transactions(timestamp) == sorted_live(kept, timestamp)
+    # the others were evicted, or rejected for paying less than evicted ones
+    assert mempool.evicted <= len(transactions) - len(kept)
+    if mempool.evicted:
+        assert 0 < mempool.min_fee <= min(tx.transaction_fee for tx in kept) + 1
+
+
+@given(
+    transactions=st_transaction_lists,
+    max_bytes=st.integers(min_value=0, max_value=20_000),
+)
+def test_max_bytes(transactions, max_bytes):
+    mempool = Mempool(max_bytes=max_bytes)
+    for tx in transactions:
+        mempool.add(tx)
+        assert mempool.size <= max_bytes
+    assert mempool.size == Mempool(mempool, max_bytes=max_bytes).size
+    mempool.remove_transactions(transactions)
+    assert mempool.size == 0
+
+
+def test_size():
+    mempool = Mempool.from_file(MEMPOOL_FILE, max_count=10)
+    tx = next(iter(mempool))
+    # a transaction takes more than its fields, fewer than a kilobyte
+    assert len(tx.signature) < transaction_size(tx) < 1024
+    assert mempool.size > sum(transaction_size(tx) for tx in mempool)
+
+
+def test_min_fee():
+    transactions = [
+        Transaction(ADDRESSES[0], ADDRESSES[1], 1, fee, 0) for fee in range(1, 9)
+    ]
+    mempool = Mempool(transactions[4:], max_count=4)
+    assert mempool.min_fee == 0
+    # evicted right away, raising the minimum fee above its own
+    assert not mempool.add(transactions[1])
+    assert mempool.min_fee == 3 and mempool.evicted == 1
+    assert not mempool.add(transactions[0])
+    assert mempool.evicted == 1
+
+    # a block leaving the mempool less than half full lowers the minimum fee
+    mempool.remove_transactions(transactions[7:])
+    assert mempool.min_fee == 3
+    mempool.remove_transactions(transactions[5:7])
+    assert mempool.min_fee == 1
+    assert mempool.add(transactions[1])
+
+
+def test_expire():
+    transactions = [
+        Transaction(ADDRESSES[0], ADDRESSES[1], 1, 1, lock_time)
+        for lock_time in range(5)
+    ]
+    mempool = Mempool(transactions, expiry=10)
+    mempool.get_live_transactions(4)
+    assert mempool.expire(11) == 1
+    assert mempool.expire(11) == 0
+    assert transactions[0] not in mempool
+    assert mempool.get_live_transactions(11) == transactions[1:]
+    assert mempool.expire(100) == 4 and mempool.expired == 5
+    assert Mempool(transactions).expire(100) == 0
@@ -1,8 +1,9 @@
 from hypothesis import given
 import hypothesis.strategies as st
+import pytest
 
 from blockchain_poc import merkle
-from blockchain_poc.utils import sha256_hexdigest
+from blockchain_poc.utils import hash_pair, sha256_hexdigest
 from blockchain_poc.constants import ZERO_HASH
 
 from tests.conftest import st_hashes
@@ -77,3 +78,145 @@ def test_generate_verify_proof(data):
     root = merkle.generate_root(hashes)
     proof = merkle.generate_proof(target, hashes)
     assert merkle.verify_proof(target, root, proof)
+
+
+def test_merkle_tree():
+    tree = merkle.MerkleTree(HASHES)
+    assert tree.root == merkle.generate_root(list(HASHES))
+    assert tree.generate_proof(SAMPLE_HASH_3) == merkle.generate_proof(
+        SAMPLE_HASH_3, list(HASHES)
+    )
+    assert len(tree) == 4
+    assert SAMPLE_HASH_1 in tree
+    assert tree.node_count == 6
+
+
+def test_merkle_tree_missing_target():
+    tree = merkle.MerkleTree(HASHES[:3])
+    with pytest.raises(ValueError):
+        tree.generate_proof(ZERO_HASH)
+
+
+def test_merkle_tree_too_small():
+    with pytest.raises(ValueError):
+        merkle.MerkleTree([SAMPLE_HASH_1])
+
+
+@given(data=hashes_with_target())
+def test_merkle_tree_proof(data):
+    hashes, target = data
+    tree = merkle.MerkleTree(hashes)
+    assert tree.root == merkle.generate_root(list(hashes))
+    proof = tree.generate_proof(target)
+    assert proof == merkle.generate_proof(target, list(hashes))
+    assert merkle.verify_proof(target, tree.root, proof)
+
+
+def reference_root(hashes):
+    while len(hashes) > 1:
+        if len(hashes) % 2 == 1:
+            hashes = hashes + [ZERO_HASH]
+        if len(hashes) == 2:
+            return hash_pair(*hashes)
+        hashes = [hash_pair(a, b) for a, b in zip(hashes[::2], hashes[1::2])]
+
+
+@given(hashes=st.lists(st_hashes, min_size=2, max_size=2_000))
+def test_generate_root_matches_reference(hashes):
+    original = list(hashes)
+    assert merkle.generate_root(hashes) == reference_root(hashes)
+    assert hashes == original
+
+
+def test_generate_root_duplicate_leaves():
+    hashes = [SAMPLE_HASH_1] * 5
+    assert merkle.generate_root(hashes) == reference_root(hashes)
+
+
+def test_generate_root_unpacked_hashes():
+    hashes = ["0x1", "0x2", SAMPLE_HASH_1]
+    assert merkle.generate_root(hashes) == reference_root(hashes)
+    tree = merkle.MerkleTree(hashes)
+    assert tree.root == reference_root(hashes)
+    assert merkle.verify_proof("0x2", tree.root, tree.generate_proof("0x2"))
+
+
+@st.composite
+def hashes_with_targets(draw):
+    hashes = draw(st.lists(st_hashes, min_size=2, max_size=2_000, unique=True))
+    targets = draw(st.lists(st.sampled_from(hashes), min_size=1, max_size=50))
+    return (hashes, targets)
+
+
+@given(data=hashes_with_targets())
+def test_generate_verify_multiproof(data):
+    hashes, targets = data
+    root = merkle.generate_root(hashes)
+    proof = merkle.generate_multiproof(targets, hashes)
+    distinct = list(dict.fromkeys(targets))
+    assert proof["indices"] == [hashes.index(t) for t in distinct]
+    assert proof["leaf_count"] == len(hashes)
+    assert merkle.verify_multiproof(distinct, root, proof)
+    # never more nodes than the single proofs together
+    assert len(proof["hashes"]) <= sum(
+        len(merkle.generate_proof(t, hashes)) for t in distinct
+    )
+    assert not merkle.verify_multiproof(distinct, SAMPLE_HASH_1, proof)
+    if len(distinct) < len(hashes):
+        other = next(h for h in hashes if h not in distinct)
+        assert not merkle.verify_multiproof([other] + distinct[1:], root, proof)
+
+
+def test_multiproof_shares_nodes():
+    hashes = HASHES + [SAMPLE_HASH_1[:-1] + "0"]
+    tree = merkle.MerkleTree(hashes)
+    proof = tree.generate_multiproof([SAMPLE_HASH_1, SAMPLE_HASH_2, SAMPLE_HASH_3])
+    assert proof == {
+        "indices": [0, 1, 2],
+        "leaf_count": 5,
+        "hashes": [SAMPLE_HASH_4, tree.generate_proof(SAMPLE_HASH_1)[2]],
+    }
+    assert merkle.verify_multiproof(HASHES[:3], tree.root, proof)
+
+    # the padding nodes are left out
+    targets = [hashes[4], SAMPLE_HASH_3, SAMPLE_HASH_2, SAMPLE_HASH_1]
+    proof = tree.generate_multiproof(targets)
+    assert proof["indices"] == [4, 2, 1, 0]
+    assert proof["hashes"] == [SAMPLE_HASH_4]
+    assert merkle.verify_multiproof(targets, tree.root, proof)
+
+
+def test_verify_multiproof_invalid():
+    root = merkle.generate_root(HASHES)
+    proof = merkle.generate_multiproof([SAMPLE_HASH_1, SAMPLE_HASH_3], HASHES)
+    targets = [SAMPLE_HASH_1, SAMPLE_HASH_3]
+    assert merkle.verify_multiproof(targets, root, proof)
+    assert not merkle.verify_multiproof(targets[:1], root, proof)
+    assert not merkle.verify_multiproof(targets, root, {**proof, "hashes": []})
+    extra = {**proof, "hashes": proof["hashes"] + [SAMPLE_HASH_1]}
+    assert not merkle.verify_multiproof(targets, root, extra)
+    assert not merkle.verify_multiproof(targets, root, {**proof, "indices": [0, 4]})
+    assert not merkle.verify_multiproof(targets, root, {**proof, "leaf_count": 1})
+
+
+def test_malformed_multiproof():
+    tree = merkle.MerkleTree(HASHES)
+    targets = HASHES[:2]
+    proof = tree.generate_multiproof(targets)
+    assert merkle.verify_multiproof(targets, tree.root, proof)
+    for malformed in [
+        None,
+        [],
+        {},
+        {**proof, "indices": ["0", 1]},
+        {**proof, "indices": [0.0, 1]},
+        {**proof, "indices": [True, 1]},
+        {**proof, "indices": [0, len(HASHES)]},
+        {**proof, "indices": 0},
+        {**proof, "leaf_count": str(len(HASHES))},
+        {**proof, "leaf_count": None},
+        {**proof, "hashes": None},
+        {**proof, "hashes": [1] * len(proof["hashes"])},
+    ]:
+        assert not merkle.verify_multiproof(targets, tree.root, malformed)
+    assert not merkle.verify_multiproof([1, 2], tree.root, proof)
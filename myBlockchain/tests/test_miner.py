@@ -0,0 +1,68 @@
+from benchmarks import synthetic
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.miner import ContinuousMiner, Miner
+from blockchain_poc.transaction import Transaction
+
+
+def make_miner(cls=Miner, **kwargs):
+    blockchain, addresses = synthetic.make_chain(3, 10, 20, seed=1)
+    transactions = synthetic.make_mempool_transactions(blockchain, addresses, 200)
+    return cls(synthetic.MINER, blockchain, Mempool(transactions), **kwargs)
+
+
+def replay(blockchain: Blockchain) -> Blockchain:
+    replayed = Blockchain(max_txs_per_block=blockchain.max_txs_per_block)
+    for block in blockchain.blocks:
+        replayed.process_block(block)
+    return replayed
+
+
+def test_continuous_mining_matches_mine_next():
+    miner = make_miner()
+    expected = [miner.mine_next() for _ in range(4)]
+    continuous = make_miner(ContinuousMiner, slice_size=8)
+    blocks = list(continuous.iter_blocks(4))
+    # with one worker, slices complete in order so the same nonces are found
+    assert blocks == expected
+    assert replay(continuous.blockchain).balances == miner.blockchain.balances
+    assert continuous.report.blocks == 4
+    # one template per block, the next ones prefetched, plus a spare one
+    assert continuous.report.templates == 5
+    assert 0 < continuous.report.hashing_share <= 1
+
+
+def test_timestamp_roll():
+    miner = make_miner(ContinuousMiner, slice_size=2, nonce_range=4)
+    blocks = list(miner.iter_blocks(3))
+    assert miner.report.timestamp_rolls > 0
+    assert any(b.header.timestamp % synthetic.BLOCK_INTERVAL != 0 for b in blocks)
+    for block in blocks:
+        assert block.header.nonce < 4
+        assert block.header.is_below_target()
+    replay(miner.blockchain)
+
+
+def test_refresh_on_higher_fee():
+    miner = make_miner(ContinuousMiner, slice_size=1)
+    sender = max(miner.blockchain.balances.items(), key=lambda item: item[1])[0]
+    tx = Transaction(
+        sender=sender,
+        receiver=synthetic.MINER,
+        amount=1,
+        transaction_fee=1_000,
+        lock_time=0,
+    )
+    build_next = miner._build_next
+
+    def submit_while_mining(*args):
+        # called once the first slices of the block are in flight
+        if tx not in miner.mempool:
+            miner.submit(tx)
+        return build_next(*args)
+
+    miner._build_next = submit_while_mining
+    (block,) = miner.iter_blocks(1)
+    assert miner.report.refreshes == 1
+    assert block.transactions[0] == tx
+    assert tx not in miner.mempool
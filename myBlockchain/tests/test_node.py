@@ -0,0 +1,161 @@
+import asyncio
+import dataclasses
+from os import path
+
+import pytest
+
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.mempool import Mempool
+from blockchain_poc.header_hasher import compute_target
+from blockchain_poc.node import Node, SeenHashes, decode_message, encode_message
+from blockchain_poc.transaction import Transaction
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+MEMPOOL_FILE = path.join(DATA_DIR, "sample", "mempool.json.gz")
+MINER = "0x0000ee1509c22458e88d9c0fedd9fbbf4a18994c"
+
+
+def next_block(blockchain: Blockchain, transactions) -> Block:
+    return Block.mine(
+        difficulty=blockchain.get_next_difficulty(),
+        height=blockchain.height + 1,
+        miner=MINER,
+        previous_block_header_hash=blockchain.head.header.hash,
+        timestamp=blockchain.timestamp + 10,
+        transactions=transactions,
+    )
+
+
+async def wait_for(condition, timeout=5.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def start_line(count: int):
+    nodes = [
+        Node(Blockchain.from_file(STATE_FILE, max_txs_per_block=5), Mempool())
+        for _ in range(count)
+    ]
+    for node in nodes:
+        await node.start()
+    for left, right in zip(nodes, nodes[1:]):
+        await left.connect(left.host, right.port)
+    await wait_for(lambda: all(len(n.peers) == 2 for n in nodes[1:-1]))
+    return nodes
+
+
+def test_seen_hashes():
+    seen = SeenHashes(2)
+    assert seen.add("a") and seen.add("b")
+    assert not seen.add("a")
+    assert seen.add("c")
+    assert "a" in seen and "b" not in seen and len(seen) == 2
+
+
+def test_gossip():
+    async def run():
+        nodes = await start_line(3)
+        try:
+            transactions = list(Mempool.from_file(MEMPOOL_FILE))
+            for tx in transactions:
+                await nodes[0].submit(tx)
+            await wait_for(lambda: len(nodes[2].mempool) == len(transactions))
+            assert list(nodes[2].mempool) == transactions
+
+            block = next_block(nodes[0].blockchain, transactions[:2])
+            await nodes[2].submit(block)
+            await wait_for(lambda: nodes[0].blockchain.height == block.header.height)
+            assert all(n.blockchain.head == block for n in nodes)
+            assert all(len(n.mempool) == len(transactions) - 2 for n in nodes)
+
+            # resubmitting is deduplicated and nothing is sent again
+            await nodes[0].submit(block)
+            await nodes[0].submit(transactions[0])
+            assert nodes[0].stats["duplicate"] == 2
+            for node in nodes:
+                await node.wait_idle()
+            assert nodes[1].stats["accepted"] == len(transactions) + 1
+            assert nodes[1].stats["duplicate"] == 0
+        finally:
+            for node in nodes:
+                await node.close()
+
+    asyncio.run(run())
+
+
+def test_invalid_items_are_not_forwarded():
+    async def run():
+        nodes = await start_line(2)
+        try:
+            blockchain = nodes[0].blockchain
+            sender = next(iter(blockchain.balances))
+            overdraft = Transaction(
+                sender=sender,
+                receiver=MINER,
+                amount=blockchain.balances[sender] + 1,
+                transaction_fee=1,
+                lock_time=0,
+            )
+            transactions = list(Mempool.from_file(MEMPOOL_FILE))[:1] + [overdraft]
+            await nodes[0].submit(next_block(blockchain, transactions))
+            await nodes[0].wait_idle()
+            assert nodes[0].stats["rejected"] == 1
+            assert blockchain.height == 3
+
+            # a malformed message disconnects the peer that sent it
+            writer = next(iter(nodes[1].peers)).writer
+            writer.write(b'{"type": "unknown"}\n' + encode_message(overdraft))
+            await wait_for(lambda: not nodes[0].peers)
+            assert nodes[0].stats["malformed"] == 1
+            assert overdraft not in nodes[0].mempool
+        finally:
+            for node in nodes:
+                await node.close()
+
+    asyncio.run(run())
+
+
+def without_work(block: Block) -> Block:
+    header = dataclasses.replace(block.header)
+    while True:
+        header.hash = header.sha256_hash()
+        if int(header.hash, 16) >= compute_target(header.difficulty):
+            return Block(header=header, transactions=block.transactions)
+        header.nonce += 1
+
+
+def test_forged_blocks_are_rejected():
+    async def run():
+        nodes = await start_line(2)
+        try:
+            blockchain = nodes[0].blockchain
+            block = next_block(blockchain, list(Mempool.from_file(MEMPOOL_FILE))[:2])
+            with pytest.raises(ValueError, match="insufficient proof of work"):
+                decode_message(encode_message(without_work(block)))
+
+            # the hash of the real block, on a header it is not the hash of
+            forged = Block(
+                header=dataclasses.replace(block.header, miner=MINER[::-1]),
+                transactions=block.transactions,
+            )
+            with pytest.raises(ValueError, match="invalid hash"):
+                decode_message(encode_message(forged))
+            writer = next(iter(nodes[1].peers)).writer
+            writer.write(encode_message(forged))
+            await wait_for(lambda: not nodes[0].peers)
+            assert nodes[0].stats["malformed"] == 1
+
+            # the real block is not mistaken for a duplicate of the forged one
+            await nodes[0].submit(block)
+            await nodes[0].wait_idle()
+            assert blockchain.head == block
+        finally:
+            for node in nodes:
+                await node.close()
+
+    asyncio.run(run())
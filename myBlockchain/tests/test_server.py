@@ -0,0 +1,159 @@
+import http.client
+import json
+import socket
+import threading
+from os import path
+
+import pytest
+
+from blockchain_poc.block import Block
+from blockchain_poc.block_store import BlockStore
+from blockchain_poc.blockchain import Blockchain, iter_state_blocks
+from blockchain_poc.server import QueryServer, QueryService, UnixQueryServer
+from blockchain_poc.utils import dump_json_array, open_file
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+BLOCKS = list(iter_state_blocks(STATE_FILE))
+# 3rd transaction in block 3
+TX_HASH = "0xc06eaef0a51caea2e6fcf8ffbc38a0b3c6cf39a8a8214501082a30c265c120ac"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def request(connection, method, url, body=None):
+    connection.request(method, url, body=body)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def write_json_state(filename, blocks):
+    with open_file(filename, "wt") as f:
+        dump_json_array((b.to_dict() for b in blocks), f)
+
+
+def make_service(state_path):
+    return QueryService(
+        state_path, lambda: Blockchain.from_file(state_path, max_txs_per_block=5)
+    )
+
+
+@pytest.fixture
+def running_server():
+    servers = []
+
+    def start(server):
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_queries(running_server):
+    server = running_server(QueryServer(("127.0.0.1", 0), make_service(STATE_FILE)))
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+
+    assert request(connection, "GET", "/status") == (
+        200,
+        {"height": 3, "head": BLOCKS[3].header.hash},
+    )
+    assert request(connection, "GET", "/tx-hash?block=3&index=2") == (
+        200,
+        {"hash": TX_HASH},
+    )
+    status, proof = request(connection, "GET", f"/proof?block=3&hash={TX_HASH}")
+    assert status == 200
+    assert proof["block"] == 3 and proof["hash"] == TX_HASH
+    assert request(connection, "POST", "/verify", json.dumps(proof)) == (
+        200,
+        {"valid": True},
+    )
+    proof["block"] = 2
+    assert request(connection, "POST", "/verify", json.dumps(proof)) == (
+        200,
+        {"valid": False},
+    )
+
+    assert request(connection, "GET", "/tx-hash?block=9&index=0")[0] == 400
+    assert request(connection, "GET", "/proof?block=3")[0] == 400
+    assert request(connection, "GET", "/proof?block=3&hash=0x00")[0] == 400
+    assert request(connection, "GET", "/missing")[0] == 404
+
+
+def test_unix_socket(running_server, tmp_path):
+    socket_path = str(tmp_path / "query.sock")
+    running_server(UnixQueryServer(socket_path, make_service(STATE_FILE)))
+    connection = UnixHTTPConnection(socket_path)
+    for _ in range(2):
+        assert request(connection, "GET", "/tx-hash?block=3&index=2") == (
+            200,
+            {"hash": TX_HASH},
+        )
+
+
+def test_follow_block_store(tmp_path):
+    store_path = str(tmp_path / "chain.store")
+    with BlockStore(store_path) as store:
+        store.append_blocks(BLOCKS[:2])
+    service = make_service(store_path)
+    assert service.refresh() == 0
+    with BlockStore(store_path) as store:
+        store.append_blocks(BLOCKS[2:])
+    assert service.refresh() == 2
+    assert service.status()["height"] == 3
+    assert service.get_transaction_hash(3, 2) == {"hash": TX_HASH}
+
+
+def test_follow_json_state(tmp_path):
+    state_path = str(tmp_path / "chain.json.gz")
+    write_json_state(state_path, BLOCKS[:3])
+    service = make_service(state_path)
+    blockchain = service.blockchain
+    write_json_state(state_path, BLOCKS)
+    assert service.refresh() == 1
+    assert service.blockchain is blockchain and blockchain.height == 3
+
+    # a shorter state is not an extension: the chain is loaded again
+    write_json_state(state_path, BLOCKS[:2])
+    service.refresh()
+    assert service.blockchain is not blockchain
+    assert service.status()["height"] == 1
+
+
+def test_follow_backs_off_on_errors(tmp_path, capsys):
+    state_path = str(tmp_path / "chain.json.gz")
+    write_json_state(state_path, BLOCKS[:3])
+    service = make_service(state_path)
+    invalid = Block.from_dict(BLOCKS[3].to_dict())
+    invalid.header.timestamp = 0
+    write_json_state(state_path, BLOCKS[:3] + [invalid])
+
+    delays = []
+
+    class Stop:
+        def wait(self, delay):
+            delays.append(delay)
+            if len(delays) == 4:
+                # the state is fixed
+                write_json_state(state_path, BLOCKS)
+            return len(delays) > 5
+
+    service.follow(1, Stop(), max_backoff=5)
+    assert delays == [1, 2, 4, 5, 1, 1]
+    assert service.status()["height"] == 3
+    errors = capsys.readouterr().err.splitlines()
+    assert len(errors) == 3
+    assert errors[0].startswith(f"cannot follow {state_path} at block 3: ValueError")
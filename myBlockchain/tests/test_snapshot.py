@@ -0,0 +1,127 @@
+import os
+from os import path
+
+import pytest
+
+from blockchain_poc.blockchain import Blockchain, verify_snapshots
+from blockchain_poc.snapshot import (
+    BalanceSnapshot,
+    balances_checksum,
+    find_latest_snapshot,
+    list_snapshots,
+    write_snapshot,
+)
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+
+def replay(height: int) -> Blockchain:
+    full = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blockchain = Blockchain(max_txs_per_block=5)
+    for block in full.blocks[: height + 1]:
+        blockchain.process_block(block)
+    return blockchain
+
+
+def test_write_and_list(tmp_path):
+    directory = str(tmp_path)
+    first = write_snapshot(replay(1).create_snapshot(), directory)
+    second = write_snapshot(replay(2).create_snapshot(), directory)
+    assert list_snapshots(directory) == [second, first]
+    assert BalanceSnapshot.from_file(second) == replay(2).create_snapshot()
+    assert list_snapshots(str(tmp_path / "missing")) == []
+
+
+def test_load_from_snapshot(tmp_path):
+    directory = str(tmp_path)
+    snapshot = replay(2).create_snapshot()
+    # balances that replaying the chain would never produce, to check that the
+    # snapshot is used and the blocks it covers are not replayed
+    snapshot.balances = {address: 10**12 for address in snapshot.balances}
+    snapshot.checksum = balances_checksum(snapshot.balances)
+    write_snapshot(snapshot, directory)
+
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, snapshot_dir=directory
+    )
+    expected = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    assert blockchain.blocks == expected.blocks
+    assert blockchain.balances != expected.balances
+    assert set(blockchain.balances) == set(expected.balances)
+
+
+def test_skip_mismatched_snapshot(tmp_path):
+    directory = str(tmp_path)
+    write_snapshot(replay(1).create_snapshot(), directory)
+    mismatched = replay(2).create_snapshot()
+    mismatched.head_hash = "0x" + "1" * 64
+    write_snapshot(mismatched, directory)
+
+    expected = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    assert find_latest_snapshot(directory, expected.blocks).height == 1
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, snapshot_dir=directory
+    )
+    assert blockchain.balances == expected.balances
+
+
+def test_skip_corrupted_snapshot(tmp_path):
+    directory = str(tmp_path)
+    write_snapshot(replay(1).create_snapshot(), directory)
+    corrupted = replay(2).create_snapshot()
+    corrupted.balances[next(iter(corrupted.balances))] += 1
+    write_snapshot(corrupted, directory)
+
+    expected = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    assert find_latest_snapshot(directory, expected.blocks).height == 1
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, snapshot_dir=directory
+    )
+    assert blockchain.balances == expected.balances
+    with pytest.raises(ValueError, match="do not match their checksum"):
+        Blockchain(max_txs_per_block=5).restore_snapshot(corrupted, expected.blocks)
+
+
+def test_load_past_mismatched_snapshot(tmp_path):
+    # the newest snapshot does not match: the blocks read up to its height
+    # are processed after the older snapshot is restored
+    directory = str(tmp_path)
+    snapshot = replay(1).create_snapshot()
+    snapshot.balances = {address: 10**12 for address in snapshot.balances}
+    snapshot.checksum = balances_checksum(snapshot.balances)
+    write_snapshot(snapshot, directory)
+    mismatched = replay(3).create_snapshot()
+    mismatched.head_hash = "0x" + "1" * 64
+    write_snapshot(mismatched, directory)
+
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, snapshot_dir=directory
+    )
+    expected = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    assert blockchain.blocks == expected.blocks
+    assert sorted(blockchain.undo_journal) == [2, 3]
+
+
+def test_refuse_mismatched_snapshot():
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    snapshot = blockchain.create_snapshot()
+    snapshot.head_hash = blockchain.blocks[0].header.hash
+    with pytest.raises(ValueError, match="does not match"):
+        Blockchain(max_txs_per_block=5).restore_snapshot(snapshot, blockchain.blocks)
+
+
+def test_verify_snapshots(tmp_path):
+    directory = str(tmp_path)
+    valid = write_snapshot(replay(2).create_snapshot(), directory)
+    tampered = replay(3).create_snapshot()
+    address = next(iter(tampered.balances))
+    tampered.balances[address] += 1
+    invalid = write_snapshot(tampered, directory)
+    assert verify_snapshots(STATE_FILE, directory, max_txs_per_block=5) == {
+        valid: True,
+        invalid: False,
+    }
+    assert sorted(os.listdir(directory)) == sorted(
+        path.basename(filename) for filename in (valid, invalid)
+    )
@@ -0,0 +1,71 @@
+import gzip
+import json
+from os import path
+
+import pytest
+
+from blockchain_poc import stats
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.stats import STATS
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+
+@pytest.fixture
+def enabled_stats():
+    STATS.reset()
+    stats.enable()
+    yield STATS
+    stats.disable()
+    STATS.reset()
+
+
+def test_disabled_by_default():
+    validate = vars(Block)["validate"]
+    Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    assert not STATS.enabled
+    assert STATS.timers == {} and STATS.counters == {}
+    stats.enable()
+    assert vars(Block)["validate"] is not validate
+    stats.disable()
+    assert vars(Block)["validate"] is validate
+
+
+def test_timers_and_counters(enabled_stats):
+    blockchain = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    transactions = sum(len(b.transactions) for b in blockchain.blocks)
+    assert enabled_stats.timers["blockchain.process_block"].count == 4
+    assert enabled_stats.timers["block.validate"].count == 4
+    assert enabled_stats.timers["blockchain.process_transaction"].count == transactions
+    assert enabled_stats.counters["blockchain.transactions"] == transactions
+    assert enabled_stats.counters["file.opened"] == 1
+    with gzip.open(STATE_FILE, "rt") as f:
+        # the format is detected from the first bytes, read again for JSON
+        assert enabled_stats.counters["file.read_size"] >= len(f.read())
+
+    block = Block.mine(
+        difficulty=2,
+        height=blockchain.height + 1,
+        miner=blockchain.head.header.miner,
+        previous_block_header_hash=blockchain.head.header.hash,
+        timestamp=blockchain.timestamp + 1,
+        transactions=blockchain.head.transactions,
+    )
+    assert enabled_stats.counters["block.hash_attempts"] == block.header.nonce + 1
+    assert enabled_stats.derived()["block.hashrate"] > 0
+
+
+def test_reports(enabled_stats, tmp_path):
+    Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    stats.write_report(str(tmp_path / "stats.json"), "json")
+    with open(tmp_path / "stats.json") as f:
+        report = json.load(f)
+    assert report["timers"]["blockchain.process_block"]["count"] == 4
+
+    stats.write_report(str(tmp_path / "stats.prom"), "prometheus")
+    with open(tmp_path / "stats.prom") as f:
+        lines = f.read().splitlines()
+    assert "blockchain_poc_blockchain_process_block_calls_total 4" in lines
+    assert "# TYPE blockchain_poc_file_opened_total counter" in lines
@@ -0,0 +1,113 @@
+import dataclasses
+import gzip
+import json
+from os import path
+
+import pytest
+
+from blockchain_poc import sync
+from blockchain_poc.block import Block
+from blockchain_poc.blockchain import Blockchain
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+
+def load_blocks():
+    with gzip.open(STATE_FILE) as f:
+        return [Block.from_dict(b) for b in json.load(f)]
+
+
+def swap_signatures(blocks):
+    block = blocks[3]
+    first, second = block.transactions[:2]
+    block.transactions[0] = dataclasses.replace(first, signature=second.signature)
+    block.header.transactions_merkle_root = block.compute_transactions_merkle_root()
+
+
+def corrupt_merkle_root(blocks):
+    blocks[2].header.transactions_merkle_root = blocks[
+        1
+    ].header.transactions_merkle_root
+
+
+def corrupt_timestamp(blocks):
+    blocks[2].header.timestamp = blocks[1].header.timestamp - 1
+
+
+def corrupt_balance(blocks):
+    block = blocks[2]
+    block.transactions[0] = dataclasses.replace(block.transactions[0], amount=10**30)
+    block.header.transactions_merkle_root = block.compute_transactions_merkle_root()
+
+
+def process_sequentially(blocks, check_signatures):
+    blockchain = Blockchain(max_txs_per_block=5, check_signatures=check_signatures)
+    for block in blocks:
+        blockchain.process_block(block)
+    return blockchain
+
+
+def process_in_parallel(blocks, check_signatures):
+    blockchain = Blockchain(max_txs_per_block=5, check_signatures=check_signatures)
+    checked = sync.iter_checked_blocks(blocks, check_signatures, jobs=2, batch_size=1)
+    for block, checks in checked:
+        blockchain.process_block(block, checks)
+    return blockchain
+
+
+def test_load_state_jobs():
+    expected = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, check_signatures=True, jobs=2
+    )
+    assert blockchain.blocks == expected.blocks
+    assert blockchain.balances == expected.balances
+
+
+def test_compute_checks():
+    blocks = load_blocks()
+    checks = sync.compute_checks(blocks[0], check_signatures=True)
+    assert checks.merkle_root == blocks[0].header.transactions_merkle_root
+    assert not checks.signatures_checked
+    checks = sync.compute_checks(blocks[1], check_signatures=True)
+    assert checks.signatures_checked and checks.invalid_signature is None
+
+    swap_signatures(blocks)
+    assert sync.compute_checks(blocks[3], True).invalid_signature == 0
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [swap_signatures, corrupt_merkle_root, corrupt_timestamp, corrupt_balance],
+)
+@pytest.mark.parametrize("check_signatures", [False, True])
+def test_same_first_error(corrupt, check_signatures):
+    blocks = load_blocks()
+    corrupt(blocks)
+    if corrupt is swap_signatures and not check_signatures:
+        pytest.skip("the swapped signatures are not checked")
+    with pytest.raises(ValueError) as sequential:
+        process_sequentially(blocks, check_signatures)
+    with pytest.raises(ValueError) as parallel:
+        process_in_parallel(blocks, check_signatures)
+    assert str(parallel.value) == str(sequential.value)
+
+
+def test_workers_stop_on_error(monkeypatch):
+    shutdowns = []
+
+    class Executor(sync.ProcessPoolExecutor):
+        def shutdown(self, *args, **kwargs):
+            shutdowns.append(self)
+            super().shutdown(*args, **kwargs)
+
+    monkeypatch.setattr(sync, "ProcessPoolExecutor", Executor)
+    blocks = load_blocks()
+    corrupt_timestamp(blocks)
+    blockchain = Blockchain(max_txs_per_block=5)
+    with pytest.raises(ValueError, match="invalid timestamp") as error:
+        blockchain.process_blocks(blocks, jobs=2)
+    # the traceback of the error still refers to the generator
+    assert error.traceback
+    assert len(shutdowns) == 1
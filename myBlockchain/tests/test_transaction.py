@@ -1,11 +1,19 @@
+import dataclasses
+import hashlib
 import json
+import pickle
 from os import path
 
 import hypothesis.strategies as st
+import pytest
 from ecdsa import SigningKey, curves
 from hypothesis import given
 
-from blockchain_poc.transaction import Transaction
+from blockchain_poc.transaction import (
+    Transaction,
+    VerifyingKeyCache,
+    verify_signatures,
+)
 from tests.conftest import DATA_DIR, st_addresses, st_monetary_amounts
 
 
@@ -54,3 +62,85 @@ def test_sign_and_verify(transaction: Transaction):
     private_key = SigningKey.generate(curve=curves.NIST256p)
     transaction.sign(private_key)
     assert transaction.verify_signature()
+
+
+def test_immutable():
+    with open(path.join(DATA_DIR, "mempool-transaction-1.json")) as f:
+        transaction = Transaction.from_dict(json.load(f))
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        transaction.amount = 0  # type: ignore
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        transaction.signature = ""  # type: ignore
+
+
+def test_slots():
+    with open(path.join(DATA_DIR, "mempool-transaction-1.json")) as f:
+        transaction = Transaction.from_dict(json.load(f))
+    assert not hasattr(transaction, "__dict__")
+    assert set(Transaction.__slots__) == {
+        "sender",
+        "receiver",
+        "amount",
+        "transaction_fee",
+        "lock_time",
+        "signature",
+        "_digest",
+        "_hash_to_sign",
+    }
+
+
+def test_pickle():
+    with open(path.join(DATA_DIR, "mempool-transaction-1.json")) as f:
+        transaction = Transaction.from_dict(json.load(f))
+    transaction.sha256_hash()
+    copy = pickle.loads(pickle.dumps(transaction))
+    assert copy == transaction
+    assert copy.sha256_hash() == transaction.sha256_hash()
+
+
+@given(transaction=st_transactions())
+def test_cached_hashes(transaction: Transaction):
+    serialized = ",".join(
+        str(v) for _, v in sorted(transaction.to_dict().items(), key=lambda x: x[0])
+    )
+    digest = hashlib.sha256(serialized.encode()).digest()
+    assert transaction.serialize() == serialized
+    assert transaction.sha256_hash() == "0x" + digest.hex()
+    assert hash(transaction) == hash(int.from_bytes(digest, "big"))
+
+    private_key = SigningKey.generate(curve=curves.NIST256p)
+    hash_to_sign = transaction.compute_hash_to_sign()
+    transaction.sign(private_key)
+    assert transaction.compute_hash_to_sign() == hash_to_sign
+    assert (
+        transaction.sha256_hash()
+        == Transaction.from_dict(transaction.to_dict()).sha256_hash()
+    )
+
+
+def test_verify_signatures():
+    with open(path.join(DATA_DIR, "mempool-transaction-1.json")) as f:
+        obj = json.load(f)
+    valid = Transaction.from_dict(obj)
+    tampered = Transaction.from_dict({**obj, "amount": obj["amount"] + 1})
+    unsigned = Transaction.from_dict({**obj, "signature": ""})
+    malformed = Transaction.from_dict({**obj, "signature": "0x1234,0x5678"})
+    transactions = [valid, tampered, unsigned, malformed, valid]
+    assert verify_signatures(transactions) == [True, False, False, False, True]
+    assert verify_signatures([]) == []
+
+
+def test_verifying_key_cache():
+    with open(path.join(DATA_DIR, "mempool-transaction-1.json")) as f:
+        transaction = Transaction.from_dict(json.load(f))
+    encoded_public_key = transaction.signature.split(",")[0]
+    cache = VerifyingKeyCache(max_size=1, precompute_after=2)
+    first = cache.get(encoded_public_key)
+    assert cache.get(encoded_public_key) is first
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+
+    other = SigningKey.generate(curve=curves.NIST256p).verifying_key.to_der()
+    cache.get("0x" + other.hex())
+    assert len(cache) == 1
+    assert cache.get(encoded_public_key) is not first
+    assert cache.misses == 3
@@ -0,0 +1,39 @@
+from os import path
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.transaction_generator import (
+    generate_transactions,
+    iter_transactions,
+    load_accounts,
+)
+from tests.conftest import DATA_DIR
+
+SAMPLE_DIR = path.join(DATA_DIR, "sample")
+
+
+def load_sample():
+    blockchain = Blockchain.from_file(
+        path.join(SAMPLE_DIR, "blockchain.json.gz"), max_txs_per_block=5
+    )
+    return blockchain, load_accounts(path.join(SAMPLE_DIR, "keys.json.gz"))
+
+
+def test_generated_transactions_are_valid():
+    blockchain, accounts = load_sample()
+    transactions = generate_transactions(blockchain, accounts, 50, seed=1)
+    assert len(transactions) == 50
+    balances = blockchain.balances.copy()
+    for tx in transactions:
+        assert tx.sender in accounts
+        assert tx.verify_signature()
+        Blockchain.update_balances(balances, tx)
+
+
+def test_seeded_output_does_not_depend_on_workers():
+    blockchain, accounts = load_sample()
+    expected = generate_transactions(blockchain, accounts, 30, seed=7)
+    assert expected == generate_transactions(blockchain, accounts, 30, seed=7)
+    assert expected == list(
+        iter_transactions(blockchain, accounts, 30, workers=2, seed=7, chunk_size=4)
+    )
+    assert expected != generate_transactions(blockchain, accounts, 30, seed=8)
@@ -0,0 +1,108 @@
+import os
+import random
+from os import path
+
+import pytest
+
+from blockchain_poc.blockchain import Blockchain
+from blockchain_poc.tx_index import TransactionIndex
+from blockchain_poc.utils import to_hex
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+
+class FakeTransaction:
+    def __init__(self, digest: bytes):
+        self._digest = digest
+
+    def digest(self) -> bytes:
+        return self._digest
+
+
+class FakeBlock:
+    def __init__(self, height: int, digests):
+        self.header = type("Header", (), {"height": height, "hash": f"0x{height:064x}"})
+        self.transactions = [FakeTransaction(d) for d in digests]
+
+
+def test_lookup_across_runs(tmp_path):
+    rng = random.Random(0)
+    directory = str(tmp_path / "index")
+    expected = {}
+    with TransactionIndex(directory, max_pending=50) as index:
+        for height in range(40):
+            digests = [rng.randbytes(32) for _ in range(rng.randint(1, 20))]
+            index.add_block(FakeBlock(height, digests))
+            for position, digest in enumerate(digests):
+                expected[digest] = (height, position)
+        # merging keeps a logarithmic number of runs
+        assert len(index._runs) <= 6
+        assert len(index) == len(expected)
+        for digest, location in expected.items():
+            assert index.lookup(to_hex(digest)) == [location]
+
+    index = TransactionIndex(directory)
+    assert index.height == 39
+    for digest, location in expected.items():
+        assert index.lookup(to_hex(digest)) == [location]
+    assert index.lookup(to_hex(bytes(32))) == []
+    with pytest.raises(ValueError):
+        index.lookup("0x00")
+    with pytest.raises(ValueError, match="expected block at height 40"):
+        index.add_block(FakeBlock(41, []))
+
+
+def test_rewind_and_clear(tmp_path):
+    directory = str(tmp_path / "index")
+    index = TransactionIndex(directory, max_pending=4)
+    a, b, c = bytes([1] * 32), bytes([2] * 32), bytes([3] * 32)
+    index.add_block(FakeBlock(0, [a, b, c, a]))
+    index.add_block(FakeBlock(1, [b]))
+    index.rewind(0, f"0x{0:064x}")
+    assert index.lookup(to_hex(b)) == [(0, 1)]
+    # the hash appears in both blocks, so it has several candidates
+    index.add_block(FakeBlock(1, [a]))
+    assert index.lookup(to_hex(a)) == [(1, 0), (0, 3), (0, 0)]
+    index.flush()
+    assert index.lookup(to_hex(a)) == [(1, 0), (0, 3), (0, 0)]
+
+    # leftovers of an interrupted flush are removed when opening
+    open(path.join(directory, "run-999999.dat"), "wb").close()
+    index.clear()
+    assert TransactionIndex(directory).height == -1
+    assert sorted(os.listdir(directory)) == ["index.json"]
+
+
+def test_find_transaction(tmp_path):
+    directory = str(tmp_path / "index")
+    expected = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, tx_index_path=directory
+    )
+    for height, block in enumerate(expected.blocks):
+        for position, tx in enumerate(block.transactions):
+            location = (height, position)
+            assert blockchain.find_transaction(tx.sha256_hash()) == location
+            assert expected.find_transaction(tx.sha256_hash()) == location
+    assert blockchain.find_transaction(to_hex(bytes(32))) is None
+
+    # the removed block is still in a run, but is filtered out
+    removed = blockchain.rollback(1)[0]
+    blockchain.tx_index.close()
+    assert blockchain.find_transaction(removed.transactions[0].sha256_hash()) is None
+    reopened = TransactionIndex(directory)
+    assert reopened.height == 2
+    assert reopened.head_hash == expected.blocks[2].header.hash
+
+    # an index ahead of the chain, or on another branch, is rebuilt
+    shorter = Blockchain.from_file(STATE_FILE, max_txs_per_block=5)
+    shorter.rollback(2)
+    shorter.attach_tx_index(TransactionIndex(str(tmp_path / "other")))
+    shorter.tx_index.close()
+    blockchain = Blockchain.from_file(
+        STATE_FILE, max_txs_per_block=5, tx_index_path=str(tmp_path / "other")
+    )
+    assert blockchain.tx_index.height == 3
+    tx = expected.blocks[3].transactions[1]
+    assert blockchain.find_transaction(tx.sha256_hash()) == (3, 1)
@@ -0,0 +1,50 @@
+import gzip
+import io
+import json
+from os import path
+
+import hypothesis.strategies as st
+import pytest
+from hypothesis import given
+
+from blockchain_poc.utils import dump_json_array, iter_json_array
+from tests.conftest import DATA_DIR
+
+STATE_FILE = path.join(DATA_DIR, "sample", "blockchain.json.gz")
+
+st_json = st.recursive(
+    st.none() | st.booleans() | st.integers() | st.text(),
+    lambda children: st.lists(children) | st.dictionaries(st.text(), children),
+    max_leaves=10,
+)
+
+
+def test_iter_json_array_state():
+    with gzip.open(STATE_FILE, "rt") as f:
+        expected = json.load(f)
+    with gzip.open(STATE_FILE, "rt") as f:
+        assert list(iter_json_array(f, chunk_size=7)) == expected
+
+
+@given(values=st.lists(st_json), chunk_size=st.integers(min_value=1, max_value=64))
+def test_iter_json_array(values, chunk_size):
+    for text in (json.dumps(values), json.dumps(values, indent=2)):
+        assert list(iter_json_array(io.StringIO(text), chunk_size)) == values
+
+
+def test_iter_json_array_truncated_number():
+    f = io.StringIO("[1, 23456]")
+    assert list(iter_json_array(f, chunk_size=5)) == [1, 23456]
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[1 2]", "[1, 2,"])
+def test_iter_json_array_invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), chunk_size=2))
+
+
+@given(values=st.lists(st_json))
+def test_dump_json_array(values):
+    f = io.StringIO()
+    dump_json_array(iter(values), f)
+    assert f.getvalue() == json.dumps(values)